@@ -0,0 +1,106 @@
+import os
+import pickle
+import sqlite3
+import tempfile
+from datetime import datetime as dt
+
+
+def _connect_read_only(path):
+    """
+    Open an existing snapshot file in read-only mode.
+    :param path: path to the snapshot file
+    :return: sqlite3 connection or None when the file does not exist or is not a valid snapshot
+    """
+    if not os.path.isfile(path):
+        return None
+    try:
+        return sqlite3.connect('file:' + os.path.abspath(path) + '?mode=ro', uri=True)
+    except sqlite3.Error:
+        return None
+
+
+def get_snapshot_info(path):
+    """
+    Get the metadata of the ATT&CK snapshot.
+    :param path: path to the snapshot file
+    :return: dictionary with the keys attack_version, dettect_version and created. None if there is no valid snapshot.
+    """
+    conn = _connect_read_only(path)
+    if conn is None:
+        return None
+    try:
+        row = conn.execute('SELECT attack_version, dettect_version, created FROM snapshot').fetchone()
+    except sqlite3.Error:
+        return None
+    finally:
+        conn.close()
+
+    if row is None:
+        return None
+    return {'attack_version': row[0], 'dettect_version': row[1], 'created': dt.fromisoformat(row[2])}
+
+
+def load_snapshot_table(path, data_type, expire_time, dettect_version):
+    """
+    Load one data type (table) from the ATT&CK snapshot. Only the requested table is read and unpickled.
+    :param path: path to the snapshot file
+    :param data_type: the desired data type, see DATATYPE_XX constants
+    :param expire_time: number of seconds after which the snapshot is expired. None to also load from an expired snapshot.
+    :param dettect_version: the DeTT&CT version that should have created the snapshot
+    :return: the ATT&CK data. None when the snapshot does not exist, is expired or does not contain the data type.
+    """
+    conn = _connect_read_only(path)
+    if conn is None:
+        return None
+    try:
+        # metadata and data are read within one connection. So when the snapshot is swapped in the meantime, we still
+        # read from one consistent snapshot.
+        meta = conn.execute('SELECT dettect_version, created FROM snapshot').fetchone()
+        if meta is None or meta[0] != dettect_version:
+            return None
+        if expire_time is not None and (dt.now() - dt.fromisoformat(meta[1])).total_seconds() >= expire_time:
+            return None
+
+        row = conn.execute('SELECT data FROM attack_data WHERE data_type = ?', (data_type,)).fetchone()
+    except sqlite3.Error:
+        return None
+    finally:
+        conn.close()
+
+    if row is None:
+        return None
+    return pickle.loads(row[0])
+
+
+def write_snapshot(path, attack_data, attack_version, dettect_version):
+    """
+    Write a new ATT&CK snapshot. The snapshot is first written to a temporary file which then atomically replaces
+    the existing snapshot. Therefore, concurrent readers always see either the old or the new snapshot.
+    :param path: path to the snapshot file
+    :param attack_data: dictionary with the DATATYPE_XX constants as key and the ATT&CK data as value
+    :param attack_version: the ATT&CK version of the data
+    :param dettect_version: the DeTT&CT version creating the snapshot
+    :return:
+    """
+    directory = os.path.dirname(path) or '.'
+    if not os.path.exists(directory):
+        os.makedirs(directory, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    os.close(fd)
+    try:
+        conn = sqlite3.connect(tmp_path)
+        try:
+            conn.execute('CREATE TABLE snapshot (attack_version TEXT, dettect_version TEXT, created TEXT)')
+            conn.execute('CREATE TABLE attack_data (data_type TEXT PRIMARY KEY, data BLOB)')
+            conn.execute('INSERT INTO snapshot VALUES (?, ?, ?)', (attack_version, dettect_version, dt.now().isoformat()))
+            conn.executemany('INSERT INTO attack_data VALUES (?, ?)',
+                             ((data_type, pickle.dumps(data, pickle.HIGHEST_PROTOCOL)) for data_type, data in attack_data.items()))
+            conn.commit()
+        finally:
+            conn.close()
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
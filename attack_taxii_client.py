@@ -1,10 +1,207 @@
-from stix2 import TAXIICollectionSource, Filter, CompositeDataSource
-from stix2 import MemorySource
-from stix2.datastore.filters import apply_common_filters
+from stix2 import Filter, CompositeDataSource
+from stix2.datastore import DataSource
+from stix2.datastore.filters import apply_common_filters, FilterSet
 from stix2.utils import get_type_from_id
-from taxii2client.v21 import Collection
+from taxii2client.v21 import Collection, as_pages
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from requests.auth import AuthBase
+import dateutil.parser
+import json
 import os
 
+TAXII_ITEMS_PER_REQUEST = 5000
+
+
+def _parse_stix_timestamp(value):
+    """
+    Parse a STIX timestamp (e.g. 2017-05-31T21:30:19.735Z) into a timezone aware datetime object.
+    :param value: the STIX timestamp
+    :return: datetime object
+    """
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return dateutil.parser.parse(value)
+
+
+def _stix_date_hook(json_dict):
+    """
+    Parses the STIX created and modified dates into datetime objects. Function is used as object_hook when loading
+    the JSON data.
+    :param json_dict: the dictionary with STIX data
+    :return: the dictionary with STIX data
+    """
+    if 'created' in json_dict:
+        json_dict['created'] = _parse_stix_timestamp(json_dict['created'])
+    if 'modified' in json_dict:
+        json_dict['modified'] = _parse_stix_timestamp(json_dict['modified'])
+    return json_dict
+
+
+class _DateAddedLastRecorder(AuthBase):
+    """
+    Records the X-TAXII-Date-Added-Last response header, which holds the date added of the last object in a page. It
+    is passed to the TAXII client as authentication handler, as that is the public way to add a response hook to the
+    requests it makes. The requests are not changed.
+    """
+    def __init__(self):
+        self.dates_added_last = []
+
+    def __call__(self, request):
+        request.register_hook('response', self._record_date_added_last)
+        return request
+
+    def _record_date_added_last(self, response, *args, **kwargs):
+        if response.headers.get('X-TAXII-Date-Added-Last'):
+            self.dates_added_last.append(_parse_stix_timestamp(response.headers['X-TAXII-Date-Added-Last']))
+
+
+def _download_collection(url, verify, added_after):
+    """
+    Download all objects, or only the objects added after a given date, from a TAXII 2.1 collection.
+    :param url: URL of the TAXII collection
+    :param verify: verify the server's TLS certificate
+    :param added_after: datetime object or None to download the complete collection
+    :return: tuple with a list with STIX objects (dictionaries) and the date on which the last of these objects was
+    added to the collection according to the server (None when unknown)
+    """
+    # The date added of the last object in a page is only provided in the X-TAXII-Date-Added-Last response header
+    recorder = _DateAddedLastRecorder()
+    collection = Collection(url, verify=verify, auth=recorder)
+    stix_objects = []
+    for envelope in as_pages(collection.get_objects, per_request=TAXII_ITEMS_PER_REQUEST, added_after=added_after):
+        for obj in envelope.get('objects', []):
+            stix_objects.append(_stix_date_hook(obj))
+    return stix_objects, max(recorder.dates_added_last, default=None)
+
+
+def download_collections(collections_url, collection_ids, verify=True, added_after=None, max_workers=3):
+    """
+    Download multiple TAXII 2.1 collections concurrently.
+    :param collections_url: base URL of the TAXII collections endpoint
+    :param collection_ids: list with the IDs of the collections to download
+    :param verify: verify the server's TLS certificate
+    :param added_after: dictionary with per collection ID a datetime object, or None to download the complete
+    collection. When not provided, all collections are downloaded completely.
+    :param max_workers: maximum number of collections downloaded at the same time
+    :return: dictionary with the collection ID as key and as value a tuple with a list with STIX objects
+    (dictionaries) and the date on which the last of these objects was added, see _download_collection
+    """
+    added_after = added_after or {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(collection_ids)))) as executor:
+        futures = {collection_id: executor.submit(_download_collection, collections_url + collection_id, verify,
+                                                  added_after.get(collection_id))
+                   for collection_id in collection_ids}
+        return {collection_id: future.result() for collection_id, future in futures.items()}
+
+
+def merge_stix_objects(stix_objects, changed_stix_objects):
+    """
+    Merge changed STIX objects into a list with STIX objects. A changed object replaces the existing object with the
+    same ID when it's not older. New objects are appended.
+    :param stix_objects: list with STIX objects (dictionaries)
+    :param changed_stix_objects: list with changed STIX objects (dictionaries)
+    :return: list with the merged STIX objects
+    """
+    merged = {obj['id']: obj for obj in stix_objects}
+    for obj in changed_stix_objects:
+        current = merged.get(obj['id'], None)
+        if current is None or 'modified' not in current or 'modified' not in obj or obj['modified'] >= current['modified']:
+            merged[obj['id']] = obj
+    return list(merged.values())
+
+
+def refresh_collections(collections=None, verify=True, collections_url=None):
+    """
+    Refresh the locally stored ATT&CK TAXII collections. A collection which has not been downloaded before is
+    downloaded completely. Otherwise, only the objects added since the previous refresh are downloaded and merged into
+    the existing collection.
+    :param collections: dictionary with the previously downloaded collections (as returned by this function) or None
+    :param verify: verify the server's TLS certificate
+    :param collections_url: base URL of the TAXII collections endpoint. Defaults to MITRE's TAXII server.
+    :return: dictionary with the keys 'added_after' (collection ID -> datetime on which the last downloaded object
+    was added according to the server, or None) and 'objects' (collection ID -> list with STIX objects)
+    """
+    if collections_url is None:
+        collections_url = attack_client.TAXII_COLLECTIONS_URL
+    collection_ids = [attack_client.ENTERPRISE_COLLECTION_ID, attack_client.MOBILE_COLLECTION_ID,
+                      attack_client.ICS_COLLECTION_ID]
+
+    # The dates to download from are taken from the server (and not from the local clock), so that no objects are
+    # missed when the clocks differ. Without a known date the collection is downloaded completely.
+    added_after = {}
+    if collections is not None and isinstance(collections['added_after'], dict):
+        added_after = {collection_id: collections['added_after'].get(collection_id) for collection_id in collection_ids
+                       if collection_id in collections['objects']}
+    downloads = download_collections(collections_url, collection_ids, verify, added_after)
+
+    objects = {}
+    dates_added_last = {}
+    for collection_id in collection_ids:
+        stix_objects, date_added_last = downloads[collection_id]
+        if added_after.get(collection_id) is None:
+            objects[collection_id] = stix_objects
+        else:
+            objects[collection_id] = merge_stix_objects(collections['objects'][collection_id], stix_objects)
+        # without new objects the server does not provide a date, and the previous date is kept
+        dates_added_last[collection_id] = date_added_last or added_after.get(collection_id)
+
+    return {'added_after': dates_added_last, 'objects': objects}
+
+
+class stix_bundle_source(DataSource):
+    '''
+    Data source on raw STIX objects (dictionaries as loaded from the JSON data). In contrast to a stix2 MemorySource, no
+    stix2 objects are instantiated. The objects are partitioned on their type in one pass, so a query with a type filter
+    only has to evaluate the objects of that type. Revoked and deprecated objects are left out, except for the object
+    types which are (also) queried without removing revoked and deprecated objects.
+    '''
+
+    KEEP_REVOKED_DEPRECATED_TYPES = ('x-mitre-detection-strategy', 'x-mitre-analytic')
+
+    def __init__(self, stix_objects):
+        super().__init__()
+        self.objects_by_type = {}
+        for obj in stix_objects:
+            if (obj.get('revoked', False) is not False or obj.get('x_mitre_deprecated', False) is not False) and \
+                    obj['type'] not in self.KEEP_REVOKED_DEPRECATED_TYPES and \
+                    not (obj['type'] == 'relationship' and obj.get('relationship_type') == 'detects'):
+                continue
+            self.objects_by_type.setdefault(obj['type'], []).append(obj)
+
+    @classmethod
+    def load_from_file(cls, filename):
+        with open(filename, 'r', encoding='utf-8') as f:
+            bundle = json.load(f, object_hook=_stix_date_hook)
+        return cls(bundle.get('objects', []))
+
+    def get(self, stix_id, _composite_filters=None):
+        all_data = self.all_versions(stix_id, _composite_filters)
+        if all_data:
+            return max(all_data, key=lambda x: x.get('modified', x.get('created')))
+        return None
+
+    def all_versions(self, stix_id, _composite_filters=None):
+        return self.query([Filter('id', '=', stix_id)], _composite_filters)
+
+    def query(self, query=None, _composite_filters=None):
+        all_filters = FilterSet(query)
+        if _composite_filters:
+            all_filters.add(_composite_filters)
+
+        type_filters = [f for f in all_filters if f.property == 'type' and f.op == '=']
+        other_filters = [f for f in all_filters if f not in type_filters]
+        if len(type_filters) == 1:
+            stix_objects = self.objects_by_type.get(type_filters[0].value, [])
+        else:
+            stix_objects = [obj for objs in self.objects_by_type.values() for obj in objs]
+            other_filters = list(all_filters)
+
+        if other_filters:
+            return list(apply_common_filters(stix_objects, other_filters))
+        return list(stix_objects)
+
 class attack_client():
     '''
     Client to connect to the MITRE ATT&CK STIX2.1 data via either the TAXII server at attack-taxii.mitre.org or via the
@@ -14,6 +211,7 @@ class attack_client():
     https://medium.com/mitre-attack/introducing-taxii-2-1-and-a-fond-farewell-to-taxii-2-0-d9fca6ce4c58
     '''
     
+    TAXII_COLLECTIONS_URL = 'https://attack-taxii.mitre.org/api/v21/collections/'
     ENTERPRISE_COLLECTION_ID = 'x-mitre-collection--1f5f1533-f617-4ca8-9ab4-6a02367fa019'
     MOBILE_COLLECTION_ID = 'x-mitre-collection--dac0d2d7-8653-445c-9bff-82f934c1e858'
     ICS_COLLECTION_ID = 'x-mitre-collection--90c00720-636b-4485-b342-8751d232bf09'
@@ -22,8 +220,16 @@ class attack_client():
     mobile_source = None
     ics_source = None
     composite_source = None
+    _techniques_data_components = None
     
-    def __init__(self, local_path=None, verify=True):
+    def __init__(self, local_path=None, verify=True, collection_objects=None):
+        '''
+        :param local_path: path to a local copy of the attack-stix-data repository
+        :param verify: verify the server's TLS certificate
+        :param collection_objects: already downloaded TAXII collections: collection ID -> list with STIX objects. When
+        local_path and collection_objects are not provided, all collections are downloaded from the TAXII server.
+        '''
+
         if local_path is not None:
             enterprise_local_path = os.path.join(local_path, 'enterprise-attack/enterprise-attack.json')
             mobile_local_path = os.path.join(local_path, 'mobile-attack/mobile-attack.json')
@@ -32,22 +238,52 @@ class attack_client():
                 if not os.path.exists(os.path.join(local_path, 'index.json')):
                     raise ValueError('It seems you\'re using the old CTI repository, please use the new STIX2.1 repository: https://github.com/mitre-attack/attack-stix-data')
                 else:
-                    self.enterprise_source = MemorySource(version='2.1')
-                    self.enterprise_source.load_from_file(enterprise_local_path)
-                    self.mobile_source = MemorySource(version='2.1')
-                    self.mobile_source.load_from_file(mobile_local_path)
-                    self.ics_source = MemorySource(version='2.1')
-                    self.ics_source.load_from_file(ics_local_path)
+                    self.enterprise_source = stix_bundle_source.load_from_file(enterprise_local_path)
+                    self.mobile_source = stix_bundle_source.load_from_file(mobile_local_path)
+                    self.ics_source = stix_bundle_source.load_from_file(ics_local_path)
             else:
                 raise ValueError('Invalid local_path.')
         else:
-            self.enterprise_source = TAXIICollectionSource(Collection(f'https://attack-taxii.mitre.org/api/v21/collections/{self.ENTERPRISE_COLLECTION_ID}', verify=verify))
-            self.mobile_source = TAXIICollectionSource(Collection(f'https://attack-taxii.mitre.org/api/v21/collections/{self.MOBILE_COLLECTION_ID}', verify=verify))
-            self.ics_source = TAXIICollectionSource(Collection(f'https://attack-taxii.mitre.org/api/v21/collections/{self.ICS_COLLECTION_ID}', verify=verify))
+            if collection_objects is None:
+                collection_objects = refresh_collections(None, verify)['objects']
+            self.enterprise_source = stix_bundle_source(collection_objects[self.ENTERPRISE_COLLECTION_ID])
+            self.mobile_source = stix_bundle_source(collection_objects[self.MOBILE_COLLECTION_ID])
+            self.ics_source = stix_bundle_source(collection_objects[self.ICS_COLLECTION_ID])
 
         self.composite_source = CompositeDataSource()
         self.composite_source.add_data_sources([self.enterprise_source, self.mobile_source, self.ics_source])
     
+    def get_attack_version(self):
+        collections = self.enterprise_source.query([Filter('type', '=', 'x-mitre-collection')])
+        if len(collections) > 0:
+            return collections[0].get('x_mitre_version', None)
+        return None
+
+    def get_techniques_data_components(self):
+        '''
+        Get the names of the data components per technique, via the chain: technique <- detection strategy -> analytic
+        -> data component. The result is determined once per client.
+        :return: dictionary with the technique's STIX ID as key and a tuple with data component names as value
+        '''
+        if self._techniques_data_components is None:
+            dc_lookup = {dc['id']: dc for dc in self.get_data_components()}
+            detection_strategies_ids = {ds_item['id']: ds_item for ds_item in self.get_detection_strategies(False)}
+            analytics_ids = {a_item['id']: a_item for a_item in self.get_analytics(False)}
+
+            tech_dc_lookup = {}
+            for ds_rel in self.get_techniques_detection_strategy_relations():
+                detection_strategy = detection_strategies_ids[ds_rel['source_ref']]
+
+                for analytic_ref in detection_strategy.get('x_mitre_analytic_refs', []):
+                    analytic = analytics_ids[analytic_ref]
+
+                    for log_source_ref in analytic.get('x_mitre_log_source_references', []):
+                        data_component = dc_lookup[log_source_ref['x_mitre_data_component_ref']]
+                        tech_dc_lookup.setdefault(ds_rel['target_ref'], {})[data_component['name']] = None
+
+            self._techniques_data_components = {tech: tuple(dcs) for tech, dcs in tech_dc_lookup.items()}
+        return self._techniques_data_components
+
     def get_techniques(self):
         techniques = self.composite_source.query([Filter('type', '=', 'attack-pattern')])
         techniques = self.remove_revoked_deprecated(techniques)
@@ -7,6 +7,7 @@ APP_DESC = 'Detect Tactics, Techniques & Combat Threats'
 VERSION = '2.2.0'
 
 EXPIRE_TIME = 60 * 60 * 24 * 30
+ATTACK_SNAPSHOT_FILE = 'cache/attack-snapshot.sqlite'
 
 # MITRE ATT&CK data types for custom schema and STIX
 DATA_TYPE_CUSTOM_TECH_BY_GROUP = 'mitre_techniques_used_by_group'
@@ -25,6 +26,12 @@ DATA_TYPE_STIX_ALL_RELATIONSHIPS = 'mitre_all_relationships'
 DATA_TYPE_STIX_ALL_ENTERPRISE_MITIGATIONS = 'mitre_all_mitigations_enterprise'
 DATA_TYPE_STIX_ALL_MOBILE_MITIGATIONS = 'mitre_all_mitigations_mobile'
 DATA_TYPE_STIX_ALL_ICS_MITIGATIONS = 'mitre_all_mitigations_ics'
+DATA_TYPE_TAXII_COLLECTIONS = 'taxii_collections'
+DATA_TYPES_STIX = (DATA_TYPE_STIX_ALL_TECH, DATA_TYPE_STIX_ALL_TECH_ENTERPRISE, DATA_TYPE_STIX_ALL_TECH_ICS, DATA_TYPE_STIX_ALL_TECH_MOBILE,
+                   DATA_TYPE_STIX_ALL_GROUPS, DATA_TYPE_STIX_ALL_CAMPAIGNS, DATA_TYPE_STIX_ALL_SOFTWARE, DATA_TYPE_STIX_ALL_RELATIONSHIPS,
+                   DATA_TYPE_STIX_ALL_ENTERPRISE_MITIGATIONS, DATA_TYPE_STIX_ALL_MOBILE_MITIGATIONS, DATA_TYPE_STIX_ALL_ICS_MITIGATIONS)
+DATA_TYPES_CUSTOM = (DATA_TYPE_CUSTOM_TECH_BY_GROUP, DATA_TYPE_CUSTOM_TECH_BY_SOFTWARE, DATA_TYPE_CUSTOM_TECH_IN_CAMPAIGN,
+                     DATA_TYPE_CUSTOM_SOFTWARE_BY_GROUP, DATA_TYPE_CUSTOM_SOFTWARE_IN_CAMPAIGN)
 
 # ATT&CK matrix support:
 DETTECT_DOMAIN_SUPPORT = ['enterprise-attack', 'ics-attack', 'mobile-attack']
@@ -171,6 +178,29 @@ YAML_OBJ_TECHNIQUE = {'technique_id': '',
                       'detection': [YAML_OBJ_DETECTION],
                       'visibility': []}
 
+# Visibility update policy (used for the non-interactive visibility update)
+UPDATE_POLICY_CONFLICT_AUTO_ACCEPT = 'auto_accept'
+UPDATE_POLICY_CONFLICT_REPLACE = 'replace'
+UPDATE_POLICY_CONFLICT_KEEP = 'keep'
+UPDATE_POLICY_CONFLICT = [UPDATE_POLICY_CONFLICT_AUTO_ACCEPT, UPDATE_POLICY_CONFLICT_REPLACE, UPDATE_POLICY_CONFLICT_KEEP]
+UPDATE_POLICY_DEFAULT = {'comment': '',
+                         'auto_accept': {'auto_generated': True, 'manual': False},
+                         'conflict': UPDATE_POLICY_CONFLICT_AUTO_ACCEPT}
+
+# Batch generation of group heat maps: the key-value pairs of a layer within the manifest and their default value, and
+# the key-value pairs of which every value can be expanded into a layer of its own
+BATCH_LAYER_DEFAULT = {'groups': None, 'campaigns': None, 'overlay': None, 'overlay_type': OVERLAY_TYPE_GROUP,
+                       'platform': None, 'software': False, 'include_software': False, 'search': None,
+                       'search_visibility': None, 'search_detection': None, 'all_scores': False,
+                       'count_detections': False, 'layer_name': None, 'domain': None, 'layer_settings': {},
+                       'output_filename': None, 'expand': []}
+BATCH_LAYER_EXPAND = ['groups', 'campaigns', 'overlay', 'platform']
+
+# Data quality dimensions and their weight in the data quality score
+DATA_QUALITY_DIMENSIONS = ['device_completeness', 'data_field_completeness', 'timeliness', 'consistency', 'retention']
+DATA_QUALITY_WEIGHTS = {'device_completeness': 2, 'data_field_completeness': 2, 'timeliness': 1, 'consistency': 1,
+                        'retention': 2}
+
 # EQL
 EQL_INVALID_RESULT_DS = '[!] Invalid data source administration content. Check your EQL query to return data_sources object(s):'
 EQL_INVALID_RESULT_TECH = '[!] Invalid technique administration content. Check your EQL query to return '
@@ -189,24 +219,49 @@ PLATFORMS_MOBILE = {'android': 'Android', 'ios': 'iOS'}
 DATA_SOURCES_ATTACK_V8 = set(['Access tokens', 'Anti-virus', 'API monitoring', 'Application logs', 'Asset management', 'Authentication logs', 'AWS CloudTrail logs', 'AWS OS logs', 'Azure activity logs', 'Azure OS logs', 'Binary file metadata', 'BIOS', 'Browser extensions', 'Component firmware', 'Data loss prevention', 'Detonation chamber', 'Digital certificate logs', 'Disk forensics', 'DLL monitoring', 'DNS records', 'Domain registration', 'EFI', 'Email gateway', 'Environment variable', 'File monitoring', 'GCP audit logs', 'Host network interface', 'Kernel drivers', 'Loaded DLLs', 'Mail server', 'Malware reverse engineering', 'MBR', 'Named Pipes', 'Netflow/Enclave netflow', 'Network device command history',
                               'Network device configuration', 'Network device logs', 'Network device run-time memory', 'Network intrusion detection system', 'Network protocol analysis', 'OAuth audit logs', 'Office 365 account logs', 'Office 365 audit logs', 'Office 365 trace logs', 'Packet capture', 'PowerShell logs', 'Process command-line parameters', 'Process monitoring', 'Process use of network', 'Sensor health and status', 'Services', 'Social media monitoring', 'SSL/TLS certificates', 'SSL/TLS inspection', 'Stackdriver logs', 'System calls', 'Third-party application logs', 'User interface', 'VBR', 'Web application firewall logs', 'Web logs', 'Web proxy', 'Windows Error Reporting', 'Windows event logs', 'Windows Registry', 'WMI Objects'])
 
-DETTECT_DATA_SOURCES = {}
-with open(os.path.dirname(__file__) + '/data/dettect_data_sources.json', 'r') as input_file:
-    DETTECT_DATA_SOURCES = json.load(input_file)
-
-DATA_SOURCES_ENTERPRISE = {}
-DATA_SOURCES_ICS = {}
-DATA_SOURCES_MOBILE = {}
-DETTECT_DATA_SOURCES_PLATFORMS_ENTERPRISE = {}
-DETTECT_DATA_SOURCES_PLATFORMS_ICS = {}
-DETTECT_DATA_SOURCES_PLATFORMS_MOBILE = {}
-with open(os.path.dirname(__file__) + '/data/data_source_platforms.json', 'r') as input_file:
-    input_data = json.load(input_file)
-    DATA_SOURCES_ENTERPRISE = input_data['ATT&CK-Enterprise']
-    DATA_SOURCES_ICS = input_data['ATT&CK-ICS']
-    DATA_SOURCES_MOBILE = input_data['ATT&CK-Mobile']
-    DETTECT_DATA_SOURCES_PLATFORMS_ENTERPRISE = input_data['DeTT&CT-Enterprise']
-    DETTECT_DATA_SOURCES_PLATFORMS_ICS = input_data['DeTT&CT-ICS']
-    DETTECT_DATA_SOURCES_PLATFORMS_MOBILE = input_data['DeTT&CT-Mobile']
+# The JSON data files are loaded on first use and then cached for the duration of the process
+_data_file_cache = {}
+
+
+def _load_data_file(filename):
+    """
+    Load (and cache) a JSON file from the data directory.
+    :param filename: filename of the JSON file within the data directory
+    :return: the content of the JSON file
+    """
+    if filename not in _data_file_cache:
+        with open(os.path.dirname(__file__) + '/data/' + filename, 'r') as input_file:
+            _data_file_cache[filename] = json.load(input_file)
+    return _data_file_cache[filename]
+
+
+def get_dettect_data_sources():
+    """
+    Get the DeTT&CT data sources per technique (data/dettect_data_sources.json).
+    :return: list with dictionaries containing the keys technique_id and dettect_data_sources
+    """
+    return _load_data_file('dettect_data_sources.json')
+
+
+def get_data_sources_platforms(domain):
+    """
+    Get the ATT&CK data components per platform for the given domain (data/data_source_platforms.json).
+    :param domain: the specified domain (enterprise-attack, ics-attack or mobile-attack)
+    :return: dictionary with the platform as key and a list with data components as value
+    """
+    input_data = _load_data_file('data_source_platforms.json')
+    return input_data['ATT&CK-Enterprise'] if domain == 'enterprise-attack' else input_data['ATT&CK-ICS'] if domain == 'ics-attack' else input_data['ATT&CK-Mobile']
+
+
+def get_dettect_data_sources_platforms(domain):
+    """
+    Get the DeTT&CT data sources per platform for the given domain (data/data_source_platforms.json).
+    :param domain: the specified domain (enterprise-attack, ics-attack or mobile-attack)
+    :return: dictionary with the platform as key and a list with DeTT&CT data sources as value
+    """
+    input_data = _load_data_file('data_source_platforms.json')
+    return input_data['DeTT&CT-Enterprise'] if domain == 'enterprise-attack' else input_data['DeTT&CT-ICS'] if domain == 'ics-attack' else input_data['DeTT&CT-Mobile']
+
 
 ATTACK_VERSION = '19.1'
 ATTACK_LAYER_VERSION = '4.5'
@@ -0,0 +1,103 @@
+import numpy as np
+from constants import *
+
+_DATA_QUALITY_WEIGHTS = np.array([DATA_QUALITY_WEIGHTS[d] for d in DATA_QUALITY_DIMENSIONS])
+
+
+def calculate_data_quality_scores(my_ds):
+    """
+    Calculate the data quality score of all data source details objects at once. The data quality score is the weighted
+    mean of the data quality dimensions, see DATA_QUALITY_WEIGHTS. Dimensions that are missing in a details object are
+    left out of its score.
+    :param my_ds: the data sources from the data source administration file, see load_data_sources
+    :return: dictionary with per data source details object (row): the data source name, the details object, the
+    dimension scores (matrix row), the data quality score and if all dimensions have a score (enabled)
+    """
+    data_sources = []
+    details = []
+    for ds_name, ds_global in my_ds.items():
+        for ds in ds_global['data_source']:
+            data_sources.append(ds_name)
+            details.append(ds)
+
+    present = np.array([[d in ds['data_quality'] for d in DATA_QUALITY_DIMENSIONS] for ds in details],
+                       dtype=bool).reshape(len(details), len(DATA_QUALITY_DIMENSIONS))
+    dimensions = np.array([[ds['data_quality'].get(d, 0) for d in DATA_QUALITY_DIMENSIONS] for ds in details],
+                          dtype=float).reshape(len(details), len(DATA_QUALITY_DIMENSIONS))
+
+    weights = present @ _DATA_QUALITY_WEIGHTS
+    scores = np.divide(dimensions @ _DATA_QUALITY_WEIGHTS, weights, out=np.zeros(len(details)), where=weights > 0)
+
+    return {'data_sources': data_sources, 'details': details, 'dimensions': dimensions, 'scores': scores,
+            'enabled': (dimensions > 0).all(axis=1)}
+
+
+def calculate_data_quality_per_data_source(data_quality):
+    """
+    Calculate the mean data quality score of the details objects per data source
+    :param data_quality: the data quality scores, see calculate_data_quality_scores
+    :return: dictionary with the data source name as key and the mean data quality score as value
+    """
+    names = list(dict.fromkeys(data_quality['data_sources']))
+    ids = {name: i for i, name in enumerate(names)}
+    rows = np.array([ids[name] for name in data_quality['data_sources']], dtype=int)
+
+    sums = np.bincount(rows, weights=data_quality['scores'], minlength=len(names))
+    counts = np.bincount(rows, minlength=len(names))
+    return dict(zip(names, sums / np.maximum(counts, 1)))
+
+
+def calculate_data_quality_per_system(data_quality, systems):
+    """
+    Calculate the mean data quality score of the data source details objects that are applicable to a system
+    :param data_quality: the data quality scores, see calculate_data_quality_scores
+    :param systems: the systems from the data source administration file
+    :return: dictionary with the system's applicable_to value as key and the mean data quality score as value (NaN
+    when no data source is applicable to the system)
+    """
+    names = list(dict.fromkeys(s['applicable_to'] for s in systems))
+    ids = {name.lower(): i for i, name in enumerate(names)}
+
+    applicable = np.zeros((len(data_quality['details']), len(names)), dtype=bool)
+    for row, ds in enumerate(data_quality['details']):
+        for app_to in ds['applicable_to']:
+            if app_to is not None and app_to.lower() in ids:
+                applicable[row, ids[app_to.lower()]] = True
+
+    counts = applicable.sum(axis=0)
+    means = np.divide(data_quality['scores'] @ applicable, counts, out=np.full(len(names), np.nan), where=counts > 0)
+    return dict(zip(names, means))
+
+
+def _to_series(values, names):
+    """
+    Turn the values per snapshot into a series per name
+    :param values: list with per snapshot a dictionary with the name as key and the data quality score as value
+    :param names: the names to create a series for
+    :return: dictionary with per name a list of data quality scores, which is None when it is absent in the snapshot
+    """
+    return {name: [round(float(v[name]), 2) if name in v and not np.isnan(v[name]) else None for v in values]
+            for name in names}
+
+
+def calculate_data_quality_trend(snapshots):
+    """
+    Calculate the data quality trend per data source and per system over multiple snapshots of a data source
+    administration file
+    :param snapshots: list of snapshots ordered from old to new. A snapshot is a dictionary with the keys: label, date,
+    data_sources (see load_data_sources with filter_empty_scores=False) and systems
+    :return: dictionary with the snapshots (label and date), and per data source and per system a list with the mean
+    data quality score per snapshot
+    """
+    per_data_source = []
+    per_system = []
+    for snapshot in snapshots:
+        data_quality = calculate_data_quality_scores(snapshot['data_sources'])
+        per_data_source.append(calculate_data_quality_per_data_source(data_quality))
+        per_system.append(calculate_data_quality_per_system(data_quality, snapshot['systems']))
+
+    data_source_names = sorted(set(name for v in per_data_source for name in v))
+    system_names = list(dict.fromkeys(name for v in per_system for name in v))
+    return {'snapshots': [{'label': s['label'], 'date': s['date']} for s in snapshots],
+            'data_sources': _to_series(per_data_source, data_source_names),
+            'systems': _to_series(per_system, system_names)}
@@ -0,0 +1,301 @@
+import numpy as np
+from constants import *
+
+DATA_SOURCE_TYPE_ATTACK = 'attack'
+DATA_SOURCE_TYPE_DETTECT = 'dettect'
+
+
+def _get_id(ids, key):
+    """
+    Get the integer ID for the provided key, a new ID is assigned when the key does not have one yet
+    :param ids: dictionary with the keys and their integer IDs
+    :param key: the key
+    :return: integer ID
+    """
+    if key not in ids:
+        ids[key] = len(ids)
+    return ids[key]
+
+
+def _to_matrix(rows, row_count, column_count):
+    """
+    Create a boolean matrix
+    :param rows: list with per row an iterable of the column IDs which are True
+    :param row_count: number of rows
+    :param column_count: number of columns
+    :return: NumPy boolean matrix
+    """
+    matrix = np.zeros((row_count, column_count), dtype=bool)
+    for row, columns in enumerate(rows):
+        matrix[row, list(columns)] = True
+    return matrix
+
+
+def calculate_data_source_coverage(techniques, my_ds, systems, domain):
+    """
+    Calculate for every technique and system from the data source administration file how many of the technique's
+    (DeTT&CT) data sources are applicable to the system's platform(s), and how many of these are available for the
+    system. Data sources, platforms and systems are encoded as integer IDs, so that this can be calculated for all
+    techniques and systems at once with a few matrix multiplications.
+    :param techniques: list of ATT&CK techniques (with the keys data_components and dettect_data_sources)
+    :param my_ds: the data sources from the data source administration file, see load_data_sources
+    :param systems: the systems from the data source administration file
+    :param domain: the specified domain
+    :return: dictionary with the coverage matrices (technique x system) and the encoding of the data sources
+    """
+    ds_ids = {}  # {(DATA_SOURCE_TYPE_XX, name): id}
+    platform_ids = {}
+
+    # technique x data source: the columns are kept in the order of the technique's data sources
+    technique_columns = []
+    technique_platforms = []
+    for t in techniques:
+        technique_columns.append(list(dict.fromkeys(
+            [_get_id(ds_ids, (DATA_SOURCE_TYPE_ATTACK, ds)) for ds in t['data_components']] +
+            [_get_id(ds_ids, (DATA_SOURCE_TYPE_DETTECT, ds)) for ds in t['dettect_data_sources']])))
+        technique_platforms.append([_get_id(platform_ids, p) for p in t.get('x_mitre_platforms', [])])
+
+    # platform x data source: the data sources applicable to a platform
+    platform_data_sources = {}
+    for ds_type, data_sources_platforms in [(DATA_SOURCE_TYPE_ATTACK, get_data_sources_platforms(domain)),
+                                            (DATA_SOURCE_TYPE_DETTECT, get_dettect_data_sources_platforms(domain))]:
+        for platform, data_sources in data_sources_platforms.items():
+            platform_data_sources.setdefault(_get_id(platform_ids, platform), []).extend(
+                _get_id(ds_ids, (ds_type, ds)) for ds in data_sources)
+
+    # system x platform and system x available data source
+    system_platforms = [[_get_id(platform_ids, p) for p in system['platform']] for system in systems]
+    system_ids = {}
+    for i, system in enumerate(systems):
+        system_ids.setdefault(system['applicable_to'].lower(), []).append(i)
+    system_data_sources = [set() for _ in systems]
+    for (ds_type, ds), ds_id in ds_ids.items():
+        if ds in my_ds:
+            for ds_details in my_ds[ds]['data_source']:
+                for app_to in ds_details['applicable_to']:
+                    for i in system_ids.get(app_to.lower(), []):
+                        system_data_sources[i].add(ds_id)
+
+    tech_ds = _to_matrix(technique_columns, len(techniques), len(ds_ids))
+    tech_platform = _to_matrix(technique_platforms, len(techniques), len(platform_ids))
+    platform_ds = _to_matrix([platform_data_sources.get(p, []) for p in range(len(platform_ids))], len(platform_ids), len(ds_ids))
+    system_platform = _to_matrix(system_platforms, len(systems), len(platform_ids))
+    system_available = _to_matrix(system_data_sources, len(systems), len(ds_ids))
+
+    # system x data source: the data sources applicable to the system's platforms, and of these the available ones
+    system_applicable = (system_platform.astype(np.int32) @ platform_ds.astype(np.int32)) > 0
+    system_applicable_available = system_applicable & system_available
+
+    # technique x system: the counts are only relevant for systems that match the technique's ATT&CK platforms
+    platform_match = (tech_platform.astype(np.int32) @ system_platform.T.astype(np.int32)) > 0
+    total = (tech_ds.astype(np.int32) @ system_applicable.T.astype(np.int32)) * platform_match
+    available = (tech_ds.astype(np.int32) @ system_applicable_available.T.astype(np.int32)) * platform_match
+
+    return {'platform_match': platform_match, 'total': total, 'available': available,
+            'percentage': _calculate_percentage(total, available),
+            'data_sources': [key for key, _ in sorted(ds_ids.items(), key=lambda x: x[1])],
+            'technique_columns': technique_columns, 'technique_data_sources': tech_ds,
+            'system_applicable': system_applicable, 'system_applicable_available': system_applicable_available}
+
+
+def _calculate_percentage(total, available):
+    """
+    Calculate the percentage of available data sources
+    :param total: matrix (or array) with the number of applicable data sources
+    :param available: matrix (or array) with the number of available data sources
+    :return: matrix (or array) with the percentages, which is 0 when there are no applicable data sources
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(total > 0, (available / total) * 100, 0.0)
+
+
+def calculate_visibility_scores(total, available, platform_match):
+    """
+    Calculate the visibility scores based on the nr. of available data sources, as used within the generated technique
+    administration file: -1 when the technique is not applicable to the system or none of its data sources are
+    applicable to the system's platform(s), 0 when none of the applicable data sources are available, and 1 to 4
+    depending on the percentage of available data sources.
+    :param total: matrix (or array) with the number of applicable data sources
+    :param available: matrix (or array) with the number of available data sources
+    :param platform_match: matrix (or array) which is True when the technique is applicable to the system's platform(s)
+    :return: integer matrix (or array) with the visibility scores
+    """
+    percentage = _calculate_percentage(total, available)
+    scores = np.select([percentage <= 49, percentage <= 74, percentage <= 99], [1, 2, 3], 4)
+    scores = np.where(available > 0, scores, 0)
+    return np.where(platform_match & (total > 0), scores, -1)
+
+
+def get_available_data_sources(coverage, tech_idx, system_idx):
+    """
+    Get the technique's data sources that are applicable and available for the system
+    :param coverage: the result of calculate_data_source_coverage
+    :param tech_idx: index of the technique
+    :param system_idx: index of the system
+    :return: list of (DeTT&CT) data source names, in the order as listed for the technique
+    """
+    available = coverage['system_applicable_available'][system_idx]
+    return [coverage['data_sources'][ds_id][1] for ds_id in coverage['technique_columns'][tech_idx] if available[ds_id]]
+
+
+def get_applicable_data_sources(coverage, tech_idx, system_idx, ds_type):
+    """
+    Get the technique's ATT&CK or DeTT&CT data sources that are applicable to the system's platform(s)
+    :param coverage: the result of calculate_data_source_coverage
+    :param tech_idx: index of the technique
+    :param system_idx: index of the system
+    :param ds_type: DATA_SOURCE_TYPE_ATTACK or DATA_SOURCE_TYPE_DETTECT
+    :return: sorted list of data source names
+    """
+    applicable = coverage['system_applicable'][system_idx]
+    return sorted(coverage['data_sources'][ds_id][1] for ds_id in coverage['technique_columns'][tech_idx]
+                  if applicable[ds_id] and coverage['data_sources'][ds_id][0] == ds_type)
+
+
+def build_data_source_technique_index(coverage):
+    """
+    Build the reverse index from data sources to techniques
+    :param coverage: the result of calculate_data_source_coverage
+    :return: list with per data source ID an array with the indexes of the techniques having that data source
+    """
+    return [np.flatnonzero(column) for column in coverage['technique_data_sources'].T]
+
+
+def get_data_source_id(coverage, name):
+    """
+    Get the ID of an ATT&CK data component or DeTT&CT data source
+    :param coverage: the result of calculate_data_source_coverage
+    :param name: the name of the data source (case insensitive)
+    :return: the data source ID or None when none of the techniques and platforms have this data source
+    """
+    for ds_id, (_, ds_name) in enumerate(coverage['data_sources']):
+        if ds_name.lower() == name.lower():
+            return ds_id
+    return None
+
+
+def get_onboarding_candidates(coverage):
+    """
+    Get all data source / system combinations for which onboarding the data source can improve the visibility: the data
+    source is applicable to the system's platform(s), not yet available for the system and used by a technique
+    :param coverage: the result of calculate_data_source_coverage
+    :return: list of (data source ID, system index)
+    """
+    used = coverage['technique_data_sources'].any(axis=0)
+    candidates = coverage['system_applicable'] & ~coverage['system_applicable_available'] & used
+    return [(int(ds_id), int(system_idx)) for system_idx, ds_id in np.argwhere(candidates)]
+
+
+def _new_simulation_state(coverage):
+    """
+    Create the state for a what-if simulation, which is changed when data sources are onboarded
+    :param coverage: the result of calculate_data_source_coverage
+    :return: dictionary with the available data sources and the visibility scores
+    """
+    return {'available': coverage['available'].copy(),
+            'system_applicable_available': coverage['system_applicable_available'].copy(),
+            'scores': calculate_visibility_scores(coverage['total'], coverage['available'], coverage['platform_match'])}
+
+
+def _get_onboarding_effect(coverage, state, index, included, ds_id, system_idx):
+    """
+    Recalculate the visibility scores of only the techniques affected by onboarding a data source on a system
+    :param coverage: the result of calculate_data_source_coverage
+    :param state: the simulation state, see _new_simulation_state
+    :param index: the reverse index, see build_data_source_technique_index
+    :param included: boolean array which is False for techniques that are excluded from scoring
+    :param ds_id: the data source ID
+    :param system_idx: the system index
+    :return: tuple with the affected technique indexes, their old scores and their new scores
+    """
+    if not coverage['system_applicable'][system_idx, ds_id] or state['system_applicable_available'][system_idx, ds_id]:
+        techs = np.zeros(0, dtype=np.intp)
+    else:
+        techs = index[ds_id]
+        techs = techs[coverage['platform_match'][techs, system_idx] & included[techs]]
+
+    old_scores = state['scores'][techs, system_idx]
+    new_scores = calculate_visibility_scores(coverage['total'][techs, system_idx], state['available'][techs, system_idx] + 1,
+                                             coverage['platform_match'][techs, system_idx])
+    return techs, old_scores, new_scores
+
+
+def _get_onboarding_result(coverage, ds_id, system_idx, techs, old_scores, new_scores):
+    """
+    Summarise the effect of onboarding a data source on a system
+    :param coverage: the result of calculate_data_source_coverage
+    :param ds_id: the data source ID
+    :param system_idx: the system index
+    :param techs: the affected technique indexes
+    :param old_scores: the old visibility scores of the affected techniques
+    :param new_scores: the new visibility scores of the affected techniques
+    :return: dictionary with the result
+    """
+    return {'data_source': coverage['data_sources'][ds_id][1],
+            'data_source_type': coverage['data_sources'][ds_id][0],
+            'system_idx': system_idx,
+            'techniques_affected': len(techs),
+            'techniques_improved': techs[new_scores > old_scores].tolist(),
+            'techniques_gained': int(((old_scores <= 0) & (new_scores > 0)).sum()),
+            'score_gain': int((new_scores - old_scores).sum())}
+
+
+def rank_onboarding_candidates(coverage, candidates=None, excluded=None):
+    """
+    Rank candidate onboarding actions by their marginal coverage gain. Every candidate is evaluated against the current
+    data source administration, and only the scores of the techniques having the candidate's data source are
+    recalculated.
+    :param coverage: the result of calculate_data_source_coverage
+    :param candidates: list of (data source ID, system index), by default all candidates from get_onboarding_candidates
+    :param excluded: indexes of the techniques that are excluded from scoring (e.g. the exceptions)
+    :return: list with the result per candidate, sorted on the highest visibility score gain and techniques gained
+    """
+    if candidates is None:
+        candidates = get_onboarding_candidates(coverage)
+    index = build_data_source_technique_index(coverage)
+    included = np.ones(len(coverage['technique_columns']), dtype=bool)
+    included[list(excluded or [])] = False
+    state = _new_simulation_state(coverage)
+
+    results = [_get_onboarding_result(coverage, ds_id, system_idx,
+                                      *_get_onboarding_effect(coverage, state, index, included, ds_id, system_idx))
+               for ds_id, system_idx in candidates]
+    return sorted(results, key=lambda r: (-r['score_gain'], -r['techniques_gained'], r['data_source'], r['system_idx']))
+
+
+def simulate_onboarding(coverage, changes, excluded=None):
+    """
+    Simulate onboarding data sources on systems. The changes are applied one after the other, so the result per change
+    is its gain on top of the previous changes.
+    :param coverage: the result of calculate_data_source_coverage
+    :param changes: list of (data source ID, system index)
+    :param excluded: indexes of the techniques that are excluded from scoring (e.g. the exceptions)
+    :return: tuple with the result per change and the visibility scores (technique x system) after all changes
+    """
+    index = build_data_source_technique_index(coverage)
+    included = np.ones(len(coverage['technique_columns']), dtype=bool)
+    included[list(excluded or [])] = False
+    state = _new_simulation_state(coverage)
+
+    results = []
+    for ds_id, system_idx in changes:
+        techs, old_scores, new_scores = _get_onboarding_effect(coverage, state, index, included, ds_id, system_idx)
+        results.append(_get_onboarding_result(coverage, ds_id, system_idx, techs, old_scores, new_scores))
+
+        state['system_applicable_available'][system_idx, ds_id] |= coverage['system_applicable'][system_idx, ds_id]
+        state['available'][techs, system_idx] += 1
+        state['scores'][techs, system_idx] = new_scores
+
+    return results, state['scores']
+
+
+def calculate_technique_coverage(coverage):
+    """
+    Calculate per technique the average percentage of available data sources over the systems that match the
+    technique's ATT&CK platform(s), as used for the color in the data source layer
+    :param coverage: the result of calculate_data_source_coverage
+    :return: array with the average percentage per technique, which is 0 when no system matches the technique
+    """
+    system_count = coverage['platform_match'].sum(axis=1)
+    percentage_sum = np.where(coverage['platform_match'], coverage['percentage'], 0.0).sum(axis=1)
+    return np.where(system_count > 0, percentage_sum / np.maximum(system_count, 1), 0.0)
@@ -1,65 +1,61 @@
 import xlsxwriter
 import simplejson
+import numpy as np
+import re
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import redirect_stdout
 from copy import deepcopy
 from datetime import datetime
+from glob import glob
+from io import StringIO
 from itertools import chain
+from textwrap import wrap
 from generic import *
 from file_output import *
 from navigator_layer import *
+from data_source_coverage import *
+from data_quality import *
 # Imports for pandas and plotly are because of performance reasons in the function that uses these libraries.
 
 
-def _count_applicable_data_sources(technique, applicable_data_sources, applicable_dettect_data_sources):
+def load_data_source_model(filename, attack_data=True):
     """
-    get the count of applicable (DeTT&CT) data sources for the provided technique.
-    This takes into account which data sources are applicable for a platform(s).
-    :param technique: ATT&CK CTI technique object
-    :param applicable_data_sources: a list of applicable ATT&CK data sources
-    :param applicable_dettect_data_sources: a list of applicable DeTT&CT data sources
-    :return: a count of the applicable data sources for this technique
+    Load everything the data source outputs (layer, Excel, graph and technique administration YAML file) are based on:
+    the data source administration file, the ATT&CK techniques and the data source coverage. This allows to load and
+    score it once and share it between all requested outputs.
+    :param filename: the filename of the YAML file containing the data sources administration or a dict
+    :param attack_data: also load the ATT&CK techniques and calculate the data source coverage
+    :return: dictionary with the data source model
     """
-    applicable_ds_count = 0
-
-    for ds in technique['data_components']:
-        if ds in applicable_data_sources:
-            applicable_ds_count += 1
+    my_ds, name, systems, exceptions, domain = load_data_sources(filename)
+    model = {'data_sources': my_ds, 'all_data_sources': load_data_sources(filename, filter_empty_scores=False)[0],
+             'name': name, 'systems': systems, 'exceptions': exceptions, 'domain': domain, 'techniques': None,
+             'coverage': None}
 
-    for ds in technique['dettect_data_sources']:
-        if ds in applicable_dettect_data_sources:
-            applicable_ds_count += 1
+    if attack_data:
+        model['techniques'] = load_attack_data(DATA_TYPE_STIX_ALL_TECH_ENTERPRISE if domain == 'enterprise-attack' else
+                                               DATA_TYPE_STIX_ALL_TECH_ICS if domain == 'ics-attack' else DATA_TYPE_STIX_ALL_TECH_MOBILE)
+        model['coverage'] = calculate_data_source_coverage(model['techniques'], my_ds, systems, domain)
 
-    return applicable_ds_count
+    return model
 
 
-def _system_in_data_source_details_object(data_source, system):
-    """
-    Checks if the provided system is present within the provided YAML global data source object
-    :param data_source: YAML data source object
-    :param system: YAML system object
-    :return: True if present otherwise False
-    """
-    for ds in data_source['data_source']:
-        if system['applicable_to'].lower() in (app_to.lower() for app_to in ds['applicable_to']):
-            return True
-    return False
-
-
-def _map_and_colorize_techniques(my_ds, systems, exceptions, domain, layer_settings):
+def _map_and_colorize_techniques(model, layer_settings):
     """
     Determine the color of the technique based on how many data sources are available per technique. Also, it will
     create much of the content for the Navigator layer.
-    :param my_ds: the configured data sources
-    :param systems: the systems YAML object from the data source file
-    :param exceptions: the list of ATT&CK technique exception within the data source YAML file
-    :param domain: the specified domain
+    :param model: the data source model, see load_data_source_model
     :param layer_settings: settings for the Navigator layer
     :return: a dictionary with techniques that can be used in the layer's output file
     """
-    techniques = load_attack_data(DATA_TYPE_STIX_ALL_TECH_ENTERPRISE if domain ==
-                                  'enterprise-attack' else DATA_TYPE_STIX_ALL_TECH_ICS if domain == 'ics-attack' else DATA_TYPE_STIX_ALL_TECH_MOBILE)
+    techniques = model['techniques']
+    systems = model['systems']
+    coverage = model['coverage']
     output_techniques = []
+    exceptions = set(map(lambda x: x.upper(), model['exceptions']))
 
-    for t in techniques:
+    for tech_idx, t in enumerate(techniques):
         tech_id = t['technique_id']
         
         tactics = []
@@ -70,47 +66,12 @@ def _map_and_colorize_techniques(my_ds, systems, exceptions, domain, layer_setti
         else:
             tactics.append(None)
         
-        if tech_id not in list(map(lambda x: x.upper(), exceptions)):
-            scores_idx = 0
-            ds_scores = []
-            system_available_data_sources = {}
-
-            # calculate visibility score per system
-            for system in systems:
-                # the system is relevant for this technique due to a match in ATT&CK platform
-                if len(set(system['platform']).intersection(set(t['x_mitre_platforms']))) > 0:
-                    applicable_data_sources = get_applicable_data_sources_platform(system['platform'], domain)
-                    applicable_dettect_data_sources = get_applicable_dettect_data_sources_platform(system['platform'], domain)
-                    total_ds_count = _count_applicable_data_sources(t, applicable_data_sources, applicable_dettect_data_sources)
-
-                    if total_ds_count > 0:  # the system's platform has a data source applicable to this technique
-                        ds_count = 0
-                        for ds in t['data_components']:
-                            # the ATT&CK data source is applicable to this system and available
-                            if ds in applicable_data_sources and ds in my_ds.keys() and _system_in_data_source_details_object(my_ds[ds], system):
-                                if ds_count == 0:
-                                    system_available_data_sources[scores_idx] = [ds]
-                                else:
-                                    system_available_data_sources[scores_idx].append(ds)
-                                ds_count += 1
-
-                        for cdc in t['dettect_data_sources']:
-                            if cdc in applicable_dettect_data_sources and cdc in my_ds.keys() and _system_in_data_source_details_object(my_ds[cdc], system):
-                                if ds_count == 0:
-                                    system_available_data_sources[scores_idx] = [cdc]
-                                else:
-                                    system_available_data_sources[scores_idx].append(cdc)
-                                ds_count += 1
-
-                        if ds_count > 0:
-                            ds_scores.append((float(ds_count) / float(total_ds_count)) * 100)
-                        else:
-                            ds_scores.append(0)  # none of the applicable data sources are available for this system
-                    else:
-                        # the technique is applicable to this system (and thus its platform(s)),
-                        # but none of the technique's listed data source are applicable for its platform(s)
-                        ds_scores.append(0)
-                    scores_idx += 1
+        if tech_id not in exceptions:
+            # the systems which are relevant for this technique due to a match in ATT&CK platform
+            system_idxs = coverage['platform_match'][tech_idx].nonzero()[0].tolist()
+            # visibility score per system. It is 0 when none of the technique's listed data sources are applicable for
+            # the system's platform(s)
+            ds_scores = coverage['percentage'][tech_idx, system_idxs].tolist()
 
             # Populate the metadata.
             avg_ds_score = 0
@@ -129,34 +90,26 @@ def _map_and_colorize_techniques(my_ds, systems, exceptions, domain, layer_setti
             d['metadata'] = []
 
             if 'showMetadata' not in layer_settings.keys() or ('showMetadata' in layer_settings.keys() and str(layer_settings['showMetadata']) == 'True'):
-                scores_idx = 0
-                divider = 0
-                for system in systems:
-                    # the system is relevant for this technique due to a match in ATT&CK platform
-                    if len(set(system['platform']).intersection(set(t['x_mitre_platforms']))) > 0:
-                        score = ds_scores[scores_idx]
-
-                        if divider != 0:
-                            d['metadata'].append({'divider': True})
-                        divider += 1
-
-                        d['metadata'].append({'name': 'Applicable to', 'value': system['applicable_to']})
-
-                        app_data_sources = sorted(get_applicable_data_sources_technique(
-                            t['data_components'], get_applicable_data_sources_platform(system['platform'], domain)))
-                        app_dettect_data_sources = sorted(get_applicable_dettect_data_sources_technique(
-                            t['dettect_data_sources'], get_applicable_dettect_data_sources_platform(system['platform'], domain)))
-
-                        if score > 0:
-                            d['metadata'].append({'name': 'Available data sources', 'value': ', '.join(
-                                system_available_data_sources[scores_idx])})
-                        else:
-                            d['metadata'].append({'name': 'Available data sources', 'value': ''})
-
-                        d['metadata'].append({'name': 'ATT&CK data sources', 'value': ', '.join(app_data_sources)})
-                        d['metadata'].append({'name': 'DeTT&CT data sources', 'value': ', '.join(app_dettect_data_sources)})
-                        d['metadata'].append({'name': 'Score', 'value': str(int(score)) + '%'})
-                        scores_idx += 1
+                for scores_idx, system_idx in enumerate(system_idxs):
+                    score = ds_scores[scores_idx]
+
+                    if scores_idx != 0:
+                        d['metadata'].append({'divider': True})
+
+                    d['metadata'].append({'name': 'Applicable to', 'value': systems[system_idx]['applicable_to']})
+
+                    app_data_sources = get_applicable_data_sources(coverage, tech_idx, system_idx, DATA_SOURCE_TYPE_ATTACK)
+                    app_dettect_data_sources = get_applicable_data_sources(coverage, tech_idx, system_idx, DATA_SOURCE_TYPE_DETTECT)
+
+                    if score > 0:
+                        d['metadata'].append({'name': 'Available data sources', 'value': ', '.join(
+                            get_available_data_sources(coverage, tech_idx, system_idx))})
+                    else:
+                        d['metadata'].append({'name': 'Available data sources', 'value': ''})
+
+                    d['metadata'].append({'name': 'ATT&CK data sources', 'value': ', '.join(app_data_sources)})
+                    d['metadata'].append({'name': 'DeTT&CT data sources', 'value': ', '.join(app_dettect_data_sources)})
+                    d['metadata'].append({'name': 'Score', 'value': str(int(score)) + '%'})
 
                 d['metadata'] = make_layer_metadata_compliant(d['metadata'])
 
@@ -196,7 +149,7 @@ def _get_technique_yaml_obj(techniques, tech_id):
             return tech
 
 
-def generate_data_sources_layer(filename, output_filename, output_overwrite, layer_name, layer_settings):
+def generate_data_sources_layer(filename, output_filename, output_overwrite, layer_name, layer_settings, model=None):
     """
     Generates a generic layer for data sources.
     :param filename: the filename of the YAML file containing the data sources administration
@@ -204,12 +157,15 @@ def generate_data_sources_layer(filename, output_filename, output_overwrite, lay
     :param output_overwrite: boolean flag indicating whether we're in overwrite mode
     :param layer_name: the name of the Navigator layer
     :param layer_settings: settings for the Navigator layer
+    :param model: an already loaded data source model (optional), see load_data_source_model
     :return:
     """
-    my_data_sources, name, systems, exceptions, domain = load_data_sources(filename)
+    if model is None:
+        model = load_data_source_model(filename)
+    name, systems, domain = model['name'], model['systems'], model['domain']
 
     # Do the mapping between my data sources and MITRE data sources:
-    my_techniques = _map_and_colorize_techniques(my_data_sources, systems, exceptions, domain, layer_settings)
+    my_techniques = _map_and_colorize_techniques(model, layer_settings)
 
     if not layer_name:
         layer_name = 'Data sources ' + name
@@ -224,15 +180,18 @@ def generate_data_sources_layer(filename, output_filename, output_overwrite, lay
     write_file(output_filename, output_overwrite, json_string)
 
 
-def plot_data_sources_graph(filename, output_filename, output_overwrite):
+def plot_data_sources_graph(filename, output_filename, output_overwrite, model=None):
     """
     Generates a line graph which shows the improvements on numbers of data sources through time.
     :param filename: the filename of the YAML file containing the data sources administration
     :param output_filename: the output filename defined by the user
     :param output_overwrite: boolean flag indicating whether we're in overwrite mode
+    :param model: an already loaded data source model (optional), see load_data_source_model
     :return:
     """
-    my_data_sources, name, _, _, _ = load_data_sources(filename)
+    if model is None:
+        model = load_data_source_model(filename, attack_data=False)
+    my_data_sources, name = model['data_sources'], model['name']
 
     graph_values = []
     for ds_global, ds_detail in my_data_sources.items():
@@ -271,7 +230,7 @@ def plot_data_sources_graph(filename, output_filename, output_overwrite):
         print('[!] Error while writing graph file: %s' % str(e))
 
 
-def export_data_source_list_to_excel(filename, output_filename, output_overwrite, eql_search=False):
+def export_data_source_list_to_excel(filename, output_filename, output_overwrite, eql_search=False, model=None):
     """
     Makes an overview of all MITRE ATT&CK data sources (via techniques) and lists which data sources are present
     in the YAML administration including all properties and data quality score.
@@ -279,10 +238,13 @@ def export_data_source_list_to_excel(filename, output_filename, output_overwrite
     :param output_filename: the output filename defined by the user
     :param output_overwrite: boolean flag indicating whether we're in overwrite mode
     :param eql_search: specify if an EQL search was performed which may have resulted in missing ATT&CK data sources
+    :param model: an already loaded data source model (optional), see load_data_source_model
     :return:
     """
+    if model is None:
+        model = load_data_source_model(filename, attack_data=False)
     # pylint: disable=unused-variable
-    my_data_sources, name, systems, _, domain = load_data_sources(filename, filter_empty_scores=False)
+    my_data_sources, name, systems, domain = model['all_data_sources'], model['name'], model['systems'], model['domain']
     my_data_sources = dict(sorted(my_data_sources.items(), key=lambda kv: kv[0], reverse=False))
 
     if not output_filename:
@@ -298,7 +260,8 @@ def export_data_source_list_to_excel(filename, output_filename, output_overwrite
     else:
         excel_filename = use_existing_filename(output_filename, 'xlsx')
 
-    workbook = xlsxwriter.Workbook(excel_filename)
+    # rows are written in order, so every row can be flushed to disk directly
+    workbook = xlsxwriter.Workbook(excel_filename, {'constant_memory': True})
     worksheet = workbook.add_worksheet('Data sources')
 
     # Formatting:
@@ -360,52 +323,36 @@ def export_data_source_list_to_excel(filename, output_filename, output_overwrite
     # Putting the data sources data:
     y += 1
 
-    for ds_global, ds_detail in my_data_sources.items():
-
-        for ds in ds_detail['data_source']:
-            worksheet.write(y, 0, ds_global, valign_top)
-
-            date_registered = ds['date_registered'].strftime('%Y-%m-%d') if isinstance(ds['date_registered'], datetime) else ds['date_registered']
-            date_connected = ds['date_connected'].strftime('%Y-%m-%d') if isinstance(ds['date_connected'], datetime) else ds['date_connected']
-
-            worksheet.write(y, 1, ', '.join(ds['applicable_to']), wrap_text)
-            worksheet.write(y, 2, str(date_registered).replace('None', ''), valign_top)
-            worksheet.write(y, 3, str(date_connected).replace('None', ''), valign_top)
-            worksheet.write(y, 4, ', '.join(ds['products']).replace('None', ''), valign_top)
-            worksheet.write(y, 5, ds['comment'][:-1] if ds['comment'].endswith('\n') else ds['comment'], wrap_text)
-            worksheet.write(y, 6, str(ds['available_for_data_analytics']), valign_top)
-            worksheet.write(y, 7, ds['data_quality']['device_completeness'], format_center_valign_top)
-            worksheet.write(y, 8, ds['data_quality']['data_field_completeness'], format_center_valign_top)
-            worksheet.write(y, 9, ds['data_quality']['timeliness'], format_center_valign_top)
-            worksheet.write(y, 10, ds['data_quality']['consistency'], format_center_valign_top)
-            worksheet.write(y, 11, ds['data_quality']['retention'], format_center_valign_top)
-            # Column 12 with calculated score below
-            worksheet.write(y, 13, "True" if ds['data_quality']['device_completeness'] > 0 and ds['data_quality']['data_field_completeness'] > 0 and ds['data_quality']['timeliness'] > 0 and ds['data_quality']['consistency'] > 0 and ds['data_quality']['retention'] > 0 else "False", format_center_valign_top)
-            # Column 14 with key/value pairs below
-
-            # Calculate data quality score
-            score = 0
-            score_count = 0
-            for k, v in ds['data_quality'].items():
-                # the below DQ dimensions are given more weight in the calculation of the DQ score.
-                if k in ['device_completeness', 'data_field_completeness', 'retention']:
-                    score += (v * 2)
-                    score_count += 2
-                else:
-                    score += v
-                    score_count += 1
-            if score > 0:
-                score = score / score_count
-            worksheet.write(y, 12, score, dq_score_0 if score == 0 else dq_score_1 if score < 2 else dq_score_2 if score < 3 else dq_score_3 if score < 4 else dq_score_4 if score < 5 else dq_score_5 if score < 6 else no_score)  # noqa
-            
-            # Add key/value pairs
-            kv = []
-            for key in ds.keys():
-                if key not in ('applicable_to', 'date_registered', 'date_connected', 'products', 'available_for_data_analytics', 'comment', 'data_quality'):
-                    kv.append(f'{key}={ds[key]}')
-            worksheet.write(y, 14, ', '.join(kv), wrap_text)
-            
-            y += 1
+    data_quality = calculate_data_quality_scores(my_data_sources)
+    for ds_global, ds, score, enabled in zip(data_quality['data_sources'], data_quality['details'], data_quality['scores'],
+                                             data_quality['enabled']):
+        worksheet.write(y, 0, ds_global, valign_top)
+
+        date_registered = ds['date_registered'].strftime('%Y-%m-%d') if isinstance(ds['date_registered'], datetime) else ds['date_registered']
+        date_connected = ds['date_connected'].strftime('%Y-%m-%d') if isinstance(ds['date_connected'], datetime) else ds['date_connected']
+
+        worksheet.write(y, 1, ', '.join(ds['applicable_to']), wrap_text)
+        worksheet.write(y, 2, str(date_registered).replace('None', ''), valign_top)
+        worksheet.write(y, 3, str(date_connected).replace('None', ''), valign_top)
+        worksheet.write(y, 4, ', '.join(ds['products']).replace('None', ''), valign_top)
+        worksheet.write(y, 5, ds['comment'][:-1] if ds['comment'].endswith('\n') else ds['comment'], wrap_text)
+        worksheet.write(y, 6, str(ds['available_for_data_analytics']), valign_top)
+        worksheet.write(y, 7, ds['data_quality']['device_completeness'], format_center_valign_top)
+        worksheet.write(y, 8, ds['data_quality']['data_field_completeness'], format_center_valign_top)
+        worksheet.write(y, 9, ds['data_quality']['timeliness'], format_center_valign_top)
+        worksheet.write(y, 10, ds['data_quality']['consistency'], format_center_valign_top)
+        worksheet.write(y, 11, ds['data_quality']['retention'], format_center_valign_top)
+        worksheet.write(y, 12, score, dq_score_0 if score == 0 else dq_score_1 if score < 2 else dq_score_2 if score < 3 else dq_score_3 if score < 4 else dq_score_4 if score < 5 else dq_score_5 if score < 6 else no_score)  # noqa
+        worksheet.write(y, 13, str(enabled), format_center_valign_top)
+
+        # Add key/value pairs
+        kv = []
+        for key in ds.keys():
+            if key not in ('applicable_to', 'date_registered', 'date_connected', 'products', 'available_for_data_analytics', 'comment', 'data_quality'):
+                kv.append(f'{key}={ds[key]}')
+        worksheet.write(y, 14, ', '.join(kv), wrap_text)
+        
+        y += 1
 
     try:
         workbook.close()
@@ -523,30 +470,20 @@ def _add_visibility_object_to_dict(dict_vis_objects, tech_id, vis_obj):
     return dict_vis_objects
 
 
-def update_technique_administration_file(file_data_sources, file_tech_admin, output_overwrite):
+def _check_visibility_update(platform_tech_admin, domain_tech_admin, tech_visibility, new_platform, systems, domain):
     """
-    Update the visibility scores in the provided technique administration file
-    :param file_data_sources: file location of the data source admin. file
-    :param file_tech_admin: file location of the tech. admin. file
-    :param output_overwrite: boolean flag indicating whether we're in overwrite mode
-    :return:
+    Check if the technique administration file can be updated with the visibility scores from the data source
+    administration file. The reason why it cannot be updated is printed to stdout.
+    :param platform_tech_admin: the platform(s) of the technique administration file
+    :param domain_tech_admin: the domain of the technique administration file
+    :param tech_visibility: iterable with (technique ID, visibility objects) from the technique administration file
+    :param new_platform: the platform(s) from the data source administration 'systems' key-value pair
+    :param systems: the systems from the data source administration file
+    :param domain: the domain of the data source administration file
+    :return: True if the update can continue, otherwise False
     """
-    file_updated = False
-
-    # first we generate the new visibility scores contained within a temporary tech. admin YAML 'file'
-    new_visibility_scores = generate_technique_administration_file(file_data_sources, None, output_overwrite, write_file=False, all_techniques=True)
-
-    # we get the date to remove the single quotes from the date at the end of of this function's code
-    today = new_visibility_scores['techniques'][0]['visibility'][0]['score_logbook'][0]['date']
-
-    # next, we load the current visibility scores from the tech. admin file
-    cur_visibility_scores, _, platform_tech_admin, domain_tech_admin = load_techniques(file_tech_admin)
-
-    # last, we get the systems kv-pair from the data source file
-    _, _, systems, _, domain = load_data_sources(file_data_sources)
-
     # if the tech admin. file has a platform not present in the DS admin. file we return
-    if len(set(platform_tech_admin).difference(set(new_visibility_scores['platform']))) > 0:
+    if len(set(platform_tech_admin).difference(set(new_platform))) > 0:
         print('[!] The technique administration file\'s key-value pair \'platform\' has ATT&CK platform(s) that are not '
               'part of the data source administration \'systems\' key-value pair. This should be fixed before the '
               'visibility update can continue.')
@@ -555,15 +492,13 @@ def update_technique_administration_file(file_data_sources, file_tech_admin, out
             print('      - ' + p)
         print('')
         _print_ds_systems(systems)
-        print('\nVisibility update canceled.')
-
-        return
+        return False
 
     # if the tech admin. file has an applicable_to value not present in the DS admin. file we return
     app_ds = set([s['applicable_to'].lower() for s in systems])
     app_tech = {}  # applicable_to: {app_to: ..., tech_ids: ...} - we have app_to in here to preserve the casing when printing
-    for tech_id, v in cur_visibility_scores.items():
-        for vis in v['visibility']:
+    for tech_id, visibility in tech_visibility:
+        for vis in visibility:
             for a in vis['applicable_to']:
                 a_low = a.lower()
                 if a_low != 'all':
@@ -577,9 +512,7 @@ def update_technique_administration_file(file_data_sources, file_tech_admin, out
     if domain != domain_tech_admin:
         print('[!] The technique administration file has another value for \'domain\' than the value for \'domain\' in '
               'the data source administration file. This should be fixed before the visibility update can continue.')
-        print('\nVisibility update canceled.')
-
-        return
+        return False
 
     if len(set(app_tech).difference(app_ds)) > 0:
         print('[!] The technique administration file has visibility objects with \'applicable_to\' values that are not '
@@ -591,8 +524,37 @@ def update_technique_administration_file(file_data_sources, file_tech_admin, out
             print('        Used in technique(s): ' + ', '.join(v['tech_id']) + '\n')
         print('')
         _print_ds_systems(systems)
-        print('\nVisibility update canceled.')
+        return False
+
+    return True
 
+
+def update_technique_administration_file(file_data_sources, file_tech_admin, output_overwrite):
+    """
+    Update the visibility scores in the provided technique administration file
+    :param file_data_sources: file location of the data source admin. file
+    :param file_tech_admin: file location of the tech. admin. file
+    :param output_overwrite: boolean flag indicating whether we're in overwrite mode
+    :return:
+    """
+    file_updated = False
+
+    # first we generate the new visibility scores contained within a temporary tech. admin YAML 'file'
+    new_visibility_scores = generate_technique_administration_file(file_data_sources, None, output_overwrite, write_file=False, all_techniques=True)
+
+    # we get the date to remove the single quotes from the date at the end of of this function's code
+    today = new_visibility_scores['techniques'][0]['visibility'][0]['score_logbook'][0]['date']
+
+    # next, we load the current visibility scores from the tech. admin file
+    cur_visibility_scores, _, platform_tech_admin, domain_tech_admin = load_techniques(file_tech_admin)
+
+    # last, we get the systems kv-pair from the data source file
+    _, _, systems, _, domain = load_data_sources(file_data_sources)
+
+    if not _check_visibility_update(platform_tech_admin, domain_tech_admin,
+                                    ((tech_id, v['visibility']) for tech_id, v in cur_visibility_scores.items()),
+                                    new_visibility_scores['platform'], systems, domain):
+        print('\nVisibility update canceled.')
         return
 
     # we did not return, so init and start the upgrade :-)
@@ -903,10 +865,254 @@ def update_technique_administration_file(file_data_sources, file_tech_admin, out
     else:
         print('No visibility scores have been updated.')
 
+
+def load_update_policy(filename):
+    """
+    Load the policy for the non-interactive visibility update. Key-value pairs missing in the policy file get their
+    default value from UPDATE_POLICY_DEFAULT.
+    :param filename: file location of the policy YAML file
+    :return: the policy as a dictionary, or None when the policy file is invalid
+    """
+    if not os.path.exists(filename):
+        print('[!] The update policy file does not exist: ' + filename)
+        return None
+
+    try:
+        yaml_content = load_yaml_file(filename) or {}
+    except Exception as e:
+        print('[!] Error while loading the update policy file: ' + str(e))
+        return None
+
+    policy = deepcopy(UPDATE_POLICY_DEFAULT)
+    if not isinstance(yaml_content, dict) or not set(yaml_content).issubset(policy):
+        print('[!] The update policy file can only contain the key-value pairs: ' + ', '.join(policy))
+        return None
+
+    if yaml_content.get('comment'):
+        policy['comment'] = str(yaml_content['comment'])
+
+    auto_accept = yaml_content.get('auto_accept', {})
+    if not isinstance(auto_accept, dict) or not set(auto_accept).issubset(policy['auto_accept']) or \
+            not all(isinstance(v, bool) for v in auto_accept.values()):
+        print('[!] The update policy key-value pair \'auto_accept\' can only contain the boolean key-value pairs: ' +
+              ', '.join(policy['auto_accept']))
+        return None
+    policy['auto_accept'].update(auto_accept)
+
+    policy['conflict'] = yaml_content.get('conflict', policy['conflict'])
+    if policy['conflict'] not in UPDATE_POLICY_CONFLICT:
+        print('[!] The update policy key-value pair \'conflict\' has an invalid value: ' + str(policy['conflict']) +
+              '. Valid values are: ' + ', '.join(UPDATE_POLICY_CONFLICT))
+        return None
+
+    return policy
+
+
+def _is_accepted_by_policy(policy, old_score_auto_generated, conflict=False):
+    """
+    Determine based on the update policy if a visibility score may be updated
+    :param policy: the update policy, see load_update_policy
+    :param old_score_auto_generated: True if the old score(s) are derived from the nr. of available data sources
+    :param conflict: True if the visibility objects would be replaced because there is no match on 'applicable_to'
+    :return: True if the update is accepted, otherwise False
+    """
+    if conflict and policy['conflict'] != UPDATE_POLICY_CONFLICT_AUTO_ACCEPT:
+        return policy['conflict'] == UPDATE_POLICY_CONFLICT_REPLACE
+    return policy['auto_accept']['auto_generated' if old_score_auto_generated else 'manual']
+
+
+def _get_visibility_change(tech_id, action, old_vis_objects, new_vis_objects):
+    """
+    Create the entry for the change report of the non-interactive visibility update
+    :param tech_id: technique ID
+    :param action: the action which is taken for the visibility object(s)
+    :param old_vis_objects: list of old visibility objects
+    :param new_vis_objects: list of new visibility objects
+    :return: dictionary with the change
+    """
+    return {'technique_id': tech_id,
+            'action': action,
+            'old': [{'applicable_to': list(v['applicable_to']), 'score': get_latest_score(v),
+                     'auto_generated': get_latest_auto_generated(v)} for v in old_vis_objects],
+            'new': [{'applicable_to': list(v['applicable_to']), 'score': v['score_logbook'][0]['score']}
+                    for v in new_vis_objects]}
+
+
+# new visibility scores etc. shared with the worker processes of update_technique_administration_files
+_update_context = {}
+
+
+def _init_update_context(new_visibility_scores, systems, domain, policy, today):
+    """
+    Set the data that is the same for every technique administration file in the non-interactive visibility update.
+    Used as initializer of the worker processes, so that this is only passed once to every process.
+    :param new_visibility_scores: the visibility scores generated from the data source administration file
+    :param systems: the systems from the data source administration file
+    :param domain: the domain of the data source administration file
+    :param policy: the update policy, see load_update_policy
+    :param today: the date of the new visibility scores
+    :return:
+    """
+    _update_context.update({'new_visibility_scores': new_visibility_scores, 'systems': systems, 'domain': domain,
+                            'policy': policy, 'today': today})
+
+
+def _update_technique_administration_file_by_policy(file_tech_admin):
+    """
+    Update the visibility scores in the provided technique administration file without asking for user input.
+    Visibility objects are matched through a technique ID and 'applicable_to' index, and are updated in place within
+    the loaded YAML file so that no copies of the visibility objects are needed.
+    :param file_tech_admin: file location of the tech. admin. file
+    :return: tuple with the report for this file and the output that was printed while updating the file
+    """
+    new_visibility_scores = _update_context['new_visibility_scores']
+    policy = _update_context['policy']
+    report = {'file': file_tech_admin, 'status': 'unchanged', 'platforms_added': [], 'changes': []}
+    output = StringIO()
+
+    try:
+        with redirect_stdout(output):
+            _yaml = init_yaml()
+            with open(file_tech_admin) as fd:
+                yaml_file_tech_admin = _yaml.load(fd)
+            domain_tech_admin = yaml_file_tech_admin.get('domain', 'enterprise-attack')
+            platform_tech_admin = get_platform_from_yaml(yaml_file_tech_admin, domain_tech_admin)
+
+            tech_index = {}  # {tech_id: technique object}
+            for tech in yaml_file_tech_admin['techniques']:
+                if isinstance(tech.get('visibility'), dict):
+                    tech['visibility'] = [tech['visibility']]
+                tech_index.setdefault(tech['technique_id'], tech)
+
+            if not _check_visibility_update(platform_tech_admin, domain_tech_admin,
+                                            ((t['technique_id'], t.get('visibility') or []) for t in yaml_file_tech_admin['techniques']),
+                                            new_visibility_scores['platform'], _update_context['systems'], _update_context['domain']):
+                report['status'] = 'canceled'
+                return report, output.getvalue()
+
+            report['platforms_added'] = [p for p in new_visibility_scores['platform'] if p not in platform_tech_admin]
+            if len(report['platforms_added']) > 0:
+                yaml_file_tech_admin['platform'].extend(report['platforms_added'])
+
+            for new_tech in new_visibility_scores['techniques']:
+                tech_id = new_tech['technique_id']
+                cur_tech = tech_index.get(tech_id)
+
+                # techniques for which we now have visibility, but which were not yet part of the tech. admin file
+                if cur_tech is None:
+                    if any(v['score_logbook'][0]['score'] > 0 for v in new_tech['visibility']):
+                        yaml_file_tech_admin['techniques'].append(new_tech)
+                        report['changes'].append(_get_visibility_change(tech_id, 'technique_added', [], new_tech['visibility']))
+                    continue
+
+                old_visibility = cur_tech.get('visibility') or []
+                old_index = {}  # {applicable_to: [index of the visibility object]}
+                for idx, old_vis_obj in enumerate(old_visibility):
+                    old_index.setdefault(frozenset(old_vis_obj['applicable_to']), []).append(idx)
+
+                # visibility objects with an EXACT match on applicable_to: add a new score logbook entry
+                matched_idxs = set()
+                unmatched_new_vis_objects = []
+                for new_vis_obj in new_tech['visibility']:
+                    idxs = old_index.get(frozenset(new_vis_obj['applicable_to']))
+                    if not idxs:
+                        unmatched_new_vis_objects.append(new_vis_obj)
+                        continue
+
+                    for idx in idxs:
+                        matched_idxs.add(idx)
+                        old_vis_obj = old_visibility[idx]
+                        if new_vis_obj['score_logbook'][0]['score'] != get_latest_score(old_vis_obj):
+                            action = 'score_not_updated'
+                            change = _get_visibility_change(tech_id, action, [old_vis_obj], [new_vis_obj])
+                            if _is_accepted_by_policy(policy, get_latest_auto_generated(old_vis_obj)):
+                                old_vis_obj['score_logbook'].insert(0, dict(new_vis_obj['score_logbook'][0]))
+                                change['action'] = 'score_updated'
+                            report['changes'].append(change)
+
+                # visibility objects with NO match on applicable_to: add or replace the visibility objects
+                if len(unmatched_new_vis_objects) > 0:
+                    matched_vis_objects = [v for idx, v in enumerate(old_visibility) if idx in matched_idxs]
+                    unmatched_old_vis_objects = [v for idx, v in enumerate(old_visibility) if idx not in matched_idxs]
+
+                    if len(unmatched_old_vis_objects) == 0:
+                        action = 'visibility_added'
+                    else:
+                        # a manually set score is only replaced when the policy accepts this for manual scores
+                        old_score_auto_generated = all(get_latest_auto_generated(v) for v in unmatched_old_vis_objects)
+                        action = 'visibility_replaced' if _is_accepted_by_policy(policy, old_score_auto_generated, conflict=True) \
+                            else 'visibility_not_replaced'
+                    if action != 'visibility_not_replaced':
+                        cur_tech['visibility'] = matched_vis_objects + unmatched_new_vis_objects
+                    report['changes'].append(_get_visibility_change(tech_id, action, unmatched_old_vis_objects,
+                                                                    unmatched_new_vis_objects))
+
+            if len(report['platforms_added']) > 0 or \
+                    any(c['action'] in ('technique_added', 'score_updated', 'visibility_added', 'visibility_replaced')
+                        for c in report['changes']):
+                report['status'] = 'updated'
+                backup_file(file_tech_admin)
+                yaml_file_tech_admin = fix_date_and_remove_null(yaml_file_tech_admin, _update_context['today'], input_type='ruamel')
+                with open(file_tech_admin, 'w') as fd:
+                    fd.writelines(yaml_file_tech_admin)
+                print('File written:   ' + file_tech_admin)
+            else:
+                print('No visibility scores have been updated.')
+    except Exception as e:
+        report['status'] = 'error'
+        output.write('[!] Error while updating the visibility scores: ' + str(e) + '\n')
+
+    return report, output.getvalue()
+
+
+def update_technique_administration_files(file_data_sources, files_tech_admin, policy, output_filename, output_overwrite):
+    """
+    Update the visibility scores in one or more technique administration files without asking for user input. The
+    decisions are taken based on the update policy, and all changes are written to a JSON report. The files are
+    processed in parallel.
+    :param file_data_sources: file location of the data source admin. file
+    :param files_tech_admin: list with file locations of tech. admin. files
+    :param policy: the update policy, see load_update_policy
+    :param output_filename: the output filename for the report defined by the user
+    :param output_overwrite: boolean flag indicating whether we're in overwrite mode
+    :return: the report as a dictionary
+    """
+    model = load_data_source_model(file_data_sources)
+    new_visibility_scores = generate_technique_administration_file(file_data_sources, None, output_overwrite, write_file=False,
+                                                                   all_techniques=True, model=model)
+    today = dt.now()
+    for new_tech in new_visibility_scores['techniques']:
+        for vis_obj in new_tech['visibility']:
+            today = vis_obj['score_logbook'][0]['date']
+            if policy['comment'] != '':
+                vis_obj['score_logbook'][0]['comment'] = policy['comment']
+
+    context = (new_visibility_scores, model['systems'], model['domain'], policy, today)
+    if len(files_tech_admin) == 1:
+        _init_update_context(*context)
+        results = [_update_technique_administration_file_by_policy(files_tech_admin[0])]
+    else:
+        with ProcessPoolExecutor(max_workers=min(len(files_tech_admin), os.cpu_count() or 1),
+                                 initializer=_init_update_context, initargs=context) as executor:
+            results = list(executor.map(_update_technique_administration_file_by_policy, files_tech_admin))
+
+    report = {'data_source_file': file_data_sources, 'date': today.strftime('%Y-%m-%d'), 'policy': policy, 'files': []}
+    for file_report, file_output in results:
+        print('Technique administration file: ' + file_report['file'])
+        print(file_output)
+        report['files'].append(file_report)
+
+    if not output_filename:
+        output_filename = create_output_filename('visibility_update_report', model['name'])
+    write_file(output_filename, output_overwrite, simplejson.dumps(report, indent=2))
+
+    return report
+
 # pylint: disable=redefined-outer-name
 
 
-def generate_technique_administration_file(filename, output_filename, output_overwrite, write_file=True, all_techniques=False):
+def generate_technique_administration_file(filename, output_filename, output_overwrite, write_file=True, all_techniques=False,
+                                           model=None):
     """
     Generate a technique administration file based on the data source administration YAML file
     :param filename: the filename of the YAML file containing the data sources administration
@@ -915,12 +1121,13 @@ def generate_technique_administration_file(filename, output_filename, output_ove
     :param write_file: by default the file is written to disk
     :param all_techniques: include all ATT&CK techniques in the generated YAML file that are applicable to the
     platform(s) specified in the data source YAML file
+    :param model: an already loaded data source model (optional), see load_data_source_model
     :return:
     """
-    my_ds, name, systems, exceptions, domain = load_data_sources(filename)
-
-    techniques = load_attack_data(DATA_TYPE_STIX_ALL_TECH_ENTERPRISE if domain ==
-                                  'enterprise-attack' else DATA_TYPE_STIX_ALL_TECH_ICS if domain == 'ics-attack' else DATA_TYPE_STIX_ALL_TECH_MOBILE)
+    if model is None:
+        model = load_data_source_model(filename)
+    name, systems, domain = model['name'], model['systems'], model['domain']
+    techniques = model['techniques']
     yaml_platform = list(set(chain.from_iterable(map(lambda k: k['platform'], systems))))
     all_applicable_to_values = set([s['applicable_to'] for s in systems])
 
@@ -933,45 +1140,24 @@ def generate_technique_administration_file(filename, output_filename, output_ove
     yaml_file['techniques'] = []
     today = dt.now()
 
+    coverage = model['coverage']
+    visibility_scores = calculate_visibility_scores(coverage['total'], coverage['available'], coverage['platform_match'])
+    exceptions = set(map(lambda x: x.upper(), model['exceptions']))
+
     # Score visibility based on the number of available data sources and the exceptions
-    for t in techniques:
-        mitre_platforms = t.get('x_mitre_platforms', [])
+    for tech_idx, t in enumerate(techniques):
         tech_id = t['technique_id']
         tech = None
         visibility_obj_count = 0
 
-        if tech_id not in list(map(lambda x: x.upper(), exceptions)):
+        if tech_id not in exceptions:
             # calculate visibility score per system
-            for system in systems:
-                ds_score = -1
-                platform_match = False
+            for system_idx, system in enumerate(systems):
                 # the system is relevant for this technique due to a match in ATT&CK platform
-                if len(set(system['platform']).intersection(set(mitre_platforms))) > 0:
-                    platform_match = True
-                    applicable_data_sources = get_applicable_data_sources_platform(system['platform'], domain)
-                    applicable_dettect_data_sources = get_applicable_dettect_data_sources_platform(system['platform'], domain)
-                    total_ds_count = _count_applicable_data_sources(t, applicable_data_sources, applicable_dettect_data_sources)
-
-                    if total_ds_count > 0:  # the system's platform has data source applicable to this technique
-                        ds_count = 0
-                        for ds in t['data_components']:
-                            # the ATT&CK data source is applicable to this system and available
-                            if ds in applicable_data_sources and ds in my_ds.keys() and _system_in_data_source_details_object(my_ds[ds], system):
-                                ds_count += 1
-
-                        for cdc in t['dettect_data_sources']:
-                            if cdc in applicable_dettect_data_sources and cdc in my_ds.keys() and _system_in_data_source_details_object(my_ds[cdc], system):
-                                ds_count += 1
-
-                        if ds_count > 0:
-                            result = (float(ds_count) / float(total_ds_count)) * 100
-                            ds_score = 1 if result <= 49 else 2 if result <= 74 else 3 if result <= 99 else 4
-                        else:
-                            ds_score = 0  # none of the applicable data sources are available for this system
-                    else:
-                        # the technique is applicable to this system (and thus its platform(s)),
-                        # but none of the technique's listed data source are applicable for its platform(s), or the technique has not data sources
-                        ds_score = -1
+                platform_match = coverage['platform_match'][tech_idx, system_idx]
+                # -1 when the technique is not applicable to this system, or none of the technique's listed data sources
+                # are applicable for its platform(s), or the technique has no data sources
+                ds_score = int(visibility_scores[tech_idx, system_idx])
 
                 # Do not add technique if score == 0 or the user want every technique to be added
                 if ds_score > 0 or (all_techniques and platform_match):
@@ -1041,3 +1227,475 @@ def generate_technique_administration_file(filename, output_filename, output_ove
             print('[!] Error while writing yaml file: %s' % str(e))
     else:
         return yaml_file
+
+
+def _print_onboarding_results(results, systems, techniques):
+    """
+    Print the results of the what-if simulation to stdout
+    :param results: list with the results, see rank_onboarding_candidates and simulate_onboarding
+    :param systems: the systems from the data source administration file
+    :param techniques: the ATT&CK techniques
+    :return:
+    """
+    str_format = '{:<5s} {:<45s} {:<25s} {:<11s} {:<13s} {:s}'
+    print(str_format.format('#', 'Data source', 'Applicable to', 'Score gain', 'Tech. gained', 'Improved technique(s)'))
+    print('-' * 140)
+    for i, r in enumerate(results):
+        improved = wrap(', '.join(techniques[t]['technique_id'] for t in r['techniques_improved']), 40, break_long_words=False) or ['']
+        line = str_format.format(str(i + 1), r['data_source'], systems[r['system_idx']]['applicable_to'], str(r['score_gain']),
+                                 str(r['techniques_gained']), '')
+        print(line + improved[0])
+        for tech_ids in improved[1:]:
+            print(' ' * len(line) + tech_ids)
+
+
+def simulate_data_source_onboarding(filename, what_if=None, what_if_all=False, top=25):
+    """
+    Simulate what happens to the visibility scores when data sources are onboarded on systems, without changing the data
+    source administration file. The visibility scores are calculated in the same way as with the option: -y, --yaml
+    :param filename: the filename of the YAML file containing the data sources administration
+    :param what_if: list of proposed changes in the format: <data source>@<applicable to>
+    :param what_if_all: rank all data source / system combinations that are not yet onboarded
+    :param top: the number of ranked candidates to print when what_if_all is used
+    :return: tuple with the ranked results and the results of the proposed changes applied one after the other
+    """
+    model = load_data_source_model(filename)
+    coverage, systems, techniques = model['coverage'], model['systems'], model['techniques']
+    exceptions = set(map(lambda x: x.upper(), model['exceptions']))
+    excluded = [i for i, t in enumerate(techniques) if t['technique_id'] in exceptions]
+    system_idxs = {}
+    for i, s in enumerate(systems):
+        system_idxs.setdefault(s['applicable_to'].lower(), i)
+
+    changes = []
+    for change in what_if or []:
+        ds_name, _, applicable_to = change.rpartition('@')
+        ds_id = get_data_source_id(coverage, ds_name.strip())
+        if ds_id is None or applicable_to.strip().lower() not in system_idxs:
+            print('[!] Invalid what-if change: \'' + change + '\'. Provide an ATT&CK data component or DeTT&CT data '
+                  'source used by the techniques, and an applicable to value from the \'systems\' key-value pair, in the '
+                  'format: <data source>@<applicable to>')
+            return None
+        changes.append((ds_id, system_idxs[applicable_to.strip().lower()]))
+
+    ranked = []
+    if what_if_all or changes:
+        ranked = rank_onboarding_candidates(coverage, None if what_if_all else changes, excluded)
+        print('Visibility score gain per onboarded data source (each compared to the current data source administration):\n')
+        _print_onboarding_results([r for r in ranked if r['score_gain'] > 0][:top] if what_if_all else ranked, systems, techniques)
+        if what_if_all:
+            print('\nEvaluated ' + str(len(ranked)) + ' data source / system combinations, of which ' +
+                  str(len([r for r in ranked if r['score_gain'] > 0])) + ' improve the visibility.')
+
+    combined = []
+    if len(changes) > 1:
+        combined, _ = simulate_onboarding(coverage, changes, excluded)
+        print('\nVisibility score gain per onboarded data source (applied one after the other):\n')
+        _print_onboarding_results(combined, systems, techniques)
+        print('\nTotal visibility score gain: ' + str(sum(r['score_gain'] for r in combined)) +
+              ', techniques gaining visibility: ' + str(sum(r['techniques_gained'] for r in combined)))
+
+    return ranked, combined
+
+
+# ATT&CK techniques shared with the worker processes of generate_aggregated_data_source_outputs
+_aggregate_context = {}
+
+
+def _init_aggregate_context(techniques):
+    """
+    Set the ATT&CK techniques for the data source aggregation. Used as initializer of the worker processes, so that the
+    ATT&CK data is loaded once and shared with every process.
+    :param techniques: list of ATT&CK techniques
+    :return:
+    """
+    _aggregate_context['techniques'] = techniques
+
+
+def _score_data_source_file(filename):
+    """
+    Calculate the data source coverage per technique for one data source administration file
+    :param filename: the filename of the YAML file containing the data sources administration
+    :return: dictionary with the name, platforms and the coverage per technique (NaN for the exceptions)
+    """
+    techniques = _aggregate_context['techniques']
+    my_ds, name, systems, exceptions, domain = load_data_sources(filename)
+    coverage = calculate_data_source_coverage(techniques, my_ds, systems, domain)
+
+    technique_coverage = calculate_technique_coverage(coverage)
+    exceptions = set(map(lambda x: x.upper(), exceptions))
+    for tech_idx, t in enumerate(techniques):
+        if t['technique_id'] in exceptions:
+            technique_coverage[tech_idx] = np.nan
+
+    return {'file': filename, 'name': name, 'platforms': list(set(chain.from_iterable(map(lambda k: k['platform'], systems)))),
+            'coverage': technique_coverage}
+
+
+def _get_data_source_files(path):
+    """
+    Get the YAML files from a directory or glob pattern
+    :param path: a directory or glob pattern
+    :return: sorted list of filenames
+    """
+    if os.path.isdir(path):
+        return sorted(glob(os.path.join(path, '*.yaml')) + glob(os.path.join(path, '*.yml')))
+    return sorted(glob(path))
+
+
+def _get_ds_color(score):
+    """
+    Get the color for a percentage of available data sources, as used in the data source layer
+    :param score: percentage of available data sources
+    :return: color
+    """
+    return COLOR_DS_25p if score <= 25 else COLOR_DS_50p if score <= 50 else COLOR_DS_75p \
+        if score <= 75 else COLOR_DS_99p if score <= 99 else COLOR_DS_100p
+
+
+def _write_aggregated_data_sources_layer(aggregate, output_filename, output_overwrite, layer_name, layer_settings):
+    """
+    Write the Navigator layer with the mean data source coverage over all business units
+    :param aggregate: the aggregated coverage, see generate_aggregated_data_source_outputs
+    :param output_filename: the output filename defined by the user
+    :param output_overwrite: boolean flag indicating whether we're in overwrite mode
+    :param layer_name: the name of the Navigator layer
+    :param layer_settings: settings for the Navigator layer
+    :return:
+    """
+    units, techniques = aggregate['units'], aggregate['techniques']
+    output_techniques = []
+    for i, tech_idx in enumerate(aggregate['technique_idxs']):
+        t = techniques[tech_idx]
+        tactics = [None]
+        if 'includeTactic' in layer_settings.keys() and layer_settings['includeTactic'] == 'True':
+            tactics = [k['phase_name'] for k in t['kill_chain_phases'] if k['kill_chain_name'] == 'mitre-attack']
+
+        d = dict()
+        d['techniqueID'] = t['technique_id']
+        if aggregate['mean'][i] > 0:
+            d['color'] = _get_ds_color(aggregate['mean'][i])
+        d['comment'] = ''
+        d['enabled'] = True
+        d['metadata'] = []
+
+        if 'showMetadata' not in layer_settings.keys() or str(layer_settings['showMetadata']) == 'True':
+            for unit in units:
+                score = unit['coverage'][tech_idx]
+                d['metadata'].append({'name': unit['name'], 'value': 'exception' if np.isnan(score) else str(int(score)) + '%'})
+            d['metadata'].append({'divider': True})
+            for k in ['min', 'max', 'mean']:
+                d['metadata'].append({'name': k.capitalize(), 'value': str(int(aggregate[k][i])) + '%'})
+            d['metadata'] = make_layer_metadata_compliant(d['metadata'])
+
+        for tactic in tactics:
+            if tactic is not None:
+                d['tactic'] = tactic
+            output_techniques.append(deepcopy(d))
+
+    determine_and_set_show_sub_techniques(output_techniques, techniques, layer_settings)
+
+    if not layer_name:
+        layer_name = 'Data sources aggregated'
+    platforms = sorted(set(chain.from_iterable(u['platforms'] for u in units)))
+    layer = get_layer_template_data_sources(layer_name, 'Mean data source coverage of: ' + ', '.join(u['name'] for u in units),
+                                            platforms, aggregate['domain'], layer_settings)
+    layer['techniques'] = output_techniques
+
+    json_string = simplejson.dumps(layer).replace('}, ', '},\n')
+    if not output_filename:
+        output_filename = create_output_filename('data_sources', 'aggregated')
+    write_file(output_filename, output_overwrite, json_string)
+
+
+def _write_data_sources_comparison_excel(aggregate, output_filename, output_overwrite):
+    """
+    Write an Excel sheet which compares the data source coverage per technique of all business units
+    :param aggregate: the aggregated coverage, see generate_aggregated_data_source_outputs
+    :param output_filename: the output filename defined by the user
+    :param output_overwrite: boolean flag indicating whether we're in overwrite mode
+    :return:
+    """
+    units, techniques = aggregate['units'], aggregate['techniques']
+    if not output_filename:
+        output_filename = 'data_sources_comparison'
+    elif output_filename.endswith('.xlsx') or output_filename.endswith('.json'):
+        output_filename = output_filename[:-5]
+
+    if os.sep not in output_filename:
+        output_filename = 'output/%s' % output_filename
+
+    if not output_overwrite:
+        excel_filename = get_non_existing_filename(output_filename, 'xlsx')
+    else:
+        excel_filename = use_existing_filename(output_filename, 'xlsx')
+
+    # rows are written in order, so every row can be flushed to disk directly
+    workbook = xlsxwriter.Workbook(excel_filename, {'constant_memory': True})
+    worksheet = workbook.add_worksheet('Coverage per technique')
+
+    # Formatting:
+    format_bold_left = workbook.add_format({'align': 'left', 'bold': True})
+    format_title = workbook.add_format({'align': 'left', 'bold': True, 'font_size': '14'})
+    format_exception = workbook.add_format({'align': 'center', 'font_color': COLOR_GRADIENT_DISABLE})
+    format_scores = {color: workbook.add_format({'align': 'center', 'num_format': '0"%"', 'bg_color': color,
+                                                 'font_color': '#ffffff' if color in (COLOR_DS_75p, COLOR_DS_99p, COLOR_DS_100p) else '#000000'})
+                     for color in (COLOR_DS_25p, COLOR_DS_50p, COLOR_DS_75p, COLOR_DS_99p, COLOR_DS_100p)}
+    format_score_0 = workbook.add_format({'align': 'center', 'num_format': '0"%"'})
+
+    def _write_score(y, x, score):
+        if np.isnan(score):
+            worksheet.write(y, x, 'exception', format_exception)
+        else:
+            worksheet.write_number(y, x, round(float(score), 1), format_scores[_get_ds_color(score)] if score > 0 else format_score_0)
+
+    # Title
+    worksheet.write(0, 0, 'Data source coverage per technique', format_title)
+    worksheet.write(1, 0, 'Domain: ' + aggregate['domain'])
+
+    # Header columns
+    header_columns = 3
+    worksheet.write(header_columns, 0, 'Technique ID', format_bold_left)
+    worksheet.write(header_columns, 1, 'Technique name', format_bold_left)
+    for x, unit in enumerate(units):
+        worksheet.write(header_columns, 2 + x, unit['name'], format_bold_left)
+    x_stats = 2 + len(units)
+    worksheet.write(header_columns, x_stats, 'Min', format_bold_left)
+    worksheet.write(header_columns, x_stats + 1, 'Max', format_bold_left)
+    worksheet.write(header_columns, x_stats + 2, 'Mean', format_bold_left)
+
+    worksheet.autofilter(header_columns, 0, header_columns + len(aggregate['technique_idxs']), x_stats + 2)
+    worksheet.freeze_panes(header_columns + 1, 2)
+    worksheet.set_column(0, 0, 14)
+    worksheet.set_column(1, 1, 45)
+    worksheet.set_column(2, x_stats + 2, 15)
+
+    y = header_columns + 1
+    for i, tech_idx in enumerate(aggregate['technique_idxs']):
+        worksheet.write(y, 0, techniques[tech_idx]['technique_id'])
+        worksheet.write(y, 1, techniques[tech_idx]['name'])
+        for x, unit in enumerate(units):
+            _write_score(y, 2 + x, unit['coverage'][tech_idx])
+        for x, k in enumerate(['min', 'max', 'mean']):
+            _write_score(y, x_stats + x, aggregate[k][i])
+        y += 1
+
+    # Business units
+    worksheet = workbook.add_worksheet('Business units')
+    for x, column in enumerate(['Name', 'File', 'Platform(s)', 'Techniques with data sources', 'Mean coverage']):
+        worksheet.write(0, x, column, format_bold_left)
+    worksheet.set_column(0, 1, 35)
+    worksheet.set_column(2, 2, 45)
+    worksheet.set_column(3, 4, 28)
+    for y, unit in enumerate(units, start=1):
+        coverage = unit['coverage'][aggregate['technique_idxs']]
+        worksheet.write(y, 0, unit['name'])
+        worksheet.write(y, 1, unit['file'])
+        worksheet.write(y, 2, ', '.join(sorted(unit['platforms'])))
+        worksheet.write_number(y, 3, int((coverage > 0).sum()))
+        _write_score(y, 4, np.nanmean(coverage) if not np.isnan(coverage).all() else np.nan)
+
+    try:
+        workbook.close()
+        print("File written:   " + excel_filename)
+    except Exception as e:
+        print('[!] Error while writing Excel file: %s' % str(e))
+
+
+def generate_aggregated_data_source_outputs(path, output_filename, output_overwrite, layer_name, layer_settings, health_is_called=False):
+    """
+    Aggregate the data source administration files of multiple business units into one Navigator layer with the mean
+    data source coverage per technique, and an Excel sheet comparing the business units (min/max/mean coverage per
+    technique). The files are scored in parallel, and the ATT&CK data is loaded once for all of them.
+    :param path: a directory or glob pattern with the data source administration YAML files
+    :param output_filename: the output filename defined by the user
+    :param output_overwrite: boolean flag indicating whether we're in overwrite mode
+    :param layer_name: the name of the Navigator layer
+    :param layer_settings: settings for the Navigator layer
+    :param health_is_called: boolean that specifies if detailed errors in the file will be printed
+    :return: dictionary with the aggregated coverage
+    """
+    files = [f for f in _get_data_source_files(path) if check_file(f, FILE_TYPE_DATA_SOURCE_ADMINISTRATION, health_is_called)]
+    if len(files) == 0:
+        print('[!] No data source administration files found: ' + path)
+        return None
+
+    domains = set(load_yaml_file(f).get('domain', 'enterprise-attack') for f in files)
+    if len(domains) > 1:
+        print('[!] The data source administration files have different values for \'domain\': ' + ', '.join(sorted(domains)))
+        return None
+    domain = domains.pop()
+
+    techniques = load_attack_data(DATA_TYPE_STIX_ALL_TECH_ENTERPRISE if domain == 'enterprise-attack' else
+                                  DATA_TYPE_STIX_ALL_TECH_ICS if domain == 'ics-attack' else DATA_TYPE_STIX_ALL_TECH_MOBILE)
+    with ProcessPoolExecutor(max_workers=min(len(files), os.cpu_count() or 1),
+                             initializer=_init_aggregate_context, initargs=(techniques,)) as executor:
+        units = list(executor.map(_score_data_source_file, files))
+
+    # only the techniques which are not an exception for all business units
+    unit_coverage = np.vstack([u['coverage'] for u in units])
+    technique_idxs = np.flatnonzero(~np.isnan(unit_coverage).all(axis=0))
+    unit_coverage = unit_coverage[:, technique_idxs]
+    aggregate = {'domain': domain, 'units': units, 'techniques': techniques, 'technique_idxs': technique_idxs,
+                 'min': np.nanmin(unit_coverage, axis=0), 'max': np.nanmax(unit_coverage, axis=0),
+                 'mean': np.nanmean(unit_coverage, axis=0)}
+
+    _write_aggregated_data_sources_layer(aggregate, output_filename, output_overwrite, layer_name, layer_settings)
+    _write_data_sources_comparison_excel(aggregate, output_filename, output_overwrite)
+    return aggregate
+
+
+def _load_data_source_snapshot(content, label, date, parsed):
+    """
+    Parse a snapshot of a data source administration file. Snapshots with identical content are parsed only once.
+    :param content: the content of the snapshot
+    :param label: the label of the snapshot (commit or filename)
+    :param date: the date of the snapshot
+    :param parsed: dictionary with the already parsed snapshots by their content
+    :return: the snapshot, or None when it is not a data source administration file of the current version
+    """
+    if content not in parsed:
+        yaml_content = init_yaml(read_only=True).load(content)
+        if isinstance(yaml_content, dict) and yaml_content.get('file_type') == FILE_TYPE_DATA_SOURCE_ADMINISTRATION and \
+                yaml_content.get('version') == FILE_TYPE_DATA_SOURCE_ADMINISTRATION_VERSION:
+            my_ds, name, systems, exceptions, domain = load_data_sources(yaml_content, filter_empty_scores=False)  # pylint: disable=unused-variable
+            parsed[content] = (my_ds, name, systems)
+        else:
+            parsed[content] = None
+
+    if parsed[content] is None:
+        print('[!] Skipped snapshot \'%s\': not a data source administration file of version %s' %
+              (label, FILE_TYPE_DATA_SOURCE_ADMINISTRATION_VERSION))
+        return None
+    my_ds, name, systems = parsed[content]
+    return {'label': label, 'date': date, 'name': name, 'data_sources': my_ds, 'systems': systems}
+
+
+def _get_data_source_file_history(filename, max_count):
+    """
+    Get the versions of a data source administration file from its git history
+    :param filename: the filename of the YAML file containing the data sources administration
+    :param max_count: the maximum number of commits to include (None for all commits)
+    :return: list with per version the commit, date and content, from old to new
+    """
+    directory = os.path.dirname(os.path.abspath(filename))
+    command = ['git', '-C', directory, 'log', '--follow', '--format=%H %cI', '--name-only']
+    if max_count:
+        command.append('--max-count=%d' % max_count)
+    try:
+        log = subprocess.run(command + ['--', os.path.basename(filename)], capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        print('[!] Could not read the git history of: ' + filename)
+        return []
+
+    # every commit is followed by the path of the file in that commit (which changes when the file was renamed)
+    commits = []
+    for line in log.splitlines():
+        if re.match(r'^[0-9a-f]{40} ', line):
+            commits.append(line.split(' ', 1) + [None])
+        elif line.strip() and commits and commits[-1][2] is None:
+            commits[-1][2] = line.strip()
+
+    history = []
+    for commit, date, path in reversed(commits):
+        if path:
+            show = subprocess.run(['git', '-C', directory, 'show', '%s:%s' % (commit, path)], capture_output=True, text=True)
+            if show.returncode == 0:
+                history.append((commit[:7], date[:10], show.stdout))
+    return history
+
+
+def _get_data_source_file_snapshots(filename, archive=None, max_count=None):
+    """
+    Get the snapshots of a data source administration file: its archived copies, or its versions in the git history.
+    The current file is the newest snapshot when it differs from the last archived or committed version.
+    :param filename: the filename of the YAML file containing the data sources administration
+    :param archive: a directory or glob pattern with archived copies of the file (the git history is used when None)
+    :param max_count: the maximum number of commits to include from the git history
+    :return: list of snapshots, from old to new
+    """
+    if archive:
+        versions = []
+        for f in sorted(_get_data_source_files(archive), key=os.path.getmtime):
+            with open(f, 'r') as yaml_file:
+                versions.append((os.path.basename(f), datetime.fromtimestamp(os.path.getmtime(f)).strftime('%Y-%m-%d'),
+                                 yaml_file.read()))
+    else:
+        versions = _get_data_source_file_history(filename, max_count)
+
+    with open(filename, 'r') as yaml_file:
+        content = yaml_file.read()
+    if not versions or versions[-1][2] != content:
+        versions.append((filename, datetime.fromtimestamp(os.path.getmtime(filename)).strftime('%Y-%m-%d'), content))
+
+    parsed = {}
+    snapshots = [_load_data_source_snapshot(content, label, date, parsed) for label, date, content in versions]
+    return [s for s in snapshots if s is not None]
+
+
+def generate_data_quality_trend(filename, archive=None, max_count=None, output_filename=None, output_overwrite=False):
+    """
+    Generate the data quality trend per data source and per system from snapshots of the data source administration
+    file, and write it to a JSON file.
+    :param filename: the filename of the YAML file containing the data sources administration
+    :param archive: a directory or glob pattern with archived copies of the file (the git history is used when None)
+    :param max_count: the maximum number of commits to include from the git history
+    :param output_filename: the output filename defined by the user
+    :param output_overwrite: boolean flag indicating whether we're in overwrite mode
+    :return: dictionary with the data quality trend, see calculate_data_quality_trend
+    """
+    snapshots = _get_data_source_file_snapshots(filename, archive, max_count)
+    if not snapshots:
+        print('[!] No snapshots found of the data source administration file: ' + filename)
+        return None
+
+    trend = calculate_data_quality_trend(snapshots)
+    trend['data_source_file'] = filename
+
+    print('Data quality trend per system (%d snapshots, %s - %s):' % (len(snapshots), snapshots[0]['date'], snapshots[-1]['date']))
+    for system, series in trend['systems'].items():
+        print(' ' * 4 + '- %s: %s' % (system, ' -> '.join('-' if score is None else '%.2f' % score for score in series)))
+    print('')
+
+    if not output_filename:
+        output_filename = create_output_filename('data_quality_trend', snapshots[-1]['name'])
+    write_file(output_filename, output_overwrite, simplejson.dumps(trend, indent=2))
+    return trend
+
+
+def generate_data_source_outputs(filename, output_filename, output_overwrite, layer=False, excel=False, graph=False, yaml=False,
+                                 layer_name=None, layer_settings=None, eql_search=False, yaml_all_techniques=False):
+    """
+    Generate all requested outputs for the data source administration file. The YAML file and ATT&CK data are loaded,
+    and the data source coverage is calculated, only once for all outputs. The outputs are then generated concurrently.
+    :param filename: the filename of the YAML file containing the data sources administration or a dict
+    :param output_filename: the output filename defined by the user
+    :param output_overwrite: boolean flag indicating whether we're in overwrite mode
+    :param layer: generate the data sources layer
+    :param excel: generate the Excel sheet with all data sources
+    :param graph: generate the graph with the number of connected data sources through time
+    :param yaml: generate the technique administration YAML file
+    :param layer_name: the name of the Navigator layer
+    :param layer_settings: settings for the Navigator layer
+    :param eql_search: specify if an EQL search was performed which may have resulted in missing ATT&CK data sources
+    :param yaml_all_techniques: include all ATT&CK techniques in the generated technique administration YAML file
+    :return:
+    """
+    outputs = []
+    if layer:
+        outputs.append((generate_data_sources_layer, (filename, output_filename, output_overwrite, layer_name, layer_settings)))
+    if excel:
+        outputs.append((export_data_source_list_to_excel, (filename, output_filename, output_overwrite, eql_search)))
+    if graph:
+        outputs.append((plot_data_sources_graph, (filename, output_filename, output_overwrite)))
+    if yaml:
+        outputs.append((generate_technique_administration_file, (filename, output_filename, output_overwrite, True, yaml_all_techniques)))
+    if not outputs:
+        return
+
+    model = load_data_source_model(filename, attack_data=layer or yaml)
+
+    with ThreadPoolExecutor(max_workers=len(outputs)) as executor:
+        futures = [executor.submit(func, *args, model=model) for func, args in outputs]
+        for future in futures:
+            future.result()
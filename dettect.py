@@ -1,10 +1,4 @@
-from data_source_mapping import *
-from technique_mapping import *
-from group_mapping import *
-from eql_yaml import *
-from generic_mode import *
-from editor import DeTTECTEditor
-import generic
+from constants import *
 import argparse
 import os
 import signal
@@ -40,10 +34,17 @@ def _init_menu():
                                                             'graph.')
     parser_data_sources.add_argument('-ft', '--file-tech', help='path to the technique administration YAML file '
                                                                 '(used with the option \'-u, --update\' to update '
-                                                                'the visibility scores)',
+                                                                'the visibility scores). You can provide multiple files '
+                                                                'with extra \'-ft/--file-tech\' arguments when the option '
+                                                                '\'--update-policy\' is used', action='append',
                                      required='-u' in sys.argv or '--update' in sys.argv)
-    parser_data_sources.add_argument('-fd', '--file-ds', help='path to the data source administration YAML file',
-                                     required=True)
+    parser_data_sources.add_argument('-fd', '--file-ds', help='path to the data source administration YAML file, or a '
+                                                              'directory or glob pattern when used with the option '
+                                                              '\'--aggregate\'', required=True)
+    parser_data_sources.add_argument('--aggregate', help='aggregate multiple data source administration files (e.g. one '
+                                                         'per business unit) into one data source layer with the mean '
+                                                         'coverage per technique, and an Excel sheet comparing the '
+                                                         'min/max/mean coverage per technique', action='store_true')
     parser_data_sources.add_argument('-a', '--applicable-to', action='append', help='specify which data source objects '
                                      'to include by filtering on applicable to value(s) (used to define the type of '
                                      'system). You can provide multiple applicable to values with extra '
@@ -69,6 +70,27 @@ def _init_menu():
                                                             'not updated without your approval. The updated visibility '
                                                             'scores are calculated in the same way as with the option: '
                                                             '-y, --yaml', action='store_true')
+    parser_data_sources.add_argument('--update-policy', help='path to a YAML file with the policy to update the visibility '
+                                                             'scores without asking for input (used with the option '
+                                                             '\'-u, --update\'). The policy has the key-value pairs: '
+                                                             'comment, auto_accept (auto_generated and manual) and '
+                                                             'conflict (' + '|'.join(UPDATE_POLICY_CONFLICT) + '). '
+                                                             'A JSON report with all changes is written to the output '
+                                                             'directory')
+    parser_data_sources.add_argument('--what-if', help='simulate the visibility score gain when a data source would be '
+                                                       'onboarded on a system, in the format: <data source>@<applicable to>. '
+                                                       'You can provide multiple changes with extra \'--what-if\' arguments',
+                                     action='append')
+    parser_data_sources.add_argument('--what-if-all', help='rank all data sources that can be onboarded on the systems '
+                                                           'by their visibility score gain', action='store_true')
+    parser_data_sources.add_argument('--dq-trend', help='generate the data quality trend per data source and per system '
+                                                        'from the git history of the data source administration file, '
+                                                        'or from its archived copies (see \'--dq-archive\'). The trend '
+                                                        'is written to a JSON file', action='store_true')
+    parser_data_sources.add_argument('--dq-archive', help='a directory or glob pattern with archived copies of the data '
+                                                          'source administration file (used with the option \'--dq-trend\')')
+    parser_data_sources.add_argument('--dq-history', help='the maximum number of commits from the git history to include '
+                                                          '(used with the option \'--dq-trend\')', type=int)
     parser_data_sources.add_argument('-of', '--output-filename', help='set the output filename')
     parser_data_sources.add_argument('--force-overwrite', help='force overwriting the output file if it already exists',
                                      action='store_true')
@@ -224,6 +246,10 @@ def _init_menu():
     parser_group.add_argument('-p', '--platform', action='append', help='specify the platform (default = all). Multiple platforms '
                               'can be provided with extra \'-p/--platform\' arguments. The available platforms '
                               ' can be listed from the generic mode: \'ge --list-platforms\'')
+    parser_group.add_argument('-s', '--search', help='only include the group and campaign techniques which match the '
+                                                     'provided EQL query. Events have the fields: group_id, group_name, '
+                                                     'aliases, campaign_id, campaign, technique_id, software_id, platform '
+                                                     'and weight')
     parser_group.add_argument('-sd', '--search-detection', help='only include detection objects which match the '
                                                                 'provided EQL query')
     parser_group.add_argument('-sv', '--search-visibility', help='only include visibility objects which match the '
@@ -232,6 +258,12 @@ def _init_menu():
                                                    'the EQL search. The default behaviour is to only include the '
                                                    'most recent \'score\' objects',
                               action='store_true', default=False)
+    parser_group.add_argument('--batch', help='generate a heat map for every layer in the provided YAML manifest, in '
+                                              'parallel. A layer has the key-value pairs: ' + ', '.join(BATCH_LAYER_DEFAULT) +
+                                              '. Every value of the key-value pairs listed in \'expand\' results in a '
+                                              'layer of its own. The options for a single heat map are ignored, except '
+                                              'for --layer-settings, --force-overwrite, --health and -of/--output-filename '
+                                              '(which sets the filename of the index of the written layers)')
     parser_group.add_argument('-of', '--output-filename', help='set the output filename')
     parser_group.add_argument('--force-overwrite', help='force overwriting the output file if it already exists',
                                      action='store_true')
@@ -291,20 +323,32 @@ def _menu(menu_parser):
     """
     args = menu_parser.parse_args()
 
+    # Every mode only imports the modules it needs, to keep the startup time of DeTT&CT low.
     if 'local_stix_path' in args and args.local_stix_path:
+        import generic
         generic.local_stix_path = args.local_stix_path
     
     if 'ignore_verify_tls' in args and args.ignore_verify_tls:
         print("[!] Warning: ignoring TLS verification errors due to --ignore-verify-tls option")
         import urllib3
+        import generic
         urllib3.disable_warnings()
         generic.verify_tls = False
 
     if args.subparser in ['editor', 'e']:
+        from editor import DeTTECTEditor
         DeTTECTEditor(int(args.port)).start()
 
     elif args.subparser in ['datasource', 'ds']:
-        if check_file(args.file_ds, FILE_TYPE_DATA_SOURCE_ADMINISTRATION, args.health):
+        from generic import check_file
+        from eql_yaml import get_eql_applicable_to_query, data_source_search
+        from data_source_mapping import (update_technique_administration_file, update_technique_administration_files,
+                                         load_update_policy, simulate_data_source_onboarding, generate_data_source_outputs,
+                                         generate_aggregated_data_source_outputs, generate_data_quality_trend)
+        if args.aggregate:
+            generate_aggregated_data_source_outputs(args.file_ds, args.output_filename, args.force_overwrite, args.layer_name,
+                                                    _parse_layer_settings(args.layer_settings), args.health)
+        elif check_file(args.file_ds, FILE_TYPE_DATA_SOURCE_ADMINISTRATION, args.health):
             layer_settings = _parse_layer_settings(args.layer_settings)
             file_ds = args.file_ds
 
@@ -317,18 +361,31 @@ def _menu(menu_parser):
                 file_ds = data_source_search(file_ds, args.search)
                 if not file_ds:
                     quit()  # something went wrong in executing the search or 0 results where returned
-            if args.update and check_file(args.file_tech, FILE_TYPE_TECHNIQUE_ADMINISTRATION, args.health):
-                update_technique_administration_file(file_ds, args.file_tech, args.force_overwrite)
-            if args.layer:
-                generate_data_sources_layer(file_ds, args.output_filename, args.force_overwrite, args.layer_name, layer_settings)
-            if args.excel:
-                export_data_source_list_to_excel(file_ds, args.output_filename, args.force_overwrite, eql_search=args.search)
-            if args.graph:
-                plot_data_sources_graph(file_ds, args.output_filename, args.force_overwrite)
-            if args.yaml:
-                generate_technique_administration_file(file_ds, args.output_filename, args.force_overwrite, all_techniques=args.yaml_all_techniques)
+            if args.update and args.update_policy:
+                policy = load_update_policy(args.update_policy)
+                if not policy:
+                    quit()
+                files_tech = [f for f in args.file_tech if check_file(f, FILE_TYPE_TECHNIQUE_ADMINISTRATION, args.health)]
+                if files_tech:
+                    update_technique_administration_files(file_ds, files_tech, policy, args.output_filename, args.force_overwrite)
+            elif args.update:
+                if len(args.file_tech) > 1:
+                    print('[!] Multiple technique administration files can only be updated with the option \'--update-policy\'')
+                    quit()
+                if check_file(args.file_tech[0], FILE_TYPE_TECHNIQUE_ADMINISTRATION, args.health):
+                    update_technique_administration_file(file_ds, args.file_tech[0], args.force_overwrite)
+            if args.what_if or args.what_if_all:
+                simulate_data_source_onboarding(file_ds, args.what_if, args.what_if_all)
+            if args.dq_trend:
+                generate_data_quality_trend(args.file_ds, args.dq_archive, args.dq_history, args.output_filename, args.force_overwrite)
+            generate_data_source_outputs(file_ds, args.output_filename, args.force_overwrite, layer=args.layer, excel=args.excel,
+                                         graph=args.graph, yaml=args.yaml, layer_name=args.layer_name, layer_settings=layer_settings,
+                                         eql_search=args.search, yaml_all_techniques=args.yaml_all_techniques)
 
     elif args.subparser in ['visibility', 'v']:
+        from generic import check_file, check_platform
+        from eql_yaml import techniques_search
+        from technique_mapping import generate_visibility_layer, plot_graph, export_techniques_list_to_excel
         if check_file(args.file_tech, FILE_TYPE_TECHNIQUE_ADMINISTRATION, args.health):
             layer_settings = _parse_layer_settings(args.layer_settings)
             file_tech = args.file_tech
@@ -352,15 +409,21 @@ def _menu(menu_parser):
             if args.excel:
                 export_techniques_list_to_excel(file_tech, args.output_filename, args.force_overwrite)
 
-    # TODO add Group EQL search capabilities
     elif args.subparser in ['group', 'g']:
+        from group_mapping import generate_group_heat_map, generate_group_heat_maps_batch
         layer_settings = _parse_layer_settings(args.layer_settings)
-        generate_group_heat_map(args.groups, args.campaigns, args.overlay, args.overlay_type, args.platform,
-                                args.software, args.include_software, args.search_visibility, args.search_detection, args.health,
-                                args.output_filename, args.force_overwrite, args.layer_name, args.domain, layer_settings,
-                                args.all_scores, args.count_detections)
+        if args.batch:
+            generate_group_heat_maps_batch(args.batch, layer_settings, args.output_filename, args.force_overwrite, args.health)
+        else:
+            generate_group_heat_map(args.groups, args.campaigns, args.overlay, args.overlay_type, args.platform,
+                                    args.software, args.include_software, args.search_visibility, args.search_detection,
+                                    args.health, args.output_filename, args.force_overwrite, args.layer_name, args.domain,
+                                    layer_settings, args.all_scores, args.count_detections, args.search)
 
     elif args.subparser in ['detection', 'd']:
+        from generic import check_file, check_platform
+        from eql_yaml import techniques_search
+        from technique_mapping import generate_detection_layer, plot_graph, export_techniques_list_to_excel
         if check_file(args.file_tech, FILE_TYPE_TECHNIQUE_ADMINISTRATION, args.health):
             layer_settings = _parse_layer_settings(args.layer_settings)
             file_tech = args.file_tech
@@ -385,6 +448,8 @@ def _menu(menu_parser):
                 export_techniques_list_to_excel(file_tech, args.output_filename, args.force_overwrite)
 
     elif args.subparser in ['generic', 'ge']:
+        from generic import check_platform
+        from generic_mode import get_statistics_data_sources, get_statistics_mitigations, get_updates, get_platforms
         if args.datasources:
             platform = args.platform
             if platform:
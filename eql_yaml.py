@@ -1,4 +1,5 @@
 import datetime
+import hashlib
 import sys
 import eql
 from pprint import pprint
@@ -6,6 +7,30 @@ from copy import deepcopy
 from generic import *
 from health import *
 
+# The learned EQL schemas by YAML content, object type and include_all_score_objs, and the parsed EQL queries per schema
+_eql_schema_cache = {}
+_eql_query_cache = {}
+# The compiled native filters by object type and EQL query (None when the query is not supported by the native filter)
+_native_filter_cache = {}
+# The prebuilt EQL events of the ATT&CK groups and campaigns per ATT&CK snapshot and domain, and of the group
+# administration files per YAML content
+_group_event_store = {}
+
+# The fields the native filter supports per object type, with the type of their values
+_NATIVE_FILTER_FIELDS = {
+    'data_sources': dict([(('data_source_name',), str), (('applicable_to',), str), (('comment',), str),
+                          (('available_for_data_analytics',), bool)] +
+                         [(('data_quality', dimension), int) for dimension in DATA_QUALITY_DIMENSIONS]),
+    'visibility': {('technique_id',): str, ('technique_name',): str, ('visibility', 'comment'): str,
+                   ('visibility', 'score_logbook', 'score'): int, ('visibility', 'score_logbook', 'date'): str,
+                   ('visibility', 'score_logbook', 'comment'): str, ('visibility', 'score_logbook', 'auto_generated'): bool},
+    'detection': {('technique_id',): str, ('technique_name',): str, ('detection', 'comment'): str,
+                  ('detection', 'score_logbook', 'score'): int, ('detection', 'score_logbook', 'date'): str,
+                  ('detection', 'score_logbook', 'comment'): str},
+    'groups': {('group_id',): str, ('group_name',): str, ('campaign_id',): str, ('campaign',): str,
+               ('technique_id',): str, ('platform',): str, ('weight',): int}}
+_NATIVE_FILTER_LITERALS = {eql.ast.String: str, eql.ast.Number: int, eql.ast.Boolean: bool}
+
 
 def _traverse_modify_date(obj):
     """
@@ -23,21 +48,40 @@ def _traverse_modify_date(obj):
     return traverse_dict(obj, callback=_transformer)
 
 
+class _EventStream:
+    """
+    Re-iterable stream of EQL events. The events are created lazily from the (already parsed) YAML content on every
+    iteration, so they are never all kept in memory at once.
+    """
+    def __init__(self, event_type, key, to_events, *args):
+        """
+        :param event_type: the EQL event type
+        :param key: key that identifies the events (used to cache the learned EQL schema)
+        :param to_events: generator function that creates the EQL 'events'
+        :param args: the arguments for the generator function
+        """
+        self.event_type = event_type
+        self.key = key
+        self.to_events = to_events
+        self.args = args
+
+    def __iter__(self):
+        return (eql.Event(self.event_type, 0, e) for e in self.to_events(*self.args))
+
+
 def _techniques_to_events(techniques, obj_type, include_all_score_objs):
     """
-    Transform visibility or detection objects into EQL 'events'
+    Transform visibility or detection objects into EQL 'events'. Only the keys of the technique and of the visibility
+    or detection object are copied into an event: the values are references to the YAML objects.
     :param techniques: visibility or detection YAML objects within a list
     :param obj_type: 'visibility' or 'detection'
     :param include_all_score_objs: include all score objects within the score_logbook for the EQL query
-    :return: EQL 'events'
+    :return: generator with EQL 'events'
     """
-    technique_events = []
-
-    techniques = techniques['techniques']
-
-    for tech in techniques:
+    for tech in techniques['techniques']:
         if not isinstance(tech[obj_type], list):
             tech[obj_type] = [tech[obj_type]]
+        tech_event = {k: v for k, v in tech.items() if k not in ('visibility', 'detection')}
 
         # loop over all visibility or detection objects
         for obj in tech[obj_type]:
@@ -50,103 +94,147 @@ def _techniques_to_events(techniques, obj_type, include_all_score_objs):
 
             # loop over all scores (if we have multiple) create the actual events for EQL
             for scr_log in obj['score_logbook']:
-                event_lvl_2 = deepcopy(obj)
-                event_lvl_2['score_logbook'] = scr_log
-                event_lvl_1 = deepcopy(tech)
-                del event_lvl_1['visibility']
-                del event_lvl_1['detection']
-                event_lvl_1[obj_type] = event_lvl_2
-
-                technique_events.append(event_lvl_1)
-
-    return technique_events
+                event = dict(tech_event)
+                event[obj_type] = dict(obj, score_logbook=scr_log)
+                yield event
 
 
 def _data_sources_to_events(data_sources):
     """
-    Transform data source objects into EQL 'events'
+    Transform data source objects into EQL 'events'. Only the keys of the data source details object are copied into
+    an event: the values are references to the YAML objects.
     :param data_sources: data sources within a list
-    :return: EQL 'events'
+    :return: generator with EQL 'events'
     """
-    data_source_events = []
-
     for ds_name, ds_details_objects in data_sources.items():
         for ds in ds_details_objects['data_source']:
-            ds = set_yaml_dv_comments(ds)
-            event = deepcopy(ds)
-            event['data_source_name'] = ds_name
-            for a in event['applicable_to']:
+            ds_event = dict(set_yaml_dv_comments(ds), data_source_name=ds_name)
+            for a in ds['applicable_to']:
+                event = dict(ds_event)
                 event['applicable_to'] = a
-                data_source_events.append(deepcopy(event))
+                yield event
 
-    return data_source_events
 
-
-def _yaml_object_in_list(eql_event, yaml_object, obj_type):
+def _attack_groups_to_events(tech_by_group, tech_in_campaign, software_by_group, software_in_campaign, domain):
     """
-    - Check if the EQL event/YAML object already exists within the provided list of YAML objects (detection, visibility or data_source)
-    - If it exists return the object's index in the list of other objects to which:
-      * the score_logbook should be added
-      * or, the applicable_to value should added
-
-    This is needed for techniques which have multiple visibility or detection objects,
-    and a data source with multiple applicable_to values
-    :param eql_event: visibility, detection or data_source EQL event
-    :param yaml_object: the technique or data_source object that's being reconstructing from the EQL events
-    :param obj_type: 'visibility', 'detection' or 'data_source'
-    :return: -1 if it does not exists, otherwise the index within the list
-    """
-    idx = 0
-    for obj in yaml_object[obj_type]:
-        match = True
-        for k, v in eql_event.items():
-            # We need to skip the score_logbook or applicable_to in the comparison.
-            # This will not match as we are still re-creating the object.
-            if (k in obj and obj[k] == v) or \
-                (k == 'score_logbook' and obj_type in ['visibility', 'detection']) or \
-                    (k == 'applicable_to' and obj_type == 'data_source'):
+    Transform the techniques used by the ATT&CK groups and campaigns into EQL 'events'. There is an event per
+    group/campaign, technique and platform of the technique.
+    :param tech_by_group: the techniques used by groups (DATA_TYPE_CUSTOM_TECH_BY_GROUP)
+    :param tech_in_campaign: the techniques used in campaigns (DATA_TYPE_CUSTOM_TECH_IN_CAMPAIGN)
+    :param software_by_group: the software used by groups (DATA_TYPE_CUSTOM_SOFTWARE_BY_GROUP)
+    :param software_in_campaign: the software used in campaigns (DATA_TYPE_CUSTOM_SOFTWARE_IN_CAMPAIGN)
+    :param domain: the ATT&CK domain
+    :return: list with EQL 'events'
+    """
+    # { group_id/campaign_id: [software_id, ...] }
+    software = {}
+    for data, id_key in [(software_by_group, 'group_id'), (software_in_campaign, 'campaign_id')]:
+        for s in data:
+            if domain in s['x_mitre_domains']:
+                software.setdefault(s[id_key], []).append(s['software_id'])
+
+    events = []
+    for data, id_key in [(tech_by_group, 'group_id'), (tech_in_campaign, 'campaign_id')]:
+        for t in data:
+            if domain not in t['x_mitre_domains']:
                 continue
+            if id_key == 'group_id':
+                event = {'group_id': t['group_id'], 'group_name': t['name'], 'aliases': t['aliases'] or []}
             else:
-                match = False
-                break
-        if match:
-            return idx
-        idx += 1
+                event = {'campaign_id': t['campaign_id'], 'campaign': t['name']}
+            event.update(technique_id=t['technique_id'], software_id=software.get(t[id_key], []), weight=1)
 
-    return -1
+            # we just set this to an random legit value, because for pre-attack 'platform' is not used
+            for platform in t['x_mitre_platforms'] or ['Windows']:
+                events.append(dict(event, platform=platform))
+    return events
 
 
-def _value_in_dict_list(dict_list, dict_key, dict_value):
+def _group_file_to_events(yaml_content):
     """
-    Checks if the provided value is present within a certain dict key against a list of dictionaries
-    :param dict_list: list of dictionaries
-    :param dict_key: key name
-    :param dict_value: key value to match on
-    :return: true or false
+    Transform the enabled groups within a group administration file into EQL 'events'. There is an event per group,
+    technique and platform of the file.
+    :param yaml_content: the content of the group administration file
+    :return: list with EQL 'events'
     """
-    items = set(map(lambda k: k[dict_key], dict_list))
-    if dict_value in items:
-        return True
+    domain = yaml_content.get('domain', 'enterprise-attack')
+    platforms = get_platform_from_yaml(yaml_content, domain) or get_platform_in_correct_capitalisation('all', domain)
+
+    events = []
+    for group in yaml_content['groups']:
+        if not group['enabled']:
+            continue
+        event = {'group_name': str(group['group_name']), 'software_id': group.get('software_id', None) or []}
+        if group.get('campaign', None):
+            event['campaign'] = str(group['campaign'])
+
+        if isinstance(group['technique_id'], dict):
+            weights = group['technique_id']
+        else:
+            weights = dict((tech_id, 1) for tech_id in group['technique_id'])
+        for tech_id, weight in weights.items():
+            for platform in platforms:
+                events.append(dict(event, technique_id=tech_id, weight=weight, platform=platform))
+    return events
+
+
+def _get_group_events(filename, domain):
+    """
+    Get the EQL events of a group administration file, or of the ATT&CK groups and campaigns within a domain. The
+    events are built once per YAML content or ATT&CK snapshot, and are reused by every following search.
+    :param filename: file location of the group administration YAML file, or None for the ATT&CK groups and campaigns
+    :param domain: the ATT&CK domain (only used for the ATT&CK groups and campaigns)
+    :return: events, see _EventStream
+    """
+    if filename is None:
+        # the ATT&CK data is loaded once per process, so its objects identify the ATT&CK snapshot in use. They are
+        # kept in the store, so that their ids cannot be reused.
+        attack_data = tuple(load_attack_data(data_type) for data_type in
+                            [DATA_TYPE_CUSTOM_TECH_BY_GROUP, DATA_TYPE_CUSTOM_TECH_IN_CAMPAIGN,
+                             DATA_TYPE_CUSTOM_SOFTWARE_BY_GROUP, DATA_TYPE_CUSTOM_SOFTWARE_IN_CAMPAIGN])
+        store_key = (tuple(id(data) for data in attack_data), domain)
+        if store_key not in _group_event_store:
+            _group_event_store[store_key] = (attack_data, _attack_groups_to_events(*attack_data, domain))
     else:
-        return False
+        store_key = _get_content_hash(filename)
+        if store_key not in _group_event_store:
+            _group_event_store[store_key] = (None, _group_file_to_events(load_yaml_file(filename)))
 
+    return _EventStream('groups', (store_key, 'groups'), iter, _group_event_store[store_key][1])
 
-def _get_item_from_list(items, item_id_name, item_id_value):
+
+def _get_fingerprint(value):
     """
-    Get a technique object from a list of techniques objects that matches the provided technique ID
-    :param items: list of techniques or data souces
-    :param item_id: technique_id or data_source_name
-    :return: technique / data source object or None of no match is found
+    Get a canonical, hashable representation of a (nested) YAML value
+    :param value: dictionary, list or value
+    :return: hashable fingerprint
     """
-    for i in items:
-        if i[item_id_name] == item_id_value:
-            return i
-    return None
+    if isinstance(value, dict):
+        return tuple(sorted((k, _get_fingerprint(v)) for k, v in value.items()))
+    elif isinstance(value, list):
+        return tuple(_get_fingerprint(v) for v in value)
+    return value
+
+
+def _get_object_fingerprint(eql_event, obj_type):
+    """
+    Get the fingerprint of a visibility, detection or data_source EQL event/YAML object. The score_logbook or
+    applicable_to is left out, because the object is re-created from multiple events that only differ in these values.
+    This is needed for techniques which have multiple visibility or detection objects, and a data source with multiple
+    applicable_to values.
+    :param eql_event: visibility, detection or data_source EQL event
+    :param obj_type: 'visibility', 'detection' or 'data_source'
+    :return: hashable fingerprint
+    """
+    skip_key = 'applicable_to' if obj_type == 'data_source' else 'score_logbook'
+    return _get_fingerprint({k: v for k, v in eql_event.items() if k != skip_key})
 
 
 def _events_to_yaml(query_results, obj_type):
     """
-    Transform the EQL 'events' back to valid YAML objects
+    Transform the EQL 'events' back to valid YAML objects. The reconstructed techniques/data sources are indexed on
+    their technique_id/data_source_name, and their detection, visibility or data source details objects on their
+    fingerprint, so every event is added in constant time.
     :param query_results: list with EQL 'events'
     :param obj_type: data_sources, detection or visibility EQL 'events'
     :return: list containing YAML objects or None when the events could not be turned into a valid YAML object
@@ -154,6 +242,7 @@ def _events_to_yaml(query_results, obj_type):
 
     if obj_type == 'data_sources':
         data_sources_yaml = []
+        data_sources_index = {}  # {data_source_name: (data source dict, {fingerprint: index of the details object})}
         try:
             for ds in query_results:
                 if ds['date_registered'] and isinstance(ds['date_registered'], str):
@@ -167,25 +256,25 @@ def _events_to_yaml(query_results, obj_type):
                 del ds['data_source_name']
 
                 # create the data source dict if not already created
-                if not _value_in_dict_list(data_sources_yaml, 'data_source_name', ds_name):
+                if ds_name not in data_sources_index:
                     ds_yaml = {
                         'data_source_name': ds_name, 'data_source': []
                     }
                     data_sources_yaml.append(ds_yaml)
-                else:
-                    # The data source dict was already created. Get a ds. dict from the list with a specific data source name
-                    ds_yaml = _get_item_from_list(data_sources_yaml, 'data_source_name', ds_name)
+                    data_sources_index[ds_name] = (ds_yaml, {})
+                ds_yaml, objects_index = data_sources_index[ds_name]
 
                 # figure out if the data source details object already exists
-                obj_idx = _yaml_object_in_list(ds, ds_yaml, 'data_source')
+                fingerprint = _get_object_fingerprint(ds, 'data_source')
 
                 # The data source details object is missing, add it to the list
-                if obj_idx == -1:
+                if fingerprint not in objects_index:
+                    objects_index[fingerprint] = len(ds_yaml['data_source'])
                     ds['applicable_to'] = [ds['applicable_to']]
                     ds_yaml['data_source'].append(deepcopy(ds))
                 else:
-                    # add the applicable_to value to the correct data source details object using 'obj_idx'
-                    ds_yaml['data_source'][obj_idx]['applicable_to'].append(ds['applicable_to'])
+                    # add the applicable_to value to the correct data source details object
+                    ds_yaml['data_source'][objects_index[fingerprint]]['applicable_to'].append(ds['applicable_to'])
 
         except KeyError:
             print(EQL_INVALID_RESULT_DS)
@@ -206,6 +295,7 @@ def _events_to_yaml(query_results, obj_type):
     elif obj_type in ['visibility', 'detection']:
         try:
             techniques_yaml = []
+            techniques_index = {}  # {technique_id: (technique dict, {fingerprint: index of the detection/visibility object})}
             # loop over all events and reconstruct the YAML file
             for tech_event in query_results:
                 tech_id = tech_event['technique_id']
@@ -214,17 +304,16 @@ def _events_to_yaml(query_results, obj_type):
                 score_logbook_event = tech_event[obj_type]['score_logbook']
 
                 # create the technique dict if not already created
-                if not _value_in_dict_list(techniques_yaml, 'technique_id', tech_id):
+                if tech_id not in techniques_index:
                     tech_yaml = {
                         'technique_id': tech_id, 'technique_name': tech_name, 'detection': [], 'visibility': []
                     }
                     techniques_yaml.append(tech_yaml)
-                else:
-                    # The technique dict was already created. Get a tech. dict from the list with a specific tech. ID
-                    tech_yaml = _get_item_from_list(techniques_yaml, 'technique_id', tech_id)
+                    techniques_index[tech_id] = (tech_yaml, {})
+                tech_yaml, objects_index = techniques_index[tech_id]
 
                 # figure out if the detection/visibility dict already exists
-                obj_idx = _yaml_object_in_list(obj_event, tech_yaml, obj_type)
+                fingerprint = _get_object_fingerprint(obj_event, obj_type)
 
                 # create the score object
                 score_obj_yaml = {}
@@ -236,12 +325,13 @@ def _events_to_yaml(query_results, obj_type):
                     score_obj_yaml[k] = value
 
                 # The detection/visibility dict is missing. Create it.
-                if obj_idx == -1:
+                if fingerprint not in objects_index:
+                    objects_index[fingerprint] = len(tech_yaml[obj_type])
                     obj_event['score_logbook'] = [score_obj_yaml]
                     tech_yaml[obj_type].append(obj_event)
                 else:
-                    # add the score object to the score_logbook within the proper detection/visibility object using 'obj_idx'
-                    tech_yaml[obj_type][obj_idx]['score_logbook'].append(score_obj_yaml)
+                    # add the score object to the score_logbook within the proper detection/visibility object
+                    tech_yaml[obj_type][objects_index[fingerprint]]['score_logbook'].append(score_obj_yaml)
 
             return techniques_yaml
 
@@ -264,10 +354,11 @@ def _merge_yaml(yaml_content_org, yaml_content_visibility=None, yaml_content_det
     # for both a visibility and detection objects an EQL query was provided
     if yaml_content_visibility and yaml_content_detection:
         techniques_yaml = []
+        detection_index = {tech_d['technique_id']: tech_d for tech_d in reversed(yaml_content_detection)}
 
         # combine visibility objects with detection objects
         for tech_vis in yaml_content_visibility:
-            detection = _get_item_from_list(yaml_content_detection, 'technique_id', tech_vis['technique_id'])
+            detection = detection_index.get(tech_vis['technique_id'])
             if detection:
                 detection = detection['detection']
             else:
@@ -278,8 +369,9 @@ def _merge_yaml(yaml_content_org, yaml_content_visibility=None, yaml_content_det
             techniques_yaml.append(new_tech)
 
         # merge detection objects into 'techniques_yaml' which were not already added by the previous step
+        visibility_tech_ids = set(tech_vis['technique_id'] for tech_vis in yaml_content_visibility)
         for tech_d in yaml_content_detection:
-            if not _value_in_dict_list(techniques_yaml, 'technique_id', tech_d['technique_id']):
+            if tech_d['technique_id'] not in visibility_tech_ids:
                 visibility = deepcopy(YAML_OBJ_VISIBILITY)
 
                 new_tech = tech_d
@@ -289,17 +381,17 @@ def _merge_yaml(yaml_content_org, yaml_content_visibility=None, yaml_content_det
     # only a visibility EQL query was provided
     elif yaml_content_visibility:
         techniques_yaml = yaml_content_visibility
+        techniques_org = {tech_org['technique_id']: tech_org for tech_org in reversed(yaml_content_org['techniques'])}
 
         for tech_yaml in techniques_yaml:
-            tech_org = _get_item_from_list(yaml_content_org['techniques'], 'technique_id', tech_yaml['technique_id'])
-            tech_yaml['detection'] = tech_org['detection']
+            tech_yaml['detection'] = techniques_org[tech_yaml['technique_id']]['detection']
     # only a detection EQL query was provided
     elif yaml_content_detection:
         techniques_yaml = yaml_content_detection
+        techniques_org = {tech_org['technique_id']: tech_org for tech_org in reversed(yaml_content_org['techniques'])}
 
         for tech_yaml in techniques_yaml:
-            tech_org = _get_item_from_list(yaml_content_org['techniques'], 'technique_id', tech_yaml['technique_id'])
-            tech_yaml['visibility'] = tech_org['visibility']
+            tech_yaml['visibility'] = techniques_org[tech_yaml['technique_id']]['visibility']
 
     # create the final technique administration YAML 'file'/dict
     techniques_yaml_final = yaml_content_org
@@ -308,38 +400,52 @@ def _merge_yaml(yaml_content_org, yaml_content_visibility=None, yaml_content_det
     return techniques_yaml_final
 
 
-def _prepare_yaml_file(filename, obj_type, include_all_score_objs):
+def _get_content_hash(filename):
+    """
+    Get the hash of the YAML file's content
+    :param filename: file location of the YAML file or a dict
+    :return: SHA-256 hash
+    """
+    if isinstance(filename, dict):
+        content = repr(filename).encode()
+    else:
+        with open(filename, 'rb') as yaml_file:
+            content = yaml_file.read()
+    return hashlib.sha256(content).hexdigest()
+
+
+def _prepare_yaml_file(filename, obj_types, include_all_score_objs):
     """
-    Prepare the YAML file such that it can be used for EQL
+    Prepare the YAML file such that it can be used for EQL. The file is loaded once for all object types.
     :param filename: file location of the YAML file
-    :param obj_type: technique administration file ('visibility' or 'detection') or data source administration file ('data_source')
-    :return: A dict with date fields compatible for JSON and a new key-value pair event-type
-    for the EQL engine
+    :param obj_types: list with the object types: 'visibility' and/or 'detection' for a technique administration file
+    or 'data_sources' for a data source administration file
+    :param include_all_score_objs: include all score objects within the score_logbook for the EQL query
+    :return: A dict with per object type the EQL events (with date fields compatible for JSON and a new key-value pair
+    event-type for the EQL engine), and the YAML content
     """
+    content_hash = _get_content_hash(filename)
     if isinstance(filename, dict):
         # file is a dict created due to the use of an EQL query by the user
         yaml_content = filename
     else:
         # file is a file location on disk
-        _yaml = init_yaml()
-        with open(filename, 'r') as yaml_file:
-            yaml_content = _yaml.load(yaml_file)
-
-    yaml_content_eql = _traverse_modify_date(yaml_content)
-    yaml_eql_events = []
+        yaml_content = load_yaml_file(filename)
 
+    yaml_eql_events = {}
     # create EQL events from the list of dictionaries
-    if obj_type == 'data_sources':
+    if 'data_sources' in obj_types:
         yaml_content_eql, _, _, _, _ = load_data_sources(yaml_content, filter_empty_scores=False)
-        yaml_content_eql = _data_sources_to_events(yaml_content_eql)
-        for e in yaml_content_eql:
-            yaml_eql_events.append(eql.Event(obj_type, 0, e))
+        yaml_eql_events['data_sources'] = _EventStream('data_sources', (content_hash, 'data_sources'),
+                                                       _data_sources_to_events, yaml_content_eql)
 
     # flatten the technique administration file to EQL events
-    elif obj_type in ['visibility', 'detection']:
-        yaml_content_eql = _techniques_to_events(yaml_content_eql, obj_type, include_all_score_objs)
-        for e in yaml_content_eql:
-            yaml_eql_events.append(eql.Event('techniques', 0, e))
+    tech_obj_types = [obj_type for obj_type in obj_types if obj_type in ['visibility', 'detection']]
+    if tech_obj_types:
+        yaml_content_eql = _traverse_modify_date(yaml_content)
+        for obj_type in tech_obj_types:
+            yaml_eql_events[obj_type] = _EventStream('techniques', (content_hash, obj_type, include_all_score_objs),
+                                                     _techniques_to_events, yaml_content_eql, obj_type, include_all_score_objs)
 
     return yaml_eql_events, yaml_content
 
@@ -370,42 +476,219 @@ def _check_query_results(query_results, obj_type):
         return True
 
 
-def _execute_eql_query(events, query):
+def _get_eql_schema(events):
     """
-    Execute an EQL query against the provided events
-    :param events: events
+    Get the EQL schema for the provided events. The schema is learned once per YAML content and object type.
+    :param events: events, see _EventStream
+    :return: EQL schema
+    """
+    if events.key not in _eql_schema_cache:
+        _eql_schema_cache[events.key] = eql.Schema.learn(events)
+    return _eql_schema_cache[events.key]
+
+
+def _parse_eql_query(query, schema, schema_key):
+    """
+    Parse an EQL query against the provided schema. Parsed queries are cached per schema.
     :param query: EQL query
-    :return: the query results (i.e. filtered events) or None when the query did not match the schema
+    :param schema: EQL schema
+    :param schema_key: key of the EQL schema
+    :return: the parsed EQL query
     """
-    # learn and load the schema
-    schema = eql.Schema.learn(events)
+    if (schema_key, query) not in _eql_query_cache:
+        with schema:
+            _eql_query_cache[(schema_key, query)] = eql.parse_query(query, implied_any=True, implied_base=True)
+    return _eql_query_cache[(schema_key, query)]
 
-    query_results = []
 
-    def callback(results):
-        for event in results.events:
-            query_results.append(event.data)
+def _get_field_value(data, path):
+    """
+    Get the value of a (nested) field from an event
+    :param data: the event's data
+    :param path: the path of the field
+    :return: the value or None when the field does not exist
+    """
+    for key in path:
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+
+def _to_bool_or_null(value):
+    """
+    Helper function for the boolean logic in the native filter, which is the same as within EQL: a missing value is
+    neither true nor false.
+    :param value: value
+    :return: True, False or None
+    """
+    if value is not None:
+        return bool(value)
+
+
+def _compile_native_filter_node(node, fields):
+    """
+    Compile a node of a parsed EQL query into a function for the native filter. The supported nodes are: and, or, not,
+    comparisons (==, !=, <, <=, >, >=) and 'in' between a supported field and literal(s) of the field's type.
+    :param node: node of the parsed EQL query
+    :param fields: the supported fields with the type of their values, see _NATIVE_FILTER_FIELDS
+    :return: function that evaluates the node for an event's data (to True, False or None like EQL does), or None when
+    the node is not supported
+    """
+    if isinstance(node, (eql.ast.And, eql.ast.Or)):
+        terms = [_compile_native_filter_node(term, fields) for term in node.terms]
+        if None in terms:
+            return None
+        stop_value = isinstance(node, eql.ast.Or)
+
+        def evaluate_terms(data):
+            aggregate = stop_value is False
+            for term in terms:
+                value = _to_bool_or_null(term(data))
+                if value is stop_value:
+                    return stop_value
+                elif value is None:
+                    aggregate = None
+            return aggregate
+        return evaluate_terms
+
+    elif isinstance(node, eql.ast.Not):
+        term = _compile_native_filter_node(node.term, fields)
+        if term is None:
+            return None
+
+        def negate(data):
+            value = term(data)
+            if value is not None:
+                return not value
+        return negate
+
+    elif isinstance(node, eql.ast.Comparison) and isinstance(node.left, eql.ast.Field):
+        path = tuple([node.left.base] + node.left.path)
+        if fields.get(path) is None or fields[path] is not _NATIVE_FILTER_LITERALS.get(type(node.right)):
+            return None
+        literal = node.right.value
+        function = node.function
+
+        def compare(data):
+            value = _get_field_value(data, path)
+            if value is None:
+                return None
+            if isinstance(value, str) and isinstance(literal, str):
+                return function(eql.utils.fold_case(value), eql.utils.fold_case(literal))
+            if eql.utils.is_number(value) and eql.utils.is_number(literal) or type(value) == type(literal):
+                return function(value, literal)
+        return compare
+
+    elif isinstance(node, eql.ast.InSet) and isinstance(node.expression, eql.ast.Field):
+        path = tuple([node.expression.base] + node.expression.path)
+        if fields.get(path) is None or \
+                any(fields[path] is not _NATIVE_FILTER_LITERALS.get(type(item)) for item in node.container):
+            return None
+        values = set(eql.utils.fold_case(item.value) for item in node.container)
+
+        def in_set(data):
+            value = _get_field_value(data, path)
+            if value is not None:
+                return eql.utils.fold_case(value) in values
+        return in_set
+
+    return None
 
-    # create the engine and parse the query
-    engine = eql.PythonEngine()
-    with schema:
+
+def _compile_native_filter(events, query):
+    """
+    Compile an EQL query into a native filter, which evaluates the query directly on the events without learning the
+    EQL schema and without the EQL engine. This is only possible for simple queries on the fields in
+    _NATIVE_FILTER_FIELDS, other queries are executed by EQL.
+    :param events: events, see _EventStream
+    :param query: EQL query
+    :return: function that returns True when an event's data matches the query, or None when the query is not supported
+    """
+    obj_type = events.key[1]
+    if (obj_type, query) not in _native_filter_cache:
+        native_filter = None
         try:
             eql_query = eql.parse_query(query, implied_any=True, implied_base=True)
-            engine.add_query(eql_query)
+        except eql.EqlError:
+            eql_query = None
+
+        if isinstance(eql_query, eql.ast.PipedQuery) and not eql_query.pipes and \
+                isinstance(eql_query.first, eql.ast.EventQuery) and eql_query.first.event_type in [events.event_type, 'any']:
+            evaluate = _compile_native_filter_node(eql_query.first.query, _NATIVE_FILTER_FIELDS[obj_type])
+            if evaluate:
+                native_filter = lambda data: bool(evaluate(data))  # noqa
+        _native_filter_cache[(obj_type, query)] = native_filter
+
+    return _native_filter_cache[(obj_type, query)]
+
+
+def _execute_eql_queries(events, queries):
+    """
+    Execute multiple EQL queries in a single pass over the provided events. Simple queries are evaluated by a native
+    filter, see _compile_native_filter. The EQL schema is only learned when there are other queries.
+    :param events: events, see _EventStream
+    :param queries: list of EQL queries
+    :return: list with per query the query results (i.e. filtered events) or None when the query did not match the schema
+    """
+    query_results = [None] * len(queries)
+    native_filters = []
+    engine = None
+
+    for i, query in enumerate(queries):
+        native_filter = _compile_native_filter(events, query)
+        if native_filter:
+            query_results[i] = []
+            native_filters.append((i, native_filter))
+            continue
+
+        # create the engine and parse the queries
+        if engine is None:
+            schema = _get_eql_schema(events)
+            engine = eql.PythonEngine()
+        try:
+            eql_query = _parse_eql_query(query, schema, events.key)
         except eql.EqlError as e:
             print(e, file=sys.stderr)
             print('\nTake into account the following schema:')
             pprint(schema.schema)
-            # when using an EQL query that does not match the schema, return None.
-            return None
-    engine.add_output_hook(callback)
+            # when using an EQL query that does not match the schema, the result is None.
+            continue
+        query_results[i] = []
+        # the analytic ID is the position of the query plus one, as analytics without an ID are not reported separately
+        engine.add_analytic(eql.ast.EqlAnalytic(eql_query, {'id': i + 1}))
 
-    # execute the query
-    engine.stream_events(events)
+    def callback(results):
+        for event in results.events:
+            query_results[results.analytic_id - 1].append(event.data)
+
+    if engine:
+        engine.add_output_hook(callback)
+
+    # execute the queries
+    if any(r is not None for r in query_results):
+        for event in events:
+            for i, native_filter in native_filters:
+                if native_filter(event.data):
+                    query_results[i].append(event.data)
+            if engine:
+                engine.stream_event(event)
+        if engine:
+            engine.finalize()
 
     return query_results
 
 
+def _execute_eql_query(events, query):
+    """
+    Execute an EQL query against the provided events
+    :param events: events, see _EventStream
+    :param query: EQL query
+    :return: the query results (i.e. filtered events) or None when the query did not match the schema
+    """
+    return _execute_eql_queries(events, [query])[0]
+
+
 def _get_applicable_to_yaml_values(filename, type):
     """
     Get all the applicable to values, in lower case, from the provided YAML file.
@@ -435,20 +718,17 @@ def techniques_search(filename, query_visibility=None, query_detection=None, inc
     """
     results_visibility_yaml = None
     results_detection_yaml = None
+    events, yaml_content_org = _prepare_yaml_file(filename, [obj_type for obj_type, query in [('visibility', query_visibility),
+                                                                                              ('detection', query_detection)] if query],
+                                                  include_all_score_objs=include_all_score_objs)
     if query_visibility:
-        visibility_events, yaml_content_org = _prepare_yaml_file(filename, 'visibility',
-                                                                 include_all_score_objs=include_all_score_objs)
-
-        results_visibility = _execute_eql_query(visibility_events, query_visibility)
+        results_visibility = _execute_eql_query(events['visibility'], query_visibility)
         if not _check_query_results(results_visibility, 'visibility'):
             return None  # the EQL query was not compatible with the schema
 
         results_visibility_yaml = _events_to_yaml(results_visibility, 'visibility')
     if query_detection:
-        detection_events, yaml_content_org = _prepare_yaml_file(filename, 'detection',
-                                                                include_all_score_objs=include_all_score_objs)
-
-        results_detection = _execute_eql_query(detection_events, query_detection)
+        results_detection = _execute_eql_query(events['detection'], query_detection)
         if not _check_query_results(results_detection, 'detection'):
             return None  # the EQL query was not compatible with the schema
 
@@ -477,24 +757,76 @@ def data_source_search(filename, query=''):
     :param query: EQL query
     :return: a filtered YAML 'file' (i.e. dict) or None when the query was not successful
     """
+    return eql_search_batch(filename, [query], 'data_sources')[0]
+
+
+def groups_search(filenames, query, domain):
+    """
+    Perform an EQL search on the techniques used by the groups within group administration files, and/or by the ATT&CK
+    groups and campaigns. The query is executed per event store and the results are merged.
+    :param filenames: list with file locations of group administration YAML files, where None stands for the ATT&CK
+    groups and campaigns
+    :param query: EQL query
+    :param domain: the ATT&CK domain (only used for the ATT&CK groups and campaigns)
+    :return: the query results (i.e. group events) or None when the query was not successful
+    """
+    query_results = []
+    for filename in filenames:
+        results = _execute_eql_query(_get_group_events(filename, domain), query)
+        if results is None:
+            return None  # the EQL query was not compatible with the schema
+        query_results.extend(results)
 
-    yaml_content_eql, yaml_content_org = _prepare_yaml_file(filename, 'data_sources',
-                                                            include_all_score_objs=False)
-    query_results = _execute_eql_query(yaml_content_eql, query)
+    if not _check_query_results(query_results, 'group'):
+        return None  # the EQL query returned 0 results
+    return query_results
 
-    if not _check_query_results(query_results, 'data_sources'):
-        return None  # the EQL query was not compatible with the schema
 
-    query_results_yaml = _events_to_yaml(query_results, 'data_sources')
+def _copy_event(event, obj_type):
+    """
+    Copy the keys of an EQL result event, which are changed when it is transformed back into a YAML object. This allows
+    the same event to be a result of multiple queries.
+    :param event: EQL result event
+    :param obj_type: 'data_sources', 'visibility' or 'detection'
+    :return: copy of the event
+    """
+    event = dict(event)
+    if obj_type in ['visibility', 'detection']:
+        event[obj_type] = dict(event[obj_type])
+    return event
+
 
-    if query_results_yaml:
-        yaml_content = yaml_content_org
-        yaml_content['data_sources'] = query_results_yaml
+def eql_search_batch(filename, queries, obj_type, include_all_score_objs=False):
+    """
+    Perform multiple EQL searches on the visibility or detection objects of a technique administration file, or on a
+    data source administration file. The file is prepared once, and all queries are evaluated in a single pass over
+    the events.
+    :param filename: file location of the YAML file on disk or a dict
+    :param queries: list of EQL queries
+    :param obj_type: 'visibility', 'detection' or 'data_sources'
+    :param include_all_score_objs: include all score objects within the score_logbook for the EQL query
+    :return: list with per query a filtered YAML 'file' (i.e. dict) or None when the query was not successful
+    """
+    events, yaml_content_org = _prepare_yaml_file(filename, [obj_type], include_all_score_objs=include_all_score_objs)
+
+    results = []
+    for query_results in _execute_eql_queries(events[obj_type], queries):
+        if not _check_query_results(query_results, obj_type):
+            results.append(None)  # the EQL query was not compatible with the schema
+            continue
+
+        query_results_yaml = _events_to_yaml([_copy_event(e, obj_type) for e in query_results], obj_type)
+        if not query_results_yaml:
+            # when using an EQL query that does not result in a dict having valid YAML objects, the result is None
+            results.append(None)
+        elif obj_type == 'data_sources':
+            results.append(dict(yaml_content_org, data_sources=query_results_yaml))
+        elif obj_type == 'visibility':
+            results.append(_merge_yaml(dict(yaml_content_org), yaml_content_visibility=query_results_yaml))
+        else:
+            results.append(_merge_yaml(dict(yaml_content_org), yaml_content_detection=query_results_yaml))
 
-        return yaml_content
-    else:
-        # when using an EQL query that does not result in a dict having valid YAML objects, return None
-        return None
+    return results
 
 
 def get_eql_applicable_to_query(args_applicable_to, filename, type):
@@ -30,12 +30,9 @@ def write_file(filename, overwrite_mode, content):
     :param filename: filename
     :param overwrite_mode: defines whether we want to force overwriting existing file
     :param content: the content of the file that needs to be written to the file
-    :return:
+    :return: the filename of the written file, or None when the file could not be written
     """
-    if os.sep in filename:
-        output_filename = _clean_filepath(filename)
-    else:
-        output_filename = 'output/%s' % _clean_filename(filename)
+    output_filename = get_output_filepath(filename)
 
     if not overwrite_mode:
         output_filename = get_non_existing_filename(output_filename, 'json')
@@ -46,8 +43,22 @@ def write_file(filename, overwrite_mode, content):
         with open(output_filename, 'w') as f:
             f.write(content)
         print('File written:   ' + output_filename)
+        return output_filename
     except Exception as e:
         print('[!] Error while writing layer file: %s' % str(e))
+        return None
+
+
+def get_output_filepath(filename):
+    """
+    Get the sanitized path of an output file. A filename without a directory is placed within the output directory.
+    :param filename: filename, with or without a directory
+    :return: the sanitized path
+    """
+    if os.sep in filename:
+        return _clean_filepath(filename)
+    else:
+        return os.path.join('output', _clean_filename(filename))
 
 
 def backup_file(filename):
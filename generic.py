@@ -1,34 +1,23 @@
 import os
 import sys
-import pickle
+from copy import deepcopy
 from datetime import datetime as dt
 from io import StringIO
-from ruamel.yaml import YAML
-from ruamel.yaml.timestamp import TimeStamp as ruamelTimeStamp
-from requests import exceptions
-from stix2 import datastore
 from constants import *
 from upgrade import upgrade_yaml_file
 from health import check_yaml_file_health
-from attack_taxii_client import attack_client
-import dateutil.parser
+from attack_snapshot import load_snapshot_table, write_snapshot
 
 local_stix_path = None
 verify_tls = True
 
-def _save_attack_data(data, path):
-    """
-    Save ATT&CK data to disk for the purpose of caching. Data can be STIX objects our a custom schema.
-    :param data: the MITRE ATT&CK data to save
-    :param path: file path to write to, including filename
-    :return:
-    """
-
-    if not os.path.exists('cache/'):
-        os.mkdir('cache/')
-    with open(path, 'wb') as f:
-        pickle.dump([data, dt.now()], f)
-
+# In-memory caches for the duration of the process. ATT&CK data and the indexes on the ATT&CK techniques per data type.
+_attack_data_cache = {}
+_technique_indexes = {}
+_local_attack_client = None
+_dettect_data_sources_index = None
+# parsed YAML documents: {absolute path: (mtime, size, document)}
+_yaml_document_cache = {}
 
 def _date_hook(json_dict):
     """
@@ -36,6 +25,7 @@ def _date_hook(json_dict):
     :param json_dict: the dictionary with STIX data
     :return:
     """
+    import dateutil.parser
     for (key, value) in json_dict.items():
         if key == 'created':
             json_dict['created'] = dateutil.parser.parse(value)
@@ -44,6 +34,44 @@ def _date_hook(json_dict):
     return json_dict
 
 
+def _stix_object_to_dict(stix_obj):
+    """
+    Convert a STIX object to a dictionary with the created and modified dates as date objects. STIX objects that are
+    already loaded as dictionary (raw STIX JSON data) are only copied.
+    :param stix_obj: stix2 object or dictionary
+    :return: dictionary with the STIX data
+    """
+    if isinstance(stix_obj, dict):
+        return dict(stix_obj)
+    return json.loads(stix_obj.serialize(), object_hook=_date_hook)
+
+
+def _get_dettect_data_sources_index():
+    """
+    Get the index on the DeTT&CT data sources per technique (data/dettect_data_sources.json). The index is created once.
+    :return: dictionary with the technique_id as key and as value a tuple with: a tuple with the DeTT&CT data sources
+    for the technique and a boolean indicating if 'Network Traffic Content' should be removed from the data components
+    """
+    global _dettect_data_sources_index
+    if _dettect_data_sources_index is None:
+        index = {}
+        for dds in get_dettect_data_sources():
+            dettect_data_sources = dds['dettect_data_sources']
+            # When a technique has just 1 DeTT&CT data source which is 'Network Traffic Content' then ignore this one. This means that we
+            # evaluated if that technique needs a DeTT&CT data source but it has not.
+            if len(dettect_data_sources) == 1 and dettect_data_sources[0] == 'Network Traffic Content':
+                index.setdefault(dds['technique_id'], ((), False))
+            else:
+                # Remove 'Network Traffic Content' from the data components list when it's not listed as DeTT&CT data source. In this situation
+                # we are intentionally replacing the 'Network Traffic Content' with our DeTT&CT data sources.
+                # Remove 'Network Traffic Content' from the DeTT&CT data sources list when having both DeTT&CT data sources ánd 'Network Traffic Content'.
+                # That's the case where we keep 'Network Traffic Content' in the data components list.
+                index.setdefault(dds['technique_id'], (tuple(d for d in dettect_data_sources if d != 'Network Traffic Content'),
+                                                       'Network Traffic Content' not in dettect_data_sources))
+        _dettect_data_sources_index = index
+    return _dettect_data_sources_index
+
+
 def _convert_stix_techniques_to_dict(mitre, stix_attack_data):
     """
     Convert the STIX list with AttackPatterns to a dictionary for easier use in python and also include the technique_id and DeTT&CT data sources.
@@ -51,70 +79,27 @@ def _convert_stix_techniques_to_dict(mitre, stix_attack_data):
     :param stix_attack_data: the MITRE ATT&CK STIX dataset with techniques
     :return: list with dictionaries containing all techniques from the input stix_attack_data
     """
-    # Get all data component objects
-    data_components = mitre.get_data_components()
-    dc_lookup = {dc['id']:dc for dc in data_components}
-
-    detection_strategies_stix = mitre.get_detection_strategies(False)
-    detection_strategies_ids = {}
-    for ds_item in detection_strategies_stix:
-        detection_strategies_ids[ds_item["id"]] = ds_item
-
-    analytics_stix = mitre.get_analytics(False)
-    analytics_ids = {}
-    for a_item in analytics_stix:
-        analytics_ids[a_item["id"]] = a_item
-    
-    # Get data components for the technique via detection strategies and analytics:
-    techniques_detection_strategy_relations = mitre.get_techniques_detection_strategy_relations()
-    tech_dc_lookup = {}
-    for ds_rel in techniques_detection_strategy_relations:
-        detection_strategy = detection_strategies_ids[ds_rel["source_ref"]]
-
-        for analytic_ref in detection_strategy.get("x_mitre_analytic_refs", []):
-            analytic = analytics_ids[analytic_ref]
-
-            for log_source_ref in analytic.get("x_mitre_log_source_references", []):
-                data_component = dc_lookup[log_source_ref["x_mitre_data_component_ref"]]
-                tech_dc_lookup.setdefault(ds_rel["target_ref"], set()).add(data_component["name"])
-        
-    for tech, dc in tech_dc_lookup.items():
-        tech_dc_lookup[tech] = list(dc)
-    
+    tech_dc_lookup = mitre.get_techniques_data_components()
+    dds_index = _get_dettect_data_sources_index()
+
     attack_data = []
     for stix_tech in stix_attack_data:
-        tech = json.loads(stix_tech.serialize(), object_hook=_date_hook)
-        
+        tech = _stix_object_to_dict(stix_tech)
+
         # Add technique_id as key, because it's hard to get from STIX:
         tech['technique_id'] = get_attack_id(stix_tech)
-        
-        # Add data components to the technique:
-        tech['data_components'] = []
-        if tech['id'] in tech_dc_lookup.keys():
-            tech['data_components'] = tech_dc_lookup[tech['id']]
-
-        dds_key = 'dettect_data_sources'
-        tech[dds_key] = []
-        for dds in DETTECT_DATA_SOURCES:
-            if tech['technique_id'] == dds['technique_id']:
-                # When a technique has just 1 DeTT&CT data source which is 'Network Traffic Content' then ignore this one. This means that we
-                # evaluated if that technique needs a DeTT&CT data source but it has not.
-                if not (len(dds[dds_key]) == 1 and dds[dds_key][0] == 'Network Traffic Content'):
-                    tech[dds_key] = dds[dds_key]
-
-                    # Remove 'Network Traffic Content' from the data components list when it's not listed as DeTT&CT data source. In this situation
-                    # we are intentionally replacing the 'Network Traffic Content' with our DeTT&CT data sources.
-                    if 'Network Traffic Content' not in dds[dds_key] and 'Network Traffic Content' in tech['data_components']:
-                        tech['data_components'].remove('Network Traffic Content')
-
-                    # Remove 'Network Traffic Content' from the DeTT&CT data sources list when having both DeTT&CT data sources ánd 'Network Traffic Content'.
-                    # That's the case where we keep 'Network Traffic Content' in the data components list.
-                    if 'Network Traffic Content' in dds[dds_key]:
-                        tech[dds_key].remove('Network Traffic Content')
-                break
+
+        # Add data components and DeTT&CT data sources to the technique. Every technique gets its own lists.
+        data_components = tech_dc_lookup.get(tech['id'], ())
+        dettect_data_sources, remove_network_traffic_content = dds_index.get(tech['technique_id'], ((), False))
+        if remove_network_traffic_content:
+            tech['data_components'] = [dc for dc in data_components if dc != 'Network Traffic Content']
+        else:
+            tech['data_components'] = list(data_components)
+        tech['dettect_data_sources'] = list(dettect_data_sources)
 
         attack_data.append(tech)
-    
+
     return attack_data
 
 
@@ -126,7 +111,7 @@ def _convert_stix_groups_to_dict(stix_attack_data):
     """
     attack_data = []
     for stix_group in stix_attack_data:
-        group = json.loads(stix_group.serialize(), object_hook=_date_hook)
+        group = _stix_object_to_dict(stix_group)
 
         # Add group_id as key, because it's hard to get from STIX:
         group['group_id'] = get_attack_id(stix_group)
@@ -144,7 +129,7 @@ def _convert_stix_campaigns_to_dict(stix_attack_data):
     """
     attack_data = []
     for stix_campaign in stix_attack_data:
-        campaign = json.loads(stix_campaign.serialize(), object_hook=_date_hook)
+        campaign = _stix_object_to_dict(stix_campaign)
 
         # Add campaign_id as key, because it's hard to get from STIX:
         campaign['campaign_id'] = get_attack_id(stix_campaign)
@@ -154,44 +139,172 @@ def _convert_stix_campaigns_to_dict(stix_attack_data):
     return attack_data
 
 
-def load_attack_data(data_type):
+def _build_custom_attack_data(groups, campaigns, software, techniques, relationships):
+    """
+    Derive all custom ATT&CK data types (DATA_TYPE_CUSTOM_XX) from the STIX data. The 'uses' relationships are indexed
+    on their source_ref and the techniques and software on their id, so that every custom data type can be created
+    with a single pass over the groups, campaigns and software.
+    :param groups: all groups (DATA_TYPE_STIX_ALL_GROUPS)
+    :param campaigns: all campaigns (DATA_TYPE_STIX_ALL_CAMPAIGNS)
+    :param software: all software (DATA_TYPE_STIX_ALL_SOFTWARE)
+    :param techniques: all techniques (DATA_TYPE_STIX_ALL_TECH)
+    :param relationships: all relationships (DATA_TYPE_STIX_ALL_RELATIONSHIPS)
+    :return: dictionary with the DATA_TYPE_CUSTOM_XX constants as key and the data in the custom schema as value
+    """
+    # Index: source_ref -> [target_ref, ...] (only 'uses' relationships, in the original order)
+    uses_targets = {}
+    for r in relationships:
+        if r['relationship_type'] == 'uses':
+            uses_targets.setdefault(r['source_ref'], []).append(r['target_ref'])
+
+    # Index: id -> object. The first object with a particular id is used.
+    techniques_by_id = {}
+    for t in techniques:
+        techniques_by_id.setdefault(t['id'], t)
+    software_by_id = {}
+    for s in software:
+        software_by_id.setdefault(s['id'], s)
+
+    def _get_targets(source_obj):
+        """
+        Split the resolved 'uses' targets of a STIX object in techniques and software.
+        :param source_obj: group, campaign or software STIX object
+        :return: tuple with a list of techniques and a list of software
+        """
+        used_techniques = []
+        used_software = []
+        for target_ref in uses_targets.get(source_obj['id'], []):
+            if target_ref.startswith('attack-pattern--'):
+                if target_ref in techniques_by_id:
+                    used_techniques.append(techniques_by_id[target_ref])
+            elif target_ref.startswith('tool--') or target_ref.startswith('malware--'):
+                if target_ref in software_by_id:
+                    used_software.append(software_by_id[target_ref])
+        return used_techniques, used_software
+
+    tech_by_group = []
+    software_by_group = []
+    for g in groups:
+        used_techniques, used_software = _get_targets(g)
+        if not used_techniques and not used_software:
+            continue
+        group_id = get_attack_id(g)
+        aliases = g.get('aliases', None)
+        for t in used_techniques:
+            # much more information on the group can be added. Only the minimal required data is now added.
+            tech_by_group.append(
+                {
+                    'group_id': group_id,
+                    'name': g['name'],
+                    'aliases': aliases,
+                    'technique_id': get_attack_id(t),
+                    'x_mitre_platforms': t.get('x_mitre_platforms', None),
+                    'x_mitre_domains': g['x_mitre_domains'] if 'x_mitre_domains' in g.keys() else ['enterprise-attack'],
+                    'matrix': t['external_references'][0]['source_name']
+                })
+        for s in used_software:
+            software_by_group.append(
+                {
+                    'group_id': group_id,
+                    'name': g['name'],
+                    'aliases': aliases,
+                    'software_id': get_attack_id(s),
+                    'x_mitre_platforms': s.get('x_mitre_platforms', None),
+                    'x_mitre_domains': g['x_mitre_domains'],
+                    'matrix': s['external_references'][0]['source_name']
+                })
+
+    tech_in_campaign = []
+    software_in_campaign = []
+    for c in campaigns:
+        used_techniques, used_software = _get_targets(c)
+        if not used_techniques and not used_software:
+            continue
+        campaign_id = get_attack_id(c)
+        for t in used_techniques:
+            # more information on the campaign can be added. Only the minimal required data is added.
+            tech_in_campaign.append(
+                {
+                    'campaign_id': campaign_id,
+                    'name': c['name'],
+                    'technique_id': get_attack_id(t),
+                    'x_mitre_platforms': t.get('x_mitre_platforms', None),
+                    'x_mitre_domains': c['x_mitre_domains'] if 'x_mitre_domains' in c.keys() else ['enterprise-attack'],
+                    'matrix': t['external_references'][0]['source_name']
+                })
+        for s in used_software:
+            software_in_campaign.append(
+                {
+                    'campaign_id': campaign_id,
+                    'name': c['name'],
+                    'software_id': get_attack_id(s),
+                    'x_mitre_platforms': s.get('x_mitre_platforms', None),
+                    'x_mitre_domains': c['x_mitre_domains'],
+                    'matrix': s['external_references'][0]['source_name']
+                })
+
+    tech_by_software = []
+    for s in software:
+        used_techniques = _get_targets(s)[0]
+        if not used_techniques:
+            continue
+        software_id = get_attack_id(s)
+        for t in used_techniques:
+            # much more information on the software or technique can be added to the dict if necessary. Only the
+            # minimal required data is now added (i.e. resolving the technique ref to an actual ATT&CK ID)
+            tech_by_software.append({'software_id': software_id, 'technique_id': get_attack_id(t)})
+
+    return {DATA_TYPE_CUSTOM_TECH_BY_GROUP: tech_by_group,
+            DATA_TYPE_CUSTOM_TECH_IN_CAMPAIGN: tech_in_campaign,
+            DATA_TYPE_CUSTOM_TECH_BY_SOFTWARE: tech_by_software,
+            DATA_TYPE_CUSTOM_SOFTWARE_BY_GROUP: software_by_group,
+            DATA_TYPE_CUSTOM_SOFTWARE_IN_CAMPAIGN: software_in_campaign}
+
+
+def _get_attack_client():
+    """
+    Create the client to retrieve the ATT&CK data from the local STIX repository (local_stix_path option).
+    :return: attack_client object
+    """
+    from attack_taxii_client import attack_client
+
+    global _local_attack_client
+    # the local STIX repository is read only once per process
+    if _local_attack_client is not None and _local_attack_client[0] == local_stix_path:
+        return _local_attack_client[1]
+    if local_stix_path is not None and os.path.isdir(os.path.join(local_stix_path, 'enterprise-attack')) \
+            and os.path.isdir(os.path.join(local_stix_path, 'ics-attack')) \
+            and os.path.isdir(os.path.join(local_stix_path, 'mobile-attack')):
+        try:
+            _local_attack_client = (local_stix_path, attack_client(local_path=local_stix_path))
+            return _local_attack_client[1]
+        except Exception as ex:
+            print(f'[!] {ex}')
+            sys.exit(-1)
+    else:
+        print('[!] Not a valid local STIX path: ' + local_stix_path)
+        quit()
+
+
+def _print_taxii_connection_error(e):
     """
-    By default the ATT&CK data is loaded from the online TAXII server or from the local cache directory. The
-    local cache directory will be used if the file is not expired (data file on disk is older then EXPIRE_TIME
-    seconds). When the local_stix_path option is given, the ATT&CK data will be loaded from the given path of
-    a local STIX repository.
-    :param data_type: the desired data type, see DATATYPE_XX constants.
-    :return: MITRE ATT&CK data object (STIX or custom schema)
+    Print the error message for when the TAXII server cannot be reached.
+    :param e: the exception
+    :return:
     """
-    if local_stix_path is not None:
-        if local_stix_path is not None and os.path.isdir(os.path.join(local_stix_path, 'enterprise-attack')) \
-                and os.path.isdir(os.path.join(local_stix_path, 'ics-attack')) \
-                and os.path.isdir(os.path.join(local_stix_path, 'mobile-attack')):
-            try:
-                mitre = attack_client(local_path=local_stix_path)
-            except Exception as ex:
-                print(f'[!] {ex}')
-                sys.exit(-1)
-        else:
-            print('[!] Not a valid local STIX path: ' + local_stix_path)
-            quit()
+    if hasattr(e, 'request'):
+        print(f"[!] Cannot connect to MITRE's CTI TAXII server: {e.request.url} - {e}")
     else:
-        if os.path.exists("cache/" + data_type):
-            with open("cache/" + data_type, 'rb') as f:
-                cached = pickle.load(f)
-                write_time = cached[1]
-                if not (dt.now() - write_time).total_seconds() >= EXPIRE_TIME:
-                    # the first item in the list contains the ATT&CK data
-                    return cached[0]
-        try:
-            mitre = attack_client(verify=verify_tls)
-        except (exceptions.ConnectionError, datastore.DataSourceError) as e:
-            if hasattr(e, 'request'):
-                print(f"[!] Cannot connect to MITRE's CTI TAXII server: {e.request.url} - {e}")
-            else:
-                print(f"[!] Cannot connect to MITRE's CTI TAXII server - {e}")
-            quit()
+        print(f"[!] Cannot connect to MITRE's CTI TAXII server - {e}")
 
+
+def _get_attack_data_from_source(mitre, data_type):
+    """
+    Retrieve one of the STIX data types (DATA_TYPE_STIX_XX) from the ATT&CK source.
+    :param mitre: attack_client object
+    :param data_type: the desired data type, see DATATYPE_STIX_XX constants.
+    :return: MITRE ATT&CK data object
+    """
     attack_data = None
     if data_type == DATA_TYPE_STIX_ALL_RELATIONSHIPS:
         attack_data = mitre.get_relationships(None)
@@ -204,83 +317,6 @@ def load_attack_data(data_type):
     elif data_type == DATA_TYPE_STIX_ALL_TECH_MOBILE:
         stix_attack_data = mitre.get_mobile_techniques()
         attack_data = _convert_stix_techniques_to_dict(mitre, stix_attack_data)
-    elif data_type == DATA_TYPE_CUSTOM_TECH_BY_GROUP:
-        # First we need to know which technique references (STIX Object type 'attack-pattern') we have for all
-        # groups. This results in a dict: {group_id: Gxxxx, technique_ref/attack-pattern_ref: ...}
-        groups = load_attack_data(DATA_TYPE_STIX_ALL_GROUPS)
-        relationships = load_attack_data(DATA_TYPE_STIX_ALL_RELATIONSHIPS)
-        all_groups_relationships = []
-        for g in groups:
-            for r in relationships:
-                if g['id'] == r['source_ref'] and r['relationship_type'] == 'uses' and \
-                        r['target_ref'].startswith('attack-pattern--'):
-                    # much more information on the group can be added. Only the minimal required data is now added.
-                    all_groups_relationships.append(
-                        {
-                            'group_id': get_attack_id(g),
-                            'name': g['name'],
-                            'aliases': g.get('aliases', None),
-                            'technique_ref': r['target_ref'],
-                            'x_mitre_domains': g['x_mitre_domains'] if 'x_mitre_domains' in g.keys() else ['enterprise-attack']
-                        })
-
-        # Now we start resolving this part of the dict created above: 'technique_ref/attack-pattern_ref'.
-        # and we add some more data to the final result.
-        all_group_use = []
-        techniques = load_attack_data(DATA_TYPE_STIX_ALL_TECH)
-        for gr in all_groups_relationships:
-            for t in techniques:
-                if t['id'] == gr['technique_ref']:
-                    all_group_use.append(
-                        {
-                            'group_id': gr['group_id'],
-                            'name': gr['name'],
-                            'aliases': gr['aliases'],
-                            'technique_id': get_attack_id(t),
-                            'x_mitre_platforms': t.get('x_mitre_platforms', None),
-                            'x_mitre_domains': gr['x_mitre_domains'],
-                            'matrix': t['external_references'][0]['source_name']
-                        })
-
-        attack_data = all_group_use
-    elif data_type == DATA_TYPE_CUSTOM_TECH_IN_CAMPAIGN:
-        # First we need to know which technique references (STIX Object type 'attack-pattern') we have for all
-        # campaigns. This results in a dict: {campaign_id: Cxxxx, technique_ref/attack-pattern_ref: ...}
-        campaigns = load_attack_data(DATA_TYPE_STIX_ALL_CAMPAIGNS)
-        relationships = load_attack_data(DATA_TYPE_STIX_ALL_RELATIONSHIPS)
-        all_campaigns_relationships = []
-        for c in campaigns:
-            for r in relationships:
-                if c['id'] == r['source_ref'] and r['relationship_type'] == 'uses' and \
-                        r['target_ref'].startswith('attack-pattern--'):
-                    # more information on the campaign can be added. Only the minimal required data is added.
-                    all_campaigns_relationships.append(
-                        {
-                            'campaign_id': get_attack_id(c),
-                            'name': c['name'],
-                            'technique_ref': r['target_ref'],
-                            'x_mitre_domains': c['x_mitre_domains'] if 'x_mitre_domains' in c.keys() else ['enterprise-attack']
-                        })
-
-        # Now we start resolving this part of the dict created above: 'technique_ref/attack-pattern_ref'.
-        # and we add some more data to the final result.
-        all_campaigns_use = []
-        techniques = load_attack_data(DATA_TYPE_STIX_ALL_TECH)
-        for cr in all_campaigns_relationships:
-            for t in techniques:
-                if t['id'] == cr['technique_ref']:
-                    all_campaigns_use.append(
-                        {
-                            'campaign_id': cr['campaign_id'],
-                            'name': cr['name'],
-                            'technique_id': get_attack_id(t),
-                            'x_mitre_platforms': t.get('x_mitre_platforms', None),
-                            'x_mitre_domains': cr['x_mitre_domains'],
-                            'matrix': t['external_references'][0]['source_name']
-                        })
-
-        attack_data = all_campaigns_use
-
     elif data_type == DATA_TYPE_STIX_ALL_TECH:
         stix_attack_data = mitre.get_techniques()
         attack_data = _convert_stix_techniques_to_dict(mitre, stix_attack_data)
@@ -297,106 +333,6 @@ def load_attack_data(data_type):
 
     elif data_type == DATA_TYPE_STIX_ALL_SOFTWARE:
         attack_data = mitre.get_software()
-    elif data_type == DATA_TYPE_CUSTOM_TECH_BY_SOFTWARE:
-        # First we need to know which technique references (STIX Object type 'attack-pattern') we have for all software
-        # This results in a dict: {software_id: Sxxxx, technique_ref/attack-pattern_ref: ...}
-        software = load_attack_data(DATA_TYPE_STIX_ALL_SOFTWARE)
-        relationships = load_attack_data(DATA_TYPE_STIX_ALL_RELATIONSHIPS)
-        all_software_relationships = []
-        for s in software:
-            for r in relationships:
-                if s['id'] == r['source_ref'] and r['relationship_type'] == 'uses' and \
-                        r['target_ref'].startswith('attack-pattern--'):
-                    # much more information (e.g. description, aliases, platform) on the software can be added to the
-                    # dict if necessary. Only the minimal required data is now added.
-                    all_software_relationships.append({'software_id': get_attack_id(s), 'technique_ref': r['target_ref']})
-
-        # Now we start resolving this part of the dict created above: 'technique_ref/attack-pattern_ref'
-        techniques = load_attack_data(DATA_TYPE_STIX_ALL_TECH)
-        all_software_use = []
-        for sr in all_software_relationships:
-            for t in techniques:
-                if t['id'] == sr['technique_ref']:
-                    # much more information on the technique can be added to the dict. Only the minimal required data
-                    # is now added (i.e. resolving the technique ref to an actual ATT&CK ID)
-                    all_software_use.append({'software_id': sr['software_id'], 'technique_id': get_attack_id(t)})
-
-        attack_data = all_software_use
-
-    elif data_type == DATA_TYPE_CUSTOM_SOFTWARE_BY_GROUP:
-        # First we need to know which software references (STIX Object type 'malware' or 'tool') we have for all
-        # groups. This results in a dict: {group_id: Gxxxx, software_ref/malware-tool_ref: ...}
-        groups = load_attack_data(DATA_TYPE_STIX_ALL_GROUPS)
-        relationships = load_attack_data(DATA_TYPE_STIX_ALL_RELATIONSHIPS)
-        all_groups_relationships = []
-        for g in groups:
-            for r in relationships:
-                if g['id'] == r['source_ref'] and r['relationship_type'] == 'uses' and \
-                        (r['target_ref'].startswith('tool--') or r['target_ref'].startswith('malware--')):
-                    # much more information on the group can be added. Only the minimal required data is now added.
-                    all_groups_relationships.append(
-                        {
-                            'group_id': get_attack_id(g),
-                            'name': g['name'],
-                            'aliases': g.get('aliases', None),
-                            'software_ref': r['target_ref'],
-                            'x_mitre_domains': g['x_mitre_domains']
-                        })
-
-        # Now we start resolving this part of the dict created above: 'software_ref/malware-tool_ref'.
-        # and we add some more data to the final result.
-        all_group_use = []
-        software = load_attack_data(DATA_TYPE_STIX_ALL_SOFTWARE)
-        for gr in all_groups_relationships:
-            for s in software:
-                if s['id'] == gr['software_ref']:
-                    all_group_use.append(
-                        {
-                            'group_id': gr['group_id'],
-                            'name': gr['name'],
-                            'aliases': gr['aliases'],
-                            'software_id': get_attack_id(s),
-                            'x_mitre_platforms': s.get('x_mitre_platforms', None),
-                            'x_mitre_domains': gr['x_mitre_domains'],
-                            'matrix': s['external_references'][0]['source_name']
-                        })
-        attack_data = all_group_use
-
-    elif data_type == DATA_TYPE_CUSTOM_SOFTWARE_IN_CAMPAIGN:
-        # First we need to know which software references (STIX Object type 'malware' or 'tool') we have for all
-        # campaigns. This results in a dict: {campaign_id: Cxxxx, software_ref/malware-tool_ref: ...}
-        campaigns = load_attack_data(DATA_TYPE_STIX_ALL_CAMPAIGNS)
-        relationships = load_attack_data(DATA_TYPE_STIX_ALL_RELATIONSHIPS)
-        all_campaigns_relationships = []
-        for campaign in campaigns:
-            for r in relationships:
-                if campaign['id'] == r['source_ref'] and r['relationship_type'] == 'uses' and \
-                        (r['target_ref'].startswith('tool--') or r['target_ref'].startswith('malware--')):
-                    all_campaigns_relationships.append(
-                        {
-                            'campaign_id': get_attack_id(campaign),
-                            'name': campaign['name'],
-                            'software_ref': r['target_ref'],
-                            'x_mitre_domains': campaign['x_mitre_domains']
-                        })
-
-        # Now we start resolving this part of the dict created above: 'software_ref/malware-tool_ref'.
-        # and we add some more data to the final result.
-        all_campaign_use = []
-        software = load_attack_data(DATA_TYPE_STIX_ALL_SOFTWARE)
-        for campaign in all_campaigns_relationships:
-            for s in software:
-                if s['id'] == campaign['software_ref']:
-                    all_campaign_use.append(
-                        {
-                            'campaign_id': campaign['campaign_id'],
-                            'name': campaign['name'],
-                            'software_id': get_attack_id(s),
-                            'x_mitre_platforms': s.get('x_mitre_platforms', None),
-                            'x_mitre_domains': campaign['x_mitre_domains'],
-                            'matrix': s['external_references'][0]['source_name']
-                        })
-        attack_data = all_campaign_use
 
     elif data_type == DATA_TYPE_STIX_ALL_ENTERPRISE_MITIGATIONS:
         attack_data = mitre.get_enterprise_mitigations()
@@ -410,23 +346,137 @@ def load_attack_data(data_type):
         attack_data = mitre.get_ics_mitigations()
         attack_data = mitre.remove_revoked_deprecated(attack_data)
 
-    # Only use cache when using online TAXII server:
-    if local_stix_path is None:
-        _save_attack_data(attack_data, "cache/" + data_type)
+    return attack_data
 
+
+def _create_attack_snapshot(mitre):
+    """
+    Retrieve all STIX data types and derive all custom data types from them, so that all data within the snapshot
+    originates from the same ATT&CK release.
+    :param mitre: attack_client object
+    :return: dictionary with the DATA_TYPE_XX constants as key and the ATT&CK data as value
+    """
+    attack_data = {}
+    for data_type in DATA_TYPES_STIX:
+        attack_data[data_type] = _get_attack_data_from_source(mitre, data_type)
+
+    attack_data.update(_build_custom_attack_data(attack_data[DATA_TYPE_STIX_ALL_GROUPS],
+                                                 attack_data[DATA_TYPE_STIX_ALL_CAMPAIGNS],
+                                                 attack_data[DATA_TYPE_STIX_ALL_SOFTWARE],
+                                                 attack_data[DATA_TYPE_STIX_ALL_TECH],
+                                                 attack_data[DATA_TYPE_STIX_ALL_RELATIONSHIPS]))
     return attack_data
 
 
-def init_yaml():
+def load_attack_data(data_type):
+    """
+    Load the ATT&CK data for the given data type. Within one process the data for a particular data type is only
+    loaded once. Therefore, the returned data should not be modified.
+    :param data_type: the desired data type, see DATATYPE_XX constants.
+    :return: MITRE ATT&CK data object (STIX or custom schema)
+    """
+    if data_type not in _attack_data_cache:
+        _attack_data_cache[data_type] = _load_attack_data(data_type)
+    return _attack_data_cache[data_type]
+
+
+def set_attack_data(attack_data):
+    """
+    Set ATT&CK data that has already been loaded (e.g. in the parent of a worker process), so that it is not loaded
+    again by load_attack_data.
+    :param attack_data: dictionary with the data type as key and the MITRE ATT&CK data object as value
+    :return:
+    """
+    _attack_data_cache.update(attack_data)
+
+
+def _load_attack_data(data_type):
+    """
+    By default the ATT&CK data is loaded from the online TAXII server or from the local ATT&CK snapshot in the cache
+    directory. The snapshot will be used if it is not expired (created more than EXPIRE_TIME seconds ago). Otherwise,
+    a new snapshot with all data types is created. For this, only the objects added to the TAXII collections since
+    the previous snapshot are downloaded (all objects when there is no previous snapshot). When the local_stix_path option is given,
+    the ATT&CK data will be loaded from the given path of a local STIX repository.
+    :param data_type: the desired data type, see DATATYPE_XX constants.
+    :return: MITRE ATT&CK data object (STIX or custom schema)
+    """
+    if local_stix_path is None:
+        attack_data = load_snapshot_table(ATTACK_SNAPSHOT_FILE, data_type, EXPIRE_TIME, VERSION)
+        if attack_data is not None:
+            return attack_data
+
+        # The TAXII and STIX libraries are only needed when the snapshot has to be (re)created
+        from requests import exceptions
+        from stix2 import datastore
+        from taxii2client.exceptions import TAXIIServiceException
+        from attack_taxii_client import attack_client, refresh_collections
+
+        # The previously downloaded TAXII collections are used for an incremental refresh, also when the snapshot
+        # is expired:
+        collections = load_snapshot_table(ATTACK_SNAPSHOT_FILE, DATA_TYPE_TAXII_COLLECTIONS, None, VERSION)
+        try:
+            collections = refresh_collections(collections, verify_tls)
+            mitre = attack_client(collection_objects=collections['objects'])
+            snapshot = _create_attack_snapshot(mitre)
+            attack_version = mitre.get_attack_version()
+        except (exceptions.RequestException, datastore.DataSourceError, TAXIIServiceException) as e:
+            _print_taxii_connection_error(e)
+            quit()
+        for snapshot_data_type, attack_data in snapshot.items():
+            _attack_data_cache.setdefault(snapshot_data_type, attack_data)
+
+        snapshot[DATA_TYPE_TAXII_COLLECTIONS] = collections
+        write_snapshot(ATTACK_SNAPSHOT_FILE, snapshot, attack_version, VERSION)
+        return snapshot[data_type]
+
+    if data_type in DATA_TYPES_CUSTOM:
+        custom_attack_data = _build_custom_attack_data(load_attack_data(DATA_TYPE_STIX_ALL_GROUPS),
+                                                       load_attack_data(DATA_TYPE_STIX_ALL_CAMPAIGNS),
+                                                       load_attack_data(DATA_TYPE_STIX_ALL_SOFTWARE),
+                                                       load_attack_data(DATA_TYPE_STIX_ALL_TECH),
+                                                       load_attack_data(DATA_TYPE_STIX_ALL_RELATIONSHIPS))
+        for custom_data_type, attack_data in custom_attack_data.items():
+            _attack_data_cache.setdefault(custom_data_type, attack_data)
+        return custom_attack_data[data_type]
+
+    return _get_attack_data_from_source(_get_attack_client(), data_type)
+
+
+def init_yaml(read_only=False):
     """
     Initialize ruamel.yaml with the correct settings
+    :param read_only: when True, a (C-accelerated when available) safe loader is returned. Use this for YAML files that
+    are only read and never written back, as it does not preserve comments and formatting.
     :return: a ruamel.yaml object
     """
+    from ruamel.yaml import YAML
+    if read_only:
+        return YAML(typ='safe', pure=False)
+
     _yaml = YAML()
     _yaml.Representer.ignore_aliases = lambda *args: True  # disable anchors/aliases
     return _yaml
 
 
+def load_yaml_file(filename):
+    """
+    Load a YAML file that is only read and not written back to disk. Every file is parsed only once per process: the
+    parsed document is cached on its absolute path, modification time and size. So a changed file is parsed again.
+    :param filename: path to the YAML file
+    :return: a copy of the parsed YAML document, which can be modified by the caller
+    """
+    path = os.path.abspath(filename)
+    stat = os.stat(path)
+    cached = _yaml_document_cache.get(path)
+    if cached is None or cached[0] != stat.st_mtime_ns or cached[1] != stat.st_size:
+        with open(path, 'r') as yaml_file:
+            yaml_content = init_yaml(read_only=True).load(yaml_file)
+        cached = (stat.st_mtime_ns, stat.st_size, yaml_content)
+        _yaml_document_cache[path] = cached
+
+    return deepcopy(cached[2])
+
+
 def get_attack_id(stix_obj):
     """
     Get the Technique, Group or Software ID from the STIX object
@@ -452,6 +502,60 @@ def get_tactics(technique):
     return tactics
 
 
+def get_technique_index(techniques):
+    """
+    Get the index on a list with techniques. For the ATT&CK techniques loaded with load_attack_data, the index is
+    created once per data type and kept in memory for the duration of the process, just like the ATT&CK data itself.
+    For any other list (e.g. a filtered list) the index is created on every call.
+    :param techniques: list with all techniques
+    :return: dictionary with the keys: 'by_id' (technique_id -> technique), 'sub_techniques' (technique_id ->
+    list with sub-technique IDs), 'tactics' (technique_id -> list with ATT&CK tactics) and 'by_tactic' (tactic ->
+    list with techniques)
+    """
+    data_type = next((k for k, v in _attack_data_cache.items() if v is techniques), None)
+    # the ATT&CK data is stored together with the index, as the data for a data type can be set again
+    cached = _technique_indexes.get(data_type)
+    if cached is not None and cached[0] is techniques:
+        return cached[1]
+
+    by_id = {}
+    sub_techniques = {}
+    tactics = {}
+    by_tactic = {}
+    for tech in techniques:
+        technique_id = get_attack_id(tech)
+        if technique_id in by_id:
+            continue
+        by_id[technique_id] = tech
+
+        if technique_id is not None and len(technique_id) == 9:
+            sub_techniques.setdefault(technique_id[:5], []).append(technique_id)
+
+        tactics[technique_id] = [k['phase_name'] for k in tech.get('kill_chain_phases', [])
+                                 if k['kill_chain_name'] == 'mitre-attack']
+        for tactic in tactics[technique_id]:
+            by_tactic.setdefault(tactic, []).append(tech)
+
+    index = {'by_id': by_id, 'sub_techniques': sub_techniques, 'tactics': tactics, 'by_tactic': by_tactic}
+    if data_type is not None:
+        _technique_indexes[data_type] = (techniques, index)
+    return index
+
+
+def get_layer_tactics(techniques, technique_id, layer_settings):
+    """
+    Get the ATT&CK tactics of a technique for which the technique is added to a layer.
+    :param techniques: list with all techniques
+    :param technique_id: technique_id to get the tactics for
+    :param layer_settings: settings for the Navigator layer
+    :return: list with tactics, or a list with None when the tactic is not included in the layer
+    """
+    if 'includeTactic' in layer_settings.keys() and layer_settings['includeTactic'] == 'True':
+        return list(get_technique_index(techniques)['tactics'].get(technique_id, []))
+    else:
+        return [None]
+
+
 def get_technique(techniques, technique_id):
     """
     Generic function to lookup a specific technique_id in a list of dictionaries with techniques.
@@ -459,10 +563,7 @@ def get_technique(techniques, technique_id):
     :param technique_id: technique_id to look for
     :return: the technique you're searching for. None if not found.
     """
-    for tech in techniques:
-        if technique_id == get_attack_id(tech):
-            return tech
-    return None
+    return get_technique_index(techniques)['by_id'].get(technique_id, None)
 
 
 def ask_yes_no(question):
@@ -643,7 +744,7 @@ def get_applicable_data_sources_platform(platforms, domain):
     """
     applicable_data_sources = set()
 
-    data_sources = DATA_SOURCES_ENTERPRISE if domain == 'enterprise-attack' else DATA_SOURCES_ICS if domain == 'ics-attack' else DATA_SOURCES_MOBILE
+    data_sources = get_data_sources_platforms(domain)
     for p in platforms:
         applicable_data_sources.update(data_sources[p])
 
@@ -659,7 +760,7 @@ def get_applicable_dettect_data_sources_platform(platforms, domain):
     """
     applicable_dettect_data_sources = set()
 
-    dettect_data_sources = DETTECT_DATA_SOURCES_PLATFORMS_ENTERPRISE if domain == 'enterprise-attack' else DETTECT_DATA_SOURCES_PLATFORMS_ICS if domain == 'ics-attack' else DETTECT_DATA_SOURCES_PLATFORMS_MOBILE
+    dettect_data_sources = get_dettect_data_sources_platforms(domain)
     for p in platforms:
         applicable_dettect_data_sources.update(dettect_data_sources[p])
 
@@ -686,7 +787,7 @@ def get_applicable_dettect_data_sources_technique(technique_dettect_data_sources
     """
     Get the applicable DeTT&CT data sources for the provided technique's DeTT&CT data sources.
     :param technique_data_sources: the ATT&CK technique's DeTT&CT data sources
-    :param platform_applicable_data_sources: a list of applicable DeTT&CT data sources based on 'DETTECT_DATA_SOURCES_PLATFORMS'
+    :param platform_applicable_data_sources: a list of applicable DeTT&CT data sources based on 'get_dettect_data_sources_platforms()'
     :return: a list of applicable data sources
     """
     applicable_dettect_data_sources = set()
@@ -726,9 +827,7 @@ def load_data_sources(file, filter_empty_scores=True):
         yaml_content = file
     else:
         # file is a file location on disk
-        _yaml = init_yaml()
-        with open(file, 'r') as yaml_file:
-            yaml_content = _yaml.load(yaml_file)
+        yaml_content = load_yaml_file(file)
 
     # we have todo this in two phases to bring the 'systems' kv-pair applicable_to values in sync with the data sources details object's applicable_to values
     # phase 1:
@@ -795,9 +894,7 @@ def load_techniques(file):
         yaml_content = file
     else:
         # file is a file location on disk
-        _yaml = init_yaml()
-        with open(file, 'r') as yaml_file:
-            yaml_content = _yaml.load(yaml_file)
+        yaml_content = load_yaml_file(file)
 
     yaml_content = _traverse_modify_date(yaml_content)
 
@@ -912,6 +1009,8 @@ def _traverse_modify_date(obj):
     :param obj: dictionary
     :return: function call
     """
+    from ruamel.yaml.timestamp import TimeStamp as ruamelTimeStamp
+
     def _transformer(value):
         if type(value) == dt:
             value = value.date()
@@ -934,32 +1033,30 @@ def _check_file_type(filename, file_type=None):
         print('[!] File: \'' + filename + '\' does not exist')
         return None
 
-    _yaml = init_yaml()
-    with open(filename, 'r') as yaml_file:
-        try:
-            yaml_content = _yaml.load(yaml_file)
-        except Exception as e:
-            print('[!] File: \'' + filename + '\' is not a valid YAML file.')
-            print('  ' + str(e))  # print more detailed error information to help the user in fixing the error.
-            return None
+    try:
+        yaml_content = load_yaml_file(filename)
+    except Exception as e:
+        print('[!] File: \'' + filename + '\' is not a valid YAML file.')
+        print('  ' + str(e))  # print more detailed error information to help the user in fixing the error.
+        return None
 
-        # This check is performed because a text file will also be considered to be valid YAML. But, we are using
-        # key-value pairs within the YAML files.
-        if not hasattr(yaml_content, 'keys'):
-            print('[!] File: \'' + filename + '\' is not a valid YAML file.')
-            return None
+    # This check is performed because a text file will also be considered to be valid YAML. But, we are using
+    # key-value pairs within the YAML files.
+    if not hasattr(yaml_content, 'keys'):
+        print('[!] File: \'' + filename + '\' is not a valid YAML file.')
+        return None
 
-        if 'file_type' not in yaml_content.keys():
-            print('[!] File: \'' + filename + '\' does not contain a file_type key.')
+    if 'file_type' not in yaml_content.keys():
+        print('[!] File: \'' + filename + '\' does not contain a file_type key.')
+        return None
+    elif file_type:
+        if file_type != yaml_content['file_type']:
+            print('[!] File: \'' + filename + '\' is not a file type of: \'' + file_type + '\'')
             return None
-        elif file_type:
-            if file_type != yaml_content['file_type']:
-                print('[!] File: \'' + filename + '\' is not a file type of: \'' + file_type + '\'')
-                return None
-            else:
-                return yaml_content
         else:
             return yaml_content
+    else:
+        return yaml_content
 
 
 def _check_for_old_data_sources(filename):
@@ -968,9 +1065,7 @@ def _check_for_old_data_sources(filename):
     :param filename: path to data source YAML file
     :return: True if no ATT&CK v8 data sources are found, else False is returned
     """
-    _yaml = init_yaml()
-    with open(filename, 'r') as yaml_file:
-        yaml_content = _yaml.load(yaml_file)
+    yaml_content = load_yaml_file(filename)
 
     data_sources = set([ds['data_source_name'] for ds in yaml_content['data_sources']])
 
@@ -1064,9 +1159,7 @@ def check_platform(arg_platforms, filename=None, domain=None):
     :return: true if the platform(s) are valid, otherwise false
     """
     if filename:
-        _yaml = init_yaml()
-        with open(filename, 'r') as yaml_file:
-            yaml_content = _yaml.load(yaml_file)
+        yaml_content = load_yaml_file(filename)
 
         domain = 'enterprise-attack' if 'domain' not in yaml_content.keys() else yaml_content['domain'].lower()
     elif domain and not domain.endswith('-attack'):
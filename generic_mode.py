@@ -10,8 +10,8 @@ def _get_platforms_for_data_source(data_source, domain):
     :param domain: the specified domain (enterprise, ics or mobile)
     :return: list of ATT&CK platforms
     """
-    attack_data_sources = DATA_SOURCES_ENTERPRISE if domain == 'enterprise' else DATA_SOURCES_ICS if domain == 'ics' else DATA_SOURCES_MOBILE
-    dettect_data_sources = DETTECT_DATA_SOURCES_PLATFORMS_ENTERPRISE if domain == 'enterprise' else DETTECT_DATA_SOURCES_PLATFORMS_ICS if domain == 'ics' else DETTECT_DATA_SOURCES_PLATFORMS_MOBILE
+    attack_data_sources = get_data_sources_platforms(domain + '-attack')
+    dettect_data_sources = get_dettect_data_sources_platforms(domain + '-attack')
 
     platforms = []
     for platform, data_sources in attack_data_sources.items():
@@ -1,28 +1,313 @@
 import simplejson
-from eql_yaml import techniques_search
+from eql_yaml import techniques_search, groups_search
 from generic import *
 from navigator_layer import *
 from file_output import *
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
 from copy import deepcopy
+from bisect import bisect_left
+from difflib import get_close_matches
+from io import StringIO
+from itertools import chain, product
+import numpy as np
 
 CG_GROUPS = {}
 
 
-def _is_in_group(json_groups, argument_groups):
+# The name/alias/ID indexes of the ATT&CK groups, campaigns and software per ATT&CK snapshot
+_name_indexes = {}
+
+# The actor (group or campaign) x technique incidence matrices per ATT&CK snapshot
+_incidence_matrices = {}
+
+# ATT&CK data shared with the worker processes of generate_group_heat_maps_batch
+_batch_context = {}
+
+# The ATT&CK data types used for generating group heat maps
+_BATCH_ATTACK_DATA_TYPES = [DATA_TYPE_STIX_ALL_GROUPS, DATA_TYPE_STIX_ALL_CAMPAIGNS, DATA_TYPE_STIX_ALL_SOFTWARE,
+                            DATA_TYPE_CUSTOM_TECH_BY_GROUP, DATA_TYPE_CUSTOM_TECH_IN_CAMPAIGN,
+                            DATA_TYPE_CUSTOM_SOFTWARE_BY_GROUP, DATA_TYPE_CUSTOM_SOFTWARE_IN_CAMPAIGN,
+                            DATA_TYPE_CUSTOM_TECH_BY_SOFTWARE, DATA_TYPE_STIX_ALL_TECH_ENTERPRISE,
+                            DATA_TYPE_STIX_ALL_TECH_ICS, DATA_TYPE_STIX_ALL_TECH_MOBILE]
+
+# The key within the STIX objects with the aliases, per data type
+_ALIAS_KEYS = {DATA_TYPE_STIX_ALL_GROUPS: 'aliases', DATA_TYPE_STIX_ALL_CAMPAIGNS: 'aliases',
+               DATA_TYPE_STIX_ALL_SOFTWARE: 'x_mitre_aliases'}
+
+
+def _normalize_name(name):
+    """
+    Normalize a name, alias or ID of a group, campaign or software for the lookup in the name index.
+    :param name: name, alias or ID
+    :return: the name in lower case and with single spaces
+    """
+    return ' '.join(str(name).split()).lower()
+
+
+def _build_name_index(attack_data, alias_key):
+    """
+    Build the index of the ATT&CK objects on their normalized ID, name and aliases.
+    :param attack_data: ATT&CK groups, campaigns or software
+    :param alias_key: the key with the aliases of the ATT&CK objects
+    :return: dictionary with the index (normalized name -> set of ATT&CK IDs), the sorted normalized names for the
+    prefix lookup and the original names
+    """
+    index = {}
+    names = {}
+    for obj in attack_data:
+        attack_id = get_attack_id(obj)
+        if not attack_id:
+            continue
+        for name in [attack_id, obj['name']] + list(obj.get(alias_key, None) or []):
+            normalized_name = _normalize_name(name)
+            index.setdefault(normalized_name, set()).add(attack_id)
+            names.setdefault(normalized_name, name)
+
+    return {'index': index, 'sorted_names': sorted(index), 'names': names}
+
+
+def _get_name_index(data_type, name_index=None):
+    """
+    Get the name index of the ATT&CK groups, campaigns or software. The index is built once per ATT&CK snapshot.
+    :param data_type: DATA_TYPE_STIX_ALL_GROUPS, DATA_TYPE_STIX_ALL_CAMPAIGNS or DATA_TYPE_STIX_ALL_SOFTWARE
+    :param name_index: an already built name index for the ATT&CK snapshot in use (optional), which is then cached
+    :return: the name index, see _build_name_index
+    """
+    # the ATT&CK data is loaded once per process, so its object identifies the ATT&CK snapshot in use. It is kept in
+    # the cache, so that its id cannot be reused.
+    attack_data = load_attack_data(data_type)
+    key = (data_type, id(attack_data))
+    if name_index is not None:
+        _name_indexes[key] = (attack_data, name_index)
+    elif key not in _name_indexes:
+        _name_indexes[key] = (attack_data, _build_name_index(attack_data, _ALIAS_KEYS[data_type]))
+    return _name_indexes[key][1]
+
+
+def lookup_attack_ids(data_type, names):
+    """
+    Resolve names, aliases and/or IDs of groups, campaigns or software (case insensitive) to their ATT&CK IDs.
+    :param data_type: DATA_TYPE_STIX_ALL_GROUPS, DATA_TYPE_STIX_ALL_CAMPAIGNS or DATA_TYPE_STIX_ALL_SOFTWARE
+    :param names: list of names, aliases and/or IDs
+    :return: set with the ATT&CK IDs
+    """
+    index = _get_name_index(data_type)['index']
+    attack_ids = set()
+    for name in names:
+        attack_ids.update(index.get(_normalize_name(name), ()))
+    return attack_ids
+
+
+def lookup_attack_ids_by_prefix(data_type, prefix):
+    """
+    Get the ATT&CK IDs of the groups, campaigns or software which have a name, alias or ID that starts with the prefix
+    (case insensitive).
+    :param data_type: DATA_TYPE_STIX_ALL_GROUPS, DATA_TYPE_STIX_ALL_CAMPAIGNS or DATA_TYPE_STIX_ALL_SOFTWARE
+    :param prefix: the prefix
+    :return: dictionary with the matching names as key and a set with their ATT&CK IDs as value
+    """
+    name_index = _get_name_index(data_type)
+    prefix = _normalize_name(prefix)
+    sorted_names = name_index['sorted_names']
+
+    matches = {}
+    for i in range(bisect_left(sorted_names, prefix), len(sorted_names)):
+        if not sorted_names[i].startswith(prefix):
+            break
+        matches[name_index['names'][sorted_names[i]]] = name_index['index'][sorted_names[i]]
+    return matches
+
+
+def get_similar_attack_names(data_type, name, max_count=3):
+    """
+    Get the names, aliases or IDs of groups, campaigns or software that are similar to the provided name: the names
+    starting with it and otherwise the closest (fuzzy) matches.
+    :param data_type: DATA_TYPE_STIX_ALL_GROUPS, DATA_TYPE_STIX_ALL_CAMPAIGNS or DATA_TYPE_STIX_ALL_SOFTWARE
+    :param name: the name which could not be resolved
+    :param max_count: the maximum number of names to return
+    :return: list with the similar names
+    """
+    similar_names = sorted(lookup_attack_ids_by_prefix(data_type, name))[:max_count]
+    if not similar_names:
+        name_index = _get_name_index(data_type)
+        similar_names = [name_index['names'][n] for n in
+                         get_close_matches(_normalize_name(name), name_index['sorted_names'], n=max_count)]
+    return similar_names
+
+
+def _print_unknown_name(data_type, name, object_name):
+    """
+    Print that a group, campaign or software is unknown within ATT&CK, together with the similar names.
+    :param data_type: DATA_TYPE_STIX_ALL_GROUPS, DATA_TYPE_STIX_ALL_CAMPAIGNS or DATA_TYPE_STIX_ALL_SOFTWARE
+    :param name: the name which could not be resolved
+    :param object_name: the name of the object type used in the message (e.g. 'group')
+    :return:
+    """
+    similar_names = get_similar_attack_names(data_type, name)
+    if similar_names:
+        print('[!] Unknown ATT&CK ' + object_name + ': ' + name + ' (did you mean: ' + ', '.join(similar_names) + '?)')
+    else:
+        print('[!] Unknown ATT&CK ' + object_name + ': ' + name)
+
+
+def _build_incidence_matrix(entries):
+    """
+    Build a sparse actor (group or campaign) x technique incidence matrix. The matrix is stored in coordinate format,
+    with per entry a mask of the platforms and domains for which it applies.
+    :param entries: iterable with tuples of: actor ID, actor name, list of technique IDs, platforms and domains
+    :return: dictionary with the actors, actor names, techniques, the row and column per entry, and the platform and
+    domain masks (entries x platforms/domains)
+    """
+    actor_index = {}
+    actor_names = []
+    technique_index = {}
+    platform_index = {}
+    domain_index = {}
+    rows = []
+    cols = []
+    # the (entry, platform) and (entry, domain) pairs which are set in the masks
+    platform_pairs = []
+    domain_pairs = []
+
+    for actor_id, actor_name, technique_ids, platforms, domains in entries:
+        row = actor_index.setdefault(actor_id, len(actor_index))
+        if row == len(actor_names):
+            actor_names.append(actor_name)
+        platforms = [platform_index.setdefault(p, len(platform_index)) for p in platforms]
+        domains = [domain_index.setdefault(d, len(domain_index)) for d in domains]
+
+        for tech_id in technique_ids:
+            entry = len(rows)
+            rows.append(row)
+            cols.append(technique_index.setdefault(tech_id, len(technique_index)))
+            platform_pairs.extend((entry, p) for p in platforms)
+            domain_pairs.extend((entry, d) for d in domains)
+
+    platform_mask = np.zeros((len(rows), len(platform_index)), dtype=bool)
+    platform_mask[tuple(np.array(platform_pairs, dtype=np.int64).reshape(-1, 2).T)] = True
+    domain_mask = np.zeros((len(rows), len(domain_index)), dtype=bool)
+    domain_mask[tuple(np.array(domain_pairs, dtype=np.int64).reshape(-1, 2).T)] = True
+
+    return {'actors': np.array(list(actor_index), dtype=object), 'actor_names': actor_names, 'actor_index': actor_index,
+            'techniques': np.array(list(technique_index), dtype=object), 'rows': np.array(rows, dtype=np.int64),
+            'cols': np.array(cols, dtype=np.int64), 'platform_index': platform_index, 'platforms': platform_mask,
+            'domain_index': domain_index, 'domains': domain_mask}
+
+
+def _get_incidence_matrix(matrix_type, matrix=None):
     """
-    Check if the two dicts (json_groups and argument_groups) have any groups in common based on their names/aliases.
-    :param json_groups: group aliases from ATT&CK
-    :param argument_groups: group names provided via the command line by the user
-    :return: true or false
+    Get the incidence matrix of the techniques used by the ATT&CK groups or campaigns, or of the techniques supported
+    by the software they use. The matrix is built once per ATT&CK snapshot.
+    :param matrix_type: 'group', 'campaign', 'group_software' or 'campaign_software'
+    :param matrix: an already built incidence matrix for the ATT&CK snapshot in use (optional), which is then cached
+    :return: the incidence matrix, see _build_incidence_matrix
     """
-    if json_groups:
-        json_groups = list(map(lambda x: x.lower(), json_groups))
+    id_key = 'group_id' if matrix_type in ['group', 'group_software'] else 'campaign_id'
+    if matrix_type in ['group', 'campaign']:
+        attack_data = (load_attack_data(DATA_TYPE_CUSTOM_TECH_BY_GROUP if matrix_type == 'group' else DATA_TYPE_CUSTOM_TECH_IN_CAMPAIGN),)
+    else:
+        attack_data = (load_attack_data(DATA_TYPE_CUSTOM_SOFTWARE_BY_GROUP if matrix_type == 'group_software' else DATA_TYPE_CUSTOM_SOFTWARE_IN_CAMPAIGN),
+                       load_attack_data(DATA_TYPE_CUSTOM_TECH_BY_SOFTWARE))
+
+    # the ATT&CK data is loaded once per process, so its objects identify the ATT&CK snapshot in use. They are kept in
+    # the cache, so that their ids cannot be reused.
+    key = (matrix_type,) + tuple(id(data) for data in attack_data)
+    if matrix is not None:
+        _incidence_matrices[key] = (attack_data, matrix)
+    elif key not in _incidence_matrices:
+        if matrix_type in ['group', 'campaign']:
+            # we just set the platform to an random legit value, because for pre-attack 'platform' is not used
+            entries = ((t[id_key], t['name'], [t['technique_id']], t['x_mitre_platforms'] or ['Windows'], t['x_mitre_domains'])
+                       for t in attack_data[0])
+        else:
+            # { software_id: [technique, ...] }
+            software_dict = {}
+            for tech in attack_data[1]:
+                software_dict.setdefault(tech['software_id'], []).append(tech['technique_id'])
+            # there is software that do not have a platform, these are never selected
+            entries = ((s[id_key], s['name'], software_dict.get(s['software_id'], []), s['x_mitre_platforms'] or [],
+                        s['x_mitre_domains']) for s in attack_data[0])
+        _incidence_matrices[key] = (attack_data, _build_incidence_matrix(entries))
+
+    return _incidence_matrices[key][1]
 
-        for group in argument_groups:
-            if group in json_groups:
-                return True
 
-    return False
+def _select_from_incidence_matrix(matrix, actor_ids, platform, domain):
+    """
+    Get the techniques of the actors (groups or campaigns) from an incidence matrix, by masking the matrix entries on
+    the actors, platform and domain.
+    :param matrix: the incidence matrix, see _build_incidence_matrix
+    :param actor_ids: set with the ATT&CK IDs of the actors or None for all actors
+    :param platform: one or multiple values from PLATFORMS constant
+    :param domain: the specified domain
+    :return: dictionary with the actors in the order of their first entry (i.e. relationship):
+    { actor_id: {group_name: NAME, techniques: set{id, ...}, weight: {id: 1, ...} } }
+    """
+    if domain in matrix['domain_index']:
+        mask = matrix['domains'][:, matrix['domain_index'][domain]].copy()
+    else:
+        mask = np.zeros(len(matrix['rows']), dtype=bool)
+    platform_cols = [matrix['platform_index'][p] for p in set(platform) if p in matrix['platform_index']]
+    mask &= matrix['platforms'][:, platform_cols].any(axis=1)
+    if actor_ids is not None:
+        actor_mask = np.zeros(len(matrix['actors']), dtype=bool)
+        actor_mask[[matrix['actor_index'][a] for a in actor_ids if a in matrix['actor_index']]] = True
+        mask &= actor_mask[matrix['rows']]
+
+    rows = matrix['rows'][mask]
+    cols = matrix['cols'][mask]
+    actor_rows, first_entries, counts = np.unique(rows, return_index=True, return_counts=True)
+    # the entries sorted on actor, with the (exclusive) end of the entries per actor
+    techniques_sorted = matrix['techniques'][cols[np.argsort(rows, kind='stable')]].tolist()
+    ends = np.cumsum(counts).tolist()
+
+    groups_dict = {}
+    for i in np.argsort(first_entries).tolist():
+        row = actor_rows[i]
+        techniques = set(techniques_sorted[ends[i - 1] if i > 0 else 0:ends[i]])
+        groups_dict[matrix['actors'][row]] = {'group_name': matrix['actor_names'][row], 'techniques': techniques,
+                                              'weight': dict.fromkeys(techniques, 1)}
+    return groups_dict
+
+
+def _get_groups_per_technique(groups, with_weight):
+    """
+    Get the groups and the sum of the weights per technique of a groups dict. This is vectorized over the (group,
+    technique) entries of the dict.
+    :param groups: a dict with data on groups/campaigns
+    :param with_weight: sum the weights of the techniques (the groups dict has a 'weight' per group)
+    :return: list with per technique, in the order of their first occurrence, a tuple with the technique ID, the set
+    of groups and the sum of the weights (None when with_weight is False)
+    """
+    technique_sets = [v['techniques'] for v in groups.values()]
+    technique_per_entry = list(chain.from_iterable(technique_sets))
+    if not technique_per_entry:
+        return []
+
+    # number the techniques in the order of their first occurrence, and the entries with those numbers
+    technique_ids = list(dict.fromkeys(technique_per_entry))
+    technique_index = dict(zip(technique_ids, range(len(technique_ids))))
+    technique_per_entry = np.fromiter(map(technique_index.__getitem__, technique_per_entry), dtype=np.int64,
+                                      count=len(technique_per_entry))
+    group_per_entry = np.repeat(np.array(list(groups), dtype=object), [len(t) for t in technique_sets])
+
+    # the entries sorted on technique, with the (exclusive) end of the entries per technique
+    groups_sorted = group_per_entry[np.argsort(technique_per_entry, kind='stable')].tolist()
+    ends = np.cumsum(np.bincount(technique_per_entry, minlength=len(technique_ids))).tolist()
+
+    weights = [None] * len(technique_ids)
+    if with_weight:
+        weight_per_entry = np.array(list(chain.from_iterable(map(v['weight'].__getitem__, v['techniques'])
+                                                             for v in groups.values())))
+        if weight_per_entry.dtype.kind != 'i':
+            weight_per_entry = weight_per_entry.astype(object)
+        weights = np.zeros(len(technique_ids), dtype=weight_per_entry.dtype)
+        np.add.at(weights, technique_per_entry, weight_per_entry)
+        weights = weights.tolist()
+
+    return [(technique_ids[i], set(groups_sorted[ends[i - 1] if i > 0 else 0:ends[i]]), weights[i])
+            for i in range(len(technique_ids))]
 
 
 def _are_groups_found(groups_found, argument_groups):
@@ -32,24 +317,17 @@ def _are_groups_found(groups_found, argument_groups):
     :param argument_groups: groups provided via the command line by the user
     :return: returns boolean that indicates if all of the groups are found
     """
-    group_attack_data = load_attack_data(DATA_TYPE_STIX_ALL_GROUPS)
     group_found = True
 
     for group_arg in argument_groups:
         if group_arg == 'all':  # this one will be ignored as it does not make any sense for this function
             return True
 
-        group_id = None
-        for group in group_attack_data:  # is the group provided via the command line known in ATT&CK?
-            group_aliases_lower = []
-            if 'aliases' in group:
-                group_aliases_lower = list(map(lambda x: x.lower(), group['aliases']))
-            if group_arg in group_aliases_lower or group_arg == get_attack_id(group).lower() or group_arg == group['name'].lower():
-                group_id = get_attack_id(group)
-        if not group_id:  # the group that has been provided through the command line cannot be found in ATT&CK
-            print('[!] Unknown ATT&CK group: ' + group_arg)
+        group_ids = lookup_attack_ids(DATA_TYPE_STIX_ALL_GROUPS, [group_arg])
+        if not group_ids:  # the group that has been provided through the command line cannot be found in ATT&CK
+            _print_unknown_name(DATA_TYPE_STIX_ALL_GROUPS, group_arg, 'group')
             group_found = False
-        elif group_id not in groups_found:  # group not present in filtered (platform) data set
+        elif not group_ids.intersection(groups_found):  # group not present in filtered (platform) data set
             print('[!] Group not part of the data set: ' + group_arg)
             group_found = False
 
@@ -63,21 +341,17 @@ def _are_campaigns_found(campaigns_found, argument_campaigns):
     :param argument_campaigns: campaigns provided via the command line by the user
     :return: returns boolean that indicates if all of the groups are found
     """
-    campaign_attack_data = load_attack_data(DATA_TYPE_STIX_ALL_CAMPAIGNS)
     campaign_found = True
 
     for campaign_arg in argument_campaigns:
         if campaign_arg == 'all':  # this one will be ignored as it does not make any sense for this function
             return True
 
-        campaign_id = None
-        for campaign in campaign_attack_data:  # is the campaign provided via the command line known in ATT&CK?
-            if campaign_arg == get_attack_id(campaign).lower() or campaign_arg == campaign['name'].lower():
-                campaign_id = get_attack_id(campaign)
-        if not campaign_id:  # the campaign that has been provided through the command line cannot be found in ATT&CK
-            print('[!] Unknown ATT&CK campaign: ' + campaign_arg)
+        campaign_ids = lookup_attack_ids(DATA_TYPE_STIX_ALL_CAMPAIGNS, [campaign_arg])
+        if not campaign_ids:  # the campaign that has been provided through the command line cannot be found in ATT&CK
+            _print_unknown_name(DATA_TYPE_STIX_ALL_CAMPAIGNS, campaign_arg, 'campaign')
             campaign_found = False
-        elif campaign_id not in campaigns_found:  # group not present in filtered (platform) data set
+        elif not campaign_ids.intersection(campaigns_found):  # group not present in filtered (platform) data set
             print('[!] Campaign not part of the data set: ' + campaign_arg)
             campaign_found = False
 
@@ -97,22 +371,20 @@ def _get_software_techniques(groups, campaigns, platform, domain):
     # { group_id: {group_name: NAME, techniques: set{id, ...} } }
     groups_dict = {}
 
-    tech_by_software = load_attack_data(DATA_TYPE_CUSTOM_TECH_BY_SOFTWARE)
-
-    # { software_id: [technique, ...] }
-    software_dict = {}
-    for tech in tech_by_software:
-        if tech['software_id'] not in software_dict:
-            # noinspection PySetFunctionToLiteral
-            software_dict[tech['software_id']] = set([tech['technique_id']])
-        else:
-            software_dict[tech['software_id']].add(tech['technique_id'])
-
     # groups is a YAML file
     if os.path.isfile(str(groups)):
-        _yaml = init_yaml()
-        with open(groups, 'r') as yaml_file:
-            config = _yaml.load(yaml_file)
+        config = load_yaml_file(groups)
+
+        tech_by_software = load_attack_data(DATA_TYPE_CUSTOM_TECH_BY_SOFTWARE)
+
+        # { software_id: [technique, ...] }
+        software_dict = {}
+        for tech in tech_by_software:
+            if tech['software_id'] not in software_dict:
+                # noinspection PySetFunctionToLiteral
+                software_dict[tech['software_id']] = set([tech['technique_id']])
+            else:
+                software_dict[tech['software_id']].add(tech['technique_id'])
 
         for group in config['groups']:
             if group['enabled']:
@@ -129,44 +401,23 @@ def _get_software_techniques(groups, campaigns, platform, domain):
 
                 if 'software_id' in group and group['software_id']:
                     for soft_id in group['software_id']:
-                        try:
-                            groups_dict[group_id]['techniques'].update(software_dict[soft_id])
-                        except KeyError:
-                            print('[!] Unknown ATT&CK software ID: ' + soft_id)
+                        software_ids = lookup_attack_ids(DATA_TYPE_STIX_ALL_SOFTWARE, [soft_id])
+                        if not software_ids:
+                            _print_unknown_name(DATA_TYPE_STIX_ALL_SOFTWARE, str(soft_id), 'software ID')
+                        for software_id in software_ids:
+                            groups_dict[group_id]['techniques'].update(software_dict.get(software_id, ()))
 
     # groups are provided as arguments via the command line
     else:
+        # the software matches the ATT&CK Matrix and platform, and the group/campaign is one we are interested in
         if groups is not None:
-            software_by_group = load_attack_data(DATA_TYPE_CUSTOM_SOFTWARE_BY_GROUP)
-            for s in software_by_group:
-                # software matches the ATT&CK Matrix and platform
-                # and the group is a group we are interested in
-                if s['x_mitre_platforms']:  # there is software that do not have a platform, skip those
-                    if domain in s['x_mitre_domains'] and len(set(s['x_mitre_platforms']).intersection(set(platform))) > 0 and \
-                            (groups[0] == 'all' or s['group_id'].lower() in groups or _is_in_group(s['aliases'], groups) or s['name'].lower() in groups):
-                        if s['group_id'] not in groups_dict:
-                            groups_dict[s['group_id']] = {'group_name': s['name']}
-                            groups_dict[s['group_id']]['techniques'] = set()
-                            groups_dict[s['group_id']]['weight'] = dict()
-                        groups_dict[s['group_id']]['techniques'].update(software_dict[s['software_id']])
-                        for t in groups_dict[s['group_id']]['techniques']:
-                            groups_dict[s['group_id']]['weight'][t] = 1
+            group_ids = lookup_attack_ids(DATA_TYPE_STIX_ALL_GROUPS, groups) if groups[0] != 'all' else None
+            groups_dict.update(_select_from_incidence_matrix(_get_incidence_matrix('group_software'), group_ids, platform, domain))
 
         if campaigns is not None:
-            software_in_campaign = load_attack_data(DATA_TYPE_CUSTOM_SOFTWARE_IN_CAMPAIGN)
-            for s in software_in_campaign:
-                # software matches the ATT&CK Matrix and platform
-                # and the campaign is a campaign we are interested in
-                if s['x_mitre_platforms']:  # there is software that do not have a platform, skip those
-                    if domain in s['x_mitre_domains'] and len(set(s['x_mitre_platforms']).intersection(set(platform))) > 0 and \
-                            (campaigns[0] == 'all' or s['campaign_id'].lower() in campaigns or s['name'].lower() in campaigns):
-                        if s['campaign_id'] not in groups_dict:
-                            groups_dict[s['campaign_id']] = {'group_name': s['name']}
-                            groups_dict[s['campaign_id']]['techniques'] = set()
-                            groups_dict[s['campaign_id']]['weight'] = dict()
-                        groups_dict[s['campaign_id']]['techniques'].update(software_dict[s['software_id']])
-                        for t in groups_dict[s['campaign_id']]['techniques']:
-                            groups_dict[s['campaign_id']]['weight'][t] = 1
+            campaign_ids = lookup_attack_ids(DATA_TYPE_STIX_ALL_CAMPAIGNS, campaigns) if campaigns[0] != 'all' else None
+            groups_dict.update(_select_from_incidence_matrix(_get_incidence_matrix('campaign_software'), campaign_ids,
+                                                             platform, domain))
 
     return groups_dict
 
@@ -220,9 +471,7 @@ def _get_group_techniques(groups, platform, file_type, domain):
 
     # groups is a YAML file
     if file_type == FILE_TYPE_GROUP_ADMINISTRATION:
-        _yaml = init_yaml()
-        with open(groups, 'r') as yaml_file:
-            config = _yaml.load(yaml_file)
+        config = load_yaml_file(groups)
 
         domain_in_file = 'enterprise-attack' if 'domain' not in config.keys() else config['domain']
         if domain_in_file != domain:
@@ -248,25 +497,10 @@ def _get_group_techniques(groups, platform, file_type, domain):
                 groups_dict[group_id]['software'] = group.get('software_id', None)
     else:
         # groups are provided as arguments via the command line
-        all_groups_tech = load_attack_data(DATA_TYPE_CUSTOM_TECH_BY_GROUP)
-
-        for gr in all_groups_tech:
-            platforms = gr['x_mitre_platforms']
-            if not platforms:
-                # we just set this to an random legit value, because for pre-attack 'platform' is not used
-                platforms = ['Windows']
-
-            # group matches the: matrix/stage, platform and the group(s) we are interested in
-            if domain in gr['x_mitre_domains'] and len(set(platforms).intersection(set(platform))) > 0 and \
-                    (groups[0] == 'all' or gr['group_id'].lower() in groups or _is_in_group(gr['aliases'], groups) or gr['name'].lower() in groups):
-                if gr['group_id'] not in groups_dict:
-                    groups_found.add(gr['group_id'])
-                    groups_dict[gr['group_id']] = {'group_name': gr['name']}
-                    groups_dict[gr['group_id']]['techniques'] = set()
-                    groups_dict[gr['group_id']]['weight'] = dict()
-
-                groups_dict[gr['group_id']]['techniques'].add(gr['technique_id'])
-                groups_dict[gr['group_id']]['weight'][gr['technique_id']] = 1
+        group_ids = lookup_attack_ids(DATA_TYPE_STIX_ALL_GROUPS, groups) if groups[0] != 'all' else None
+        # group matches the: matrix/stage, platform and the group(s) we are interested in
+        groups_dict = _select_from_incidence_matrix(_get_incidence_matrix('group'), group_ids, platform, domain)
+        groups_found = set(groups_dict)
 
         # do not call '_are_groups_found' when groups is a YAML file
         # (this could contain groups that do not exists within ATT&CK)
@@ -289,35 +523,59 @@ def _get_campaign_techniques(campaigns, platform, domain):
     if campaigns is None:
         return {}
 
+    campaign_ids = lookup_attack_ids(DATA_TYPE_STIX_ALL_CAMPAIGNS, campaigns) if campaigns[0] != 'all' else None
+    # campaign matches the: matrix/stage, platform and the campaign(s) we are interested in
     # { group_id: {group_name: NAME, techniques: set{id, ...} } }
-    groups_dict = {}
-    campaigns_found = set()
+    groups_dict = _select_from_incidence_matrix(_get_incidence_matrix('campaign'), campaign_ids, platform, domain)
+    campaigns_found = set(groups_dict)
 
-    all_campaigns = load_attack_data(DATA_TYPE_CUSTOM_TECH_IN_CAMPAIGN)
+    found = _are_campaigns_found(campaigns_found, campaigns)
+    if not found:
+        return -1
 
-    for c in all_campaigns:
-        platforms = c['x_mitre_platforms']
-        if not platforms:
-            # we just set this to an random legit value, because for pre-attack 'platform' is not used
-            platforms = ['Windows']
+    return groups_dict
 
-        # campaign matches the: matrix/stage, platform and the campaign(s) we are interested in
-        if domain in c['x_mitre_domains'] and len(set(platforms).intersection(set(platform))) > 0 and \
-                (campaigns[0] == 'all' or c['campaign_id'].lower() in campaigns or c['name'].lower() in campaigns):
-            if c['campaign_id'] not in groups_dict:
-                campaigns_found.add(c['campaign_id'])
-                groups_dict[c['campaign_id']] = {'group_name': c['name']}
-                groups_dict[c['campaign_id']]['techniques'] = set()
-                groups_dict[c['campaign_id']]['weight'] = dict()
 
-            groups_dict[c['campaign_id']]['techniques'].add(c['technique_id'])
-            groups_dict[c['campaign_id']]['weight'][c['technique_id']] = 1
+def _search_group_techniques(groups_dict, groups, file_type, campaigns, domain, query):
+    """
+    Only keep the techniques of the groups/campaigns which match the provided EQL query
+    :param groups_dict: dictionary with the groups/campaigns and their techniques
+    :param groups: group ID, group name/alias or a YAML file with group(s) data
+    :param file_type: the file type of the YAML file as present in the key 'file_type'
+    :param campaigns: campaign ID or campaign name
+    :param domain: the specified domain
+    :param query: EQL query on the group events
+    :return: the filtered groups dictionary or -1 when the search was not successful
+    """
+    filenames = []
+    if file_type == FILE_TYPE_GROUP_ADMINISTRATION:
+        filenames.append(groups)
+    # the ATT&CK groups and campaigns, which includes the ATT&CK campaigns combined with a group administration file
+    if not filenames or campaigns:
+        filenames.append(None)
 
-    found = _are_campaigns_found(campaigns_found, campaigns)
-    if not found:
+    query_results = groups_search(filenames, query, domain)
+    if query_results is None:
         return -1
 
-    return groups_dict
+    matches = set()
+    for event in query_results:
+        if 'group_id' in event:
+            group_id = event['group_id']
+        elif 'campaign_id' in event:
+            group_id = event['campaign_id']
+        else:  # the event of a group within the group administration file
+            group_id = _generate_group_id(event['group_name'], event.get('campaign', ''))
+        matches.add((group_id, event['technique_id']))
+
+    groups_dict_filtered = {}
+    for group_id, values in groups_dict.items():
+        techniques = set(t for t in values['techniques'] if (group_id, t) in matches)
+        if techniques:
+            groups_dict_filtered[group_id] = dict(values, techniques=techniques)
+            groups_dict_filtered[group_id]['weight'] = dict((t, w) for t, w in values['weight'].items() if t in techniques)
+
+    return groups_dict_filtered
 
 
 def _get_detection_techniques(filename):
@@ -381,21 +639,14 @@ def _get_technique_count(groups, groups_overlay, groups_software, overlay_type,
     :return: dictionary, max_count
     """
     # { technique_id: {count: ..., groups: set{} }
+    # the count is the sum of the weights of the technique over all groups (a row-sum of the incidence matrix)
     techniques_dict = {}
 
-    for group, v in groups.items():
-        for tech in v['techniques']:
-            if tech not in techniques_dict:
-                techniques_dict[tech] = dict()
-                techniques_dict[tech]['groups'] = set()
-                techniques_dict[tech]['count'] = v['weight'][tech]
-
-            # We only want to increase the score when comparing groups/campaigns and not for visibility or detection.
-            # This allows to have proper sorting of the heat map, which in turn improves the ability to visually
-            # compare this heat map with the detection/visibility ATT&CK Navigator layers.
-            else:
-                techniques_dict[tech]['count'] += v['weight'][tech]
-            techniques_dict[tech]['groups'].add(group)
+    # We only want to increase the score when comparing groups/campaigns and not for visibility or detection.
+    # This allows to have proper sorting of the heat map, which in turn improves the ability to visually
+    # compare this heat map with the detection/visibility ATT&CK Navigator layers.
+    for tech, tech_groups, count in _get_groups_per_technique(groups, with_weight=True):
+        techniques_dict[tech] = {'groups': tech_groups, 'count': count}
 
     max_count = max(techniques_dict.values(), key=lambda k: k['count'])['count']
 
@@ -437,16 +688,15 @@ def _get_technique_count(groups, groups_overlay, groups_software, overlay_type,
 
             techniques_dict[tech]['groups'].add(group)
 
-    for group, v in groups_software.items():
-        for tech in v['techniques']:
-            if tech not in techniques_dict:
-                techniques_dict[tech] = dict()
-                techniques_dict[tech]['count'] = 0
-                # we will not adjust the scoring for groups_software. We will just set the the score to 0.
-                # This will later be used for the colouring of the heat map.
-            if 'groups' not in techniques_dict[tech]:
-                techniques_dict[tech]['groups'] = set()
-            techniques_dict[tech]['groups'].add(group)
+    for tech, tech_groups, _ in _get_groups_per_technique(groups_software, with_weight=False):
+        if tech not in techniques_dict:
+            techniques_dict[tech] = dict()
+            techniques_dict[tech]['count'] = 0
+            # we will not adjust the scoring for groups_software. We will just set the the score to 0.
+            # This will later be used for the colouring of the heat map.
+        if 'groups' not in techniques_dict[tech]:
+            techniques_dict[tech]['groups'] = set()
+        techniques_dict[tech]['groups'].update(tech_groups)
 
     return techniques_dict, max_count
 
@@ -477,14 +727,7 @@ def _get_technique_layer(techniques_count, groups, overlay, groups_software, ove
     # { technique_id: {count: ..., groups: set{} }
     # add the technique count/scoring
     for tech, v in techniques_count.items():
-        technique = get_technique(techniques, tech)
-        tactics = []
-        if 'includeTactic' in layer_settings.keys() and layer_settings['includeTactic'] == 'True':
-            for kill_chain_phase in technique['kill_chain_phases']:
-                if kill_chain_phase['kill_chain_name'] == 'mitre-attack':
-                    tactics.append(kill_chain_phase['phase_name'])
-        else:
-            tactics.append(None)
+        tactics = get_layer_tactics(techniques, tech, layer_settings)
         
         t = dict()
         t['techniqueID'] = tech
@@ -605,7 +848,7 @@ def _get_group_list(groups, file_type):
 
 def generate_group_heat_map(groups, campaigns, overlay, overlay_type, platform, overlay_software, include_software,
                             search_visibility, search_detection, health_is_called, output_filename, output_overwrite,
-                            layer_name, domain, layer_settings, include_all_score_objs, count_detections):
+                            layer_name, domain, layer_settings, include_all_score_objs, count_detections, search_groups=None):
     """
     Calls all functions that are necessary for the generation of the heat map and write a json layer to disk.
     :param groups: threat actor groups
@@ -626,7 +869,8 @@ def generate_group_heat_map(groups, campaigns, overlay, overlay_type, platform,
     :param layer_settings: settings for the Navigator layer
     :param include_all_score_objs: include all score objects within the score_logbook for the EQL query
     :param count_detections: option for the Navigator layer output: count detections instead of listing detections
-    :return: returns None when something went wrong
+    :param search_groups: groups/campaigns EQL search query
+    :return: the filename of the written layer file, or None when something went wrong
     """
     original_groups_argument = groups
     overlay_dict = {}
@@ -661,9 +905,7 @@ def generate_group_heat_map(groups, campaigns, overlay, overlay_type, platform,
     # set the correct value for platform
     platform_yaml = None
     if groups_file_type == FILE_TYPE_GROUP_ADMINISTRATION:
-        _yaml = init_yaml()
-        with open(groups, 'r') as yaml_file:
-            group_file = _yaml.load(yaml_file)
+        group_file = load_yaml_file(groups)
 
         domain_in_file = 'enterprise-attack' if 'domain' not in group_file.keys() else group_file['domain']
         domain_in_argument = 'enterprise-attack' if domain == 'enterprise' else 'ics-attack' if domain == 'ics' else 'mobile-attack' if domain == 'mobile' else None
@@ -750,6 +992,12 @@ def generate_group_heat_map(groups, campaigns, overlay, overlay_type, platform,
         # Treat campaigns like groups, merge groups_dict with campaigns_dict:
         groups_dict.update(campaigns_dict)
 
+    # filter out group/campaign techniques using EQL
+    if search_groups:
+        groups_dict = _search_group_techniques(groups_dict, groups, groups_file_type, campaigns, domain, search_groups)
+        if groups_dict == -1:
+            return None  # something went wrong in executing the search or 0 results where returned
+
     if len(groups_dict) == 0:
         print('[!] Empty layer.')  # the provided groups dit not result in any techniques
         return None
@@ -763,9 +1011,13 @@ def generate_group_heat_map(groups, campaigns, overlay, overlay_type, platform,
             groups_software_dict = _get_software_techniques(None, overlay, platform, domain)
     elif overlay_software:
         groups_software_dict = _get_software_techniques(groups, campaigns, platform, domain)
+        if search_groups:
+            groups_software_dict = dict((k, v) for k, v in groups_software_dict.items() if k in groups_dict)
 
     if include_software:
         include_software_dict = _get_software_techniques(groups, campaigns, platform, domain)
+        if search_groups:
+            include_software_dict = dict((k, v) for k, v in include_software_dict.items() if k in groups_dict)
         merge_group_dict(groups_dict, include_software_dict)
 
     technique_count, max_count = _get_technique_count(groups_dict, overlay_dict, groups_software_dict, overlay_type, all_techniques)
@@ -801,6 +1053,231 @@ def generate_group_heat_map(groups, campaigns, overlay, overlay_type, platform,
             filename += '-overlay_' + '_'.join(overlay_list)
 
         filename = create_output_filename('attack', filename)
-        write_file(filename, output_overwrite, json_string)
+        return write_file(filename, output_overwrite, json_string)
+    else:
+        return write_file(output_filename, output_overwrite, json_string)
+
+
+def _get_batch_layer(manifest_layer, defaults, layer_settings):
+    """
+    Merge a layer from the batch manifest with the defaults, and check its key-value pairs.
+    :param manifest_layer: the layer as present in the manifest
+    :param defaults: the defaults within the manifest
+    :param layer_settings: settings for the Navigator layer which apply to every layer in the manifest
+    :return: the layer as a dictionary, or None when the layer is invalid
+    """
+    if not isinstance(manifest_layer, dict) or not set(manifest_layer).issubset(BATCH_LAYER_DEFAULT):
+        print('[!] A layer in the batch manifest file can only contain the key-value pairs: ' + ', '.join(BATCH_LAYER_DEFAULT))
+        return None
+
+    layer = deepcopy(BATCH_LAYER_DEFAULT)
+    layer.update(defaults)
+    layer.update(manifest_layer)
+
+    layer['layer_settings'] = dict(layer_settings)
+    for settings in [defaults.get('layer_settings'), manifest_layer.get('layer_settings')]:
+        if settings is None:
+            continue
+        if not isinstance(settings, dict) or not set(settings).issubset(LAYER_SETTINGS):
+            print('[!] The layer settings in the batch manifest file can only contain the settings: ' + ', '.join(LAYER_SETTINGS))
+            return None
+        layer['layer_settings'].update((k, str(v)) for k, v in settings.items())
+
+    for key in BATCH_LAYER_EXPAND + ['expand']:
+        if isinstance(layer[key], str):
+            layer[key] = [layer[key]]
+        elif layer[key] is not None and (not isinstance(layer[key], list) or not all(isinstance(v, str) for v in layer[key])):
+            print('[!] The key-value pair \'' + key + '\' in the batch manifest file should be a string or a list of strings')
+            return None
+
+    if not set(layer['expand']).issubset(BATCH_LAYER_EXPAND) or not all(layer[k] for k in layer['expand']):
+        print('[!] The key-value pair \'expand\' in the batch manifest file can only contain the key-value pairs with a value '
+              'out of: ' + ', '.join(BATCH_LAYER_EXPAND))
+        return None
+    if layer['overlay_type'] not in [OVERLAY_TYPE_GROUP, OVERLAY_TYPE_CAMPAIGN, OVERLAY_TYPE_VISIBILITY, OVERLAY_TYPE_DETECTION]:
+        print('[!] Invalid overlay type in the batch manifest file: ' + str(layer['overlay_type']))
+        return None
+    if layer['domain'] not in [None, 'enterprise', 'ics', 'mobile']:
+        print('[!] Invalid domain in the batch manifest file: ' + str(layer['domain']))
+        return None
+    if layer['software'] and layer['include_software']:
+        print('[!] The key-value pairs \'software\' and \'include_software\' in the batch manifest file cannot be used together')
+        return None
+
+    return layer
+
+
+def load_batch_manifest(filename, layer_settings):
+    """
+    Load the manifest for the batch generation of group heat maps. Key-value pairs missing in a layer get their value
+    from the 'defaults' within the manifest, and otherwise from BATCH_LAYER_DEFAULT. A layer is expanded into one layer
+    per combination of the values of the key-value pairs listed in its 'expand'.
+    :param filename: file location of the batch manifest YAML file
+    :param layer_settings: settings for the Navigator layer which apply to every layer in the manifest
+    :return: dictionary with the output directory and the list of layers, or None when the manifest is invalid
+    """
+    if not os.path.exists(filename):
+        print('[!] The batch manifest file does not exist: ' + filename)
+        return None
+
+    try:
+        yaml_content = load_yaml_file(filename) or {}
+    except Exception as e:
+        print('[!] Error while loading the batch manifest file: ' + str(e))
+        return None
+
+    if not isinstance(yaml_content, dict) or not set(yaml_content).issubset(['output_directory', 'defaults', 'layers']) or \
+            not isinstance(yaml_content.get('layers'), list) or len(yaml_content['layers']) == 0:
+        print('[!] The batch manifest file should contain a list of \'layers\', and can contain the key-value pairs: '
+              'output_directory, defaults')
+        return None
+
+    defaults = yaml_content.get('defaults') or {}
+    if not isinstance(defaults, dict) or not set(defaults).issubset(BATCH_LAYER_DEFAULT):
+        print('[!] The defaults in the batch manifest file can only contain the key-value pairs: ' + ', '.join(BATCH_LAYER_DEFAULT))
+        return None
+
+    layers = []
+    for manifest_layer in yaml_content['layers']:
+        layer = _get_batch_layer(manifest_layer, defaults, layer_settings)
+        if layer is None:
+            return None
+
+        expand = layer.pop('expand')
+        for values in product(*[layer[k] for k in expand]):
+            layers.append(dict(layer, **dict((k, [v]) for k, v in zip(expand, values))))
+
+    return {'output_directory': yaml_content.get('output_directory'), 'layers': layers}
+
+
+def _get_batch_layer_filename(layer):
+    """
+    Make the default output filename for a layer of the batch manifest. Contrary to a single heat map, the platforms
+    are part of the filename, so that layers which only differ in platform get a recognizable name.
+    :param layer: the layer, see load_batch_manifest
+    :return: the filename
+    """
+    def _names(values):
+        return [os.path.splitext(os.path.basename(v))[0] if os.path.isfile(v) else v for v in values]
+
+    names = _names(layer['groups'] or []) + (layer['campaigns'] or [])
+    filename = '_'.join(names) if names else 'all_groups_all_campaigns'
+    if layer['platform']:
+        filename += '-' + '_'.join(layer['platform'])
+    if layer['overlay']:
+        filename += '-overlay_' + '_'.join(_names(layer['overlay']))
+    return create_output_filename('attack', filename)
+
+
+def _set_batch_output_filenames(layers, output_directory, output_overwrite):
+    """
+    Set the output filename of every layer in the batch. The filenames are unique within the batch and, when not in
+    overwrite mode, do not exist yet. Because they are set upfront, the layers can be written in parallel.
+    :param layers: the layers, see load_batch_manifest
+    :param output_directory: the directory for the layers without a directory in their filename, or None
+    :param output_overwrite: boolean flag indicating whether we're in overwrite mode
+    :return:
+    """
+    filenames = set()
+    for layer in layers:
+        filename = layer['output_filename'] or _get_batch_layer_filename(layer)
+        if output_directory and os.sep not in filename:
+            filename = os.path.join(output_directory, filename)
+        filename = use_existing_filename(get_output_filepath(filename), 'json')
+
+        suffix = 1
+        unique_filename = filename
+        while unique_filename in filenames or (not output_overwrite and os.path.exists(unique_filename)):
+            unique_filename = '%s_%s.json' % (filename[:-len('.json')], suffix)
+            suffix += 1
+        filenames.add(unique_filename)
+        layer['output_filename'] = unique_filename
+
+
+def _init_batch_context(attack_data, name_indexes, incidence_matrices, health_is_called):
+    """
+    Set the ATT&CK data, and the name indexes and incidence matrices built from it, for the batch generation of group
+    heat maps. Used as initializer of the worker processes, so that these are only loaded and built once.
+    :param attack_data: dictionary with the data type as key and the ATT&CK data as value
+    :param name_indexes: dictionary with the data type as key and the name index as value, see _get_name_index
+    :param incidence_matrices: dictionary with the matrix type as key and the incidence matrix as value, see
+    _get_incidence_matrix
+    :param health_is_called: boolean that specifies if detailed errors in the file will be printed
+    :return:
+    """
+    set_attack_data(attack_data)
+    for data_type, name_index in name_indexes.items():
+        _get_name_index(data_type, name_index)
+    for matrix_type, matrix in incidence_matrices.items():
+        _get_incidence_matrix(matrix_type, matrix)
+    _batch_context['health_is_called'] = health_is_called
+
+
+def _generate_batch_heat_map(layer):
+    """
+    Generate the heat map for one layer of the batch manifest.
+    :param layer: the layer, see load_batch_manifest
+    :return: tuple with the index entry for this layer and the output that was printed while generating it
+    """
+    entry = dict(layer, file=None)
+    output = StringIO()
+    try:
+        with redirect_stdout(output):
+            entry['file'] = generate_group_heat_map(layer['groups'], layer['campaigns'], layer['overlay'], layer['overlay_type'],
+                                                    layer['platform'], layer['software'], layer['include_software'],
+                                                    layer['search_visibility'], layer['search_detection'],
+                                                    _batch_context['health_is_called'], layer['output_filename'], True,
+                                                    layer['layer_name'], layer['domain'], layer['layer_settings'],
+                                                    layer['all_scores'], layer['count_detections'], layer['search'])
+        entry['status'] = 'written' if entry['file'] else 'failed'
+    except Exception as e:
+        entry['status'] = 'error'
+        output.write('[!] Error while generating the heat map: ' + str(e) + '\n')
+
+    return entry, output.getvalue()
+
+
+def generate_group_heat_maps_batch(filename, layer_settings, output_filename, output_overwrite, health_is_called):
+    """
+    Generate a group heat map for every layer in the batch manifest, and write an index of the layer files to a JSON
+    file. The ATT&CK data is loaded, and the name indexes and incidence matrices are built, once and shared with the
+    worker processes which generate the layers in parallel.
+    :param filename: file location of the batch manifest YAML file
+    :param layer_settings: settings for the Navigator layer which apply to every layer in the manifest
+    :param output_filename: the output filename for the index defined by the user
+    :param output_overwrite: boolean flag indicating whether we're in overwrite mode
+    :param health_is_called: boolean that specifies if detailed errors in the file will be printed
+    :return: the index as a dictionary, or None when the manifest is invalid
+    """
+    manifest = load_batch_manifest(filename, layer_settings)
+    if not manifest:
+        return None
+
+    layers = manifest['layers']
+    if manifest['output_directory'] and not os.path.exists(manifest['output_directory']):
+        os.makedirs(manifest['output_directory'])
+    _set_batch_output_filenames(layers, manifest['output_directory'], output_overwrite)
+
+    if len(layers) == 1:
+        _batch_context['health_is_called'] = health_is_called
+        results = [_generate_batch_heat_map(layers[0])]
     else:
-        write_file(output_filename, output_overwrite, json_string)
+        attack_data = dict((data_type, load_attack_data(data_type)) for data_type in _BATCH_ATTACK_DATA_TYPES)
+        name_indexes = dict((data_type, _get_name_index(data_type)) for data_type in _ALIAS_KEYS)
+        incidence_matrices = dict((matrix_type, _get_incidence_matrix(matrix_type))
+                                  for matrix_type in ['group', 'campaign', 'group_software', 'campaign_software'])
+        with ProcessPoolExecutor(max_workers=min(len(layers), os.cpu_count() or 1), initializer=_init_batch_context,
+                                 initargs=(attack_data, name_indexes, incidence_matrices, health_is_called)) as executor:
+            results = list(executor.map(_generate_batch_heat_map, layers))
+
+    index = {'manifest': filename, 'layers': []}
+    for entry, layer_output in results:
+        print('Layer: ' + entry['output_filename'])
+        print(layer_output)
+        index['layers'].append(entry)
+
+    if not output_filename:
+        output_filename = create_output_filename('group_batch_index', os.path.splitext(os.path.basename(filename))[0])
+    write_file(output_filename, output_overwrite, simplejson.dumps(index, indent=2))
+
+    return index
@@ -1,3 +1,4 @@
+import hashlib
 import os
 import pickle
 from difflib import SequenceMatcher
@@ -10,15 +11,16 @@ def _print_error_msg(msg, print_error):
     return True
 
 
-def _update_health_state(current, update):
-    if current or update:
-        return True
-    else:
-        return update
-
-
 def _get_cache_file(prefix, filename):
-    return 'cache/' + prefix + os.path.splitext(os.path.basename(filename))[0]
+    """
+    Get the location of a cache file for the provided YAML file. The name contains a hash of the full path of the YAML
+    file, so YAML files with the same name in different directories do not share their cache files.
+    :param prefix: prefix of the cache file name
+    :param filename: YAML file location
+    :return: cache file location
+    """
+    path_hash = hashlib.sha1(os.path.abspath(filename).encode('utf-8')).hexdigest()[:16]
+    return 'cache/' + prefix + os.path.splitext(os.path.basename(filename))[0] + '_' + path_hash
 
 
 def _is_file_modified(filename):
@@ -87,42 +89,112 @@ def _update_health_state_cache(filename, has_error):
                 _update(has_error)
 
 
-def _check_for_similar_values(values, values_key_name, health_is_called=False):
+def _get_similar_values(values):
+    """
+    Get the values within the provided list 'values' that are a very close match to another value.
+    :param values: the list of values to check for close matches
+    :return: set with the similar values
+    """
+    similar = set()
+    matcher = SequenceMatcher(None)
+    for i2 in values:
+        # SequenceMatcher caches information about the second sequence
+        matcher.set_seq2(i2)
+        for i1 in values:
+            matcher.set_seq1(i1)
+            # real_quick_ratio() and quick_ratio() are cheap upper bounds of ratio()
+            if matcher.real_quick_ratio() > 0.8 and matcher.quick_ratio() > 0.8:
+                match_value = matcher.ratio()
+                if match_value > 0.8 and match_value != 1:
+                    similar.add(i1)
+                    similar.add(i2)
+
+    return similar
+
+
+def _check_for_similar_values(values, values_key_name, health_is_called=False, results=None, new_results=None):
     """
     Check if values within the provided list 'values' are a very close match.
     :param values: the list of values to check for close matches
     :values_key_name: the kv-pair key name from which these values are originating
     :health_is_called: specify if an error message should be printed or not
+    :param results: cached health check results (optional), see _get_health_result
+    :param new_results: dictionary in which the health check results are collected, see _get_health_result
     """
-    values_non_empty = [v for v in values if v is not None]
+    values_non_empty = sorted(v for v in values if v is not None)
     has_similar = False
-    similar = set()
-    for i1 in values_non_empty:
-        for i2 in values_non_empty:
-            match_value = SequenceMatcher(None, i1, i2).ratio()
-            if match_value > 0.8 and match_value != 1:
-                similar.add(i1)
-                similar.add(i2)
+    if results is None:
+        similar = _get_similar_values(values_non_empty)
+    else:
+        similar = _get_health_result(results, new_results, _get_similar_values, values_non_empty)
 
     if len(similar) > 0:
         has_similar = _print_error_msg(
             '[!] There are values in the key-value pairs for \'' + values_key_name + '\' which are very similar. Correct where necessary:', health_is_called)
-        for s in similar:
+        for s in sorted(similar):
             _print_error_msg('    - ' + s, health_is_called)
 
     return has_similar
 
 
-def _check_health_score_object(yaml_object, object_type, tech_id, health_is_called):
+def _load_health_results_cache(filename):
+    """
+    Load the cached health check results of the objects within the provided YAML file.
+    :param filename: YAML file location
+    :return: dictionary with the cached health check results, keyed by the hash of the checked object's content
+    """
+    if filename:
+        results_file = _get_cache_file('health-results_', filename)
+        if os.path.exists(results_file):
+            try:
+                with open(results_file, 'rb') as f:
+                    cache = pickle.load(f)
+                if cache['version'] == VERSION:
+                    return cache['results']
+            except Exception:
+                pass
+    return {}
+
+
+def _update_health_results_cache(filename, results, new_results):
+    """
+    Write the health check results of the objects within the provided YAML file to disk if changed. Results for objects
+    that are no longer part of the YAML file are removed.
+    :param filename: YAML file location
+    :param results: the health check results loaded from the cache
+    :param new_results: the health check results of the objects as currently present in the YAML file
+    :return:
+    """
+    if filename and results.keys() != new_results.keys():
+        with open(_get_cache_file('health-results_', filename), 'wb') as fd:
+            pickle.dump({'version': VERSION, 'results': new_results}, fd)
+
+
+def _get_health_result(results, new_results, check_function, *args):
+    """
+    Get the result of a health check on an object. The check is only executed when its result is not yet cached for an
+    object with the same content.
+    :param results: cached health check results, keyed by a hash of the check function and its arguments
+    :param new_results: dictionary in which the health check results are collected
+    :param check_function: function performing the health check without side effects
+    :param args: arguments for the check function. These must fully determine the result.
+    :return: the result of the health check
+    """
+    key = hashlib.sha1(repr((check_function.__name__, args)).encode('utf-8')).hexdigest()
+    if key not in new_results:
+        new_results[key] = results[key] if key in results else check_function(*args)
+    return new_results[key]
+
+
+def _check_health_score_object(yaml_object, object_type, tech_id):
     """
     Check the health of a score_logbook inside a visibility or detection YAML object
     :param yaml_object: YAML file lines
     :param object_type: 'detection' or 'visibility'
     :param tech_id: ATT&CK technique ID
-    :param health_is_called: boolean that specifies if detailed errors in the file will be printed
-    :return: True if the YAML file is unhealthy, otherwise False
+    :return: list with the error messages
     """
-    has_error = False
+    errors = []
     min_score = None
     max_score = None
 
@@ -140,30 +212,30 @@ def _check_health_score_object(yaml_object, object_type, tech_id, health_is_call
         for score_obj in yaml_object['score_logbook']:
             for key in ['date', 'score', 'comment']:
                 if key not in score_obj:
-                    has_error = _print_error_msg('[!] Technique ID: ' + tech_id + ' is MISSING a key-value pair in a ' +
-                                                 object_type + ' score object within the \'score_logbook\': ' + key, health_is_called)
+                    errors.append('[!] Technique ID: ' + tech_id + ' is MISSING a key-value pair in a ' +
+                                  object_type + ' score object within the \'score_logbook\': ' + key)
 
             if score_obj['score'] is None:
-                has_error = _print_error_msg('[!] Technique ID: ' + tech_id + ' has an EMPTY key-value pair in a ' +
-                                             object_type + ' score object within the \'score_logbook\': score', health_is_called)
+                errors.append('[!] Technique ID: ' + tech_id + ' has an EMPTY key-value pair in a ' +
+                              object_type + ' score object within the \'score_logbook\': score')
 
             elif not isinstance(score_obj['score'], int):
-                has_error = _print_error_msg('[!] Technique ID: ' + tech_id + ' has an INVALID score format in a ' + object_type +
-                                             ' score object within the \'score_logbook\': ' + score_obj['score'] + '  (should be an integer)', health_is_called)
+                errors.append('[!] Technique ID: ' + tech_id + ' has an INVALID score format in a ' + object_type +
+                              ' score object within the \'score_logbook\': ' + score_obj['score'] + '  (should be an integer)')
 
             if 'auto_generated' in score_obj:
                 if not isinstance(score_obj['auto_generated'], bool):
-                    has_error = _print_error_msg(
-                        '[!] Technique ID: ' + tech_id + ' has an INVALID \'auto_generated\' value in a ' + object_type + ' score object within the \'score_logbook\': should be set to \'true\' or \'false\'', health_is_called)
+                    errors.append(
+                        '[!] Technique ID: ' + tech_id + ' has an INVALID \'auto_generated\' value in a ' + object_type + ' score object within the \'score_logbook\': should be set to \'true\' or \'false\'')
 
             if isinstance(score_obj['score'], int):
                 if score_obj['date'] is None and ((score_obj['score'] > -1 and object_type == 'detection') or (score_obj['score'] > 0 and object_type == 'visibility')):
-                    has_error = _print_error_msg('[!] Technique ID: ' + tech_id + ' has an EMPTY key-value pair in a ' +
-                                                 object_type + ' score object within the \'score_logbook\': date', health_is_called)
+                    errors.append('[!] Technique ID: ' + tech_id + ' has an EMPTY key-value pair in a ' +
+                                  object_type + ' score object within the \'score_logbook\': date')
 
                 if not (score_obj['score'] >= min_score and score_obj['score'] <= max_score):
-                    has_error = _print_error_msg(
-                        '[!] Technique ID: ' + tech_id + ' has an INVALID ' + object_type + ' score in a score object within the \'score_logbook\': ' + str(score_obj['score']) + '  (should be between ' + str(min_score) + ' and ' + str(max_score) + ')', health_is_called)
+                    errors.append(
+                        '[!] Technique ID: ' + tech_id + ' has an INVALID ' + object_type + ' score in a score object within the \'score_logbook\': ' + str(score_obj['score']) + '  (should be between ' + str(min_score) + ' and ' + str(max_score) + ')')
 
                 if not score_obj['date'] is None:
                     try:
@@ -174,12 +246,79 @@ def _check_health_score_object(yaml_object, object_type, tech_id, health_is_call
                         # pylint: disable=pointless-statement
                         score_obj['date'].day
                     except AttributeError:
-                        has_error = _print_error_msg('[!] Technique ID: ' + tech_id + ' has an INVALID data format in a ' + object_type +
-                                                     ' score object within the \'score_logbook\': ' + score_obj['date'] + '  (should be YYYY-MM-DD without quotes)', health_is_called)
+                        errors.append('[!] Technique ID: ' + tech_id + ' has an INVALID data format in a ' + object_type +
+                                      ' score object within the \'score_logbook\': ' + score_obj['date'] + '  (should be YYYY-MM-DD without quotes)')
     except KeyError:
         pass
 
-    return has_error
+    return errors
+
+
+def _check_health_technique(tech, technique):
+    """
+    Check on errors in the detection and visibility objects of a technique within the technique administration file.
+    :param tech: ATT&CK technique ID
+    :param technique: dictionary with the detection and visibility objects of the technique, see load_techniques
+    :return: tuple with a list of error messages and a list with the technique's applicable_to values
+    """
+    errors = []
+    applicable_to = []
+
+    for obj_type in ['detection', 'visibility']:
+        if obj_type not in technique:
+            errors.append('[!] Technique ID: ' + tech + ' is MISSING a key-value pair: ' + obj_type)
+        else:
+            obj_applicable_to = []
+            for obj in technique[obj_type]:
+                obj_keys = ['applicable_to', 'comment', 'score_logbook']
+                obj_keys_list = ['applicable_to']
+                obj_keys_not_none = ['applicable_to']
+                if obj_type == 'detection':
+                    obj_keys.append('location')
+                    obj_keys_list.append('location')
+                    obj_keys_not_none.append('location')
+
+                for okey in obj_keys:
+                    if okey not in obj:
+                        errors.append('[!] Technique ID: ' + tech +
+                                      ' is MISSING a key-value pair in \'' + obj_type + '\': ' + okey)
+
+                for okey in obj_keys_list:
+                    if okey in obj:
+                        if not isinstance(obj[okey], list):
+                            errors.append('[!] Technique ID: ' + tech + ' the key-value pair \'' + okey +
+                                          '\' in \'' + obj_type + '\' is NOT a list')
+
+                for okey in obj_keys_not_none:
+                    if okey in obj and isinstance(obj[okey], list):
+                        none_count = 0
+                        for item in obj[okey]:
+                            if item is None:
+                                none_count += 1
+                        if none_count == 1:
+                            errors.append('[!] Technique ID: ' + tech + ' the key-value pair \'' + okey + '\' in \'' +
+                                          obj_type + '\' has an EMPTY value  (an empty string is allowed: \'\')')
+                        elif none_count > 1:
+                            errors.append('[!] Technique ID: ' + tech + ' the key-value pair \'' + okey + '\' in \'' + obj_type +
+                                          '\' has multiple EMPTY values  (an empty string is allowed: \'\')')
+
+                errors.extend(_check_health_score_object(obj, obj_type, tech))
+
+                if 'applicable_to' in obj and isinstance(obj['applicable_to'], list):
+                    applicable_to.extend(obj['applicable_to'])
+                    obj_applicable_to.extend(obj['applicable_to'])
+
+                    if obj_type == 'visibility' and len(set(obj['applicable_to'])) > 1 and 'all' in [a.lower() for a in obj['applicable_to'] if a is not None]:
+                        errors.append('[!] Technique ID: ' + tech + ' the key-value pair \'applicable_to\' in \'' + obj_type +
+                                      '\' has \'all\' as a value that is not exclusively used (\'all\' can not be combined ' +
+                                      'with other applicable_to values in a visibility object).')
+
+            if len(obj_applicable_to) > len(set(obj_applicable_to)):
+                errors.append('[!] Technique ID: ' + tech + ' the key-value pair \'applicable_to\' in \'' + obj_type +
+                              '\' has DUPLICATE system values (a system can only be part of one ' +
+                              'applicable_to key-value pair within the same technique).')
+
+    return errors, applicable_to
 
 
 def _check_health_techniques(filename, technique_content, health_is_called):
@@ -232,63 +371,16 @@ def _check_health_techniques(filename, technique_content, health_is_called):
     all_applicable_to = set()
 
     techniques = load_techniques(filename)
+    results = _load_health_results_cache(filename)
+    new_results = {}
     for tech, v in techniques[0].items():
-        for obj_type in ['detection', 'visibility']:
-            if obj_type not in v:
-                has_error = _print_error_msg('[!] Technique ID: ' + tech + ' is MISSING a key-value pair: ' + obj_type, health_is_called)
-            else:
-                obj_applicable_to = []
-                for obj in v[obj_type]:
-                    obj_keys = ['applicable_to', 'comment', 'score_logbook']
-                    obj_keys_list = ['applicable_to']
-                    obj_keys_not_none = ['applicable_to']
-                    if obj_type == 'detection':
-                        obj_keys.append('location')
-                        obj_keys_list.append('location')
-                        obj_keys_not_none.append('location')
-
-                    for okey in obj_keys:
-                        if okey not in obj:
-                            has_error = _print_error_msg('[!] Technique ID: ' + tech +
-                                                         ' is MISSING a key-value pair in \'' + obj_type + '\': ' + okey, health_is_called)
-
-                    for okey in obj_keys_list:
-                        if okey in obj:
-                            if not isinstance(obj[okey], list):
-                                has_error = _print_error_msg('[!] Technique ID: ' + tech + ' the key-value pair \'' + okey +
-                                                             '\' in \'' + obj_type + '\' is NOT a list', health_is_called)
-
-                    for okey in obj_keys_not_none:
-                        if okey in obj and isinstance(obj[okey], list):
-                            none_count = 0
-                            for item in obj[okey]:
-                                if item is None:
-                                    none_count += 1
-                            if none_count == 1:
-                                has_error = _print_error_msg('[!] Technique ID: ' + tech + ' the key-value pair \'' + okey + '\' in \'' +
-                                                             obj_type + '\' has an EMPTY value  (an empty string is allowed: \'\')', health_is_called)
-                            elif none_count > 1:
-                                has_error = _print_error_msg('[!] Technique ID: ' + tech + ' the key-value pair \'' + okey + '\' in \'' + obj_type +
-                                                             '\' has multiple EMPTY values  (an empty string is allowed: \'\')', health_is_called)
-
-                    health = _check_health_score_object(obj, obj_type, tech, health_is_called)
-                    has_error = _update_health_state(has_error, health)
-
-                    if 'applicable_to' in obj and isinstance(obj['applicable_to'], list):
-                        all_applicable_to.update(obj['applicable_to'])
-                        obj_applicable_to.extend(obj['applicable_to'])
-
-                        if obj_type == 'visibility' and len(set(obj['applicable_to'])) > 1 and 'all' in [a.lower() for a in obj['applicable_to'] if a is not None]:
-                            has_error = _print_error_msg('[!] Technique ID: ' + tech + ' the key-value pair \'applicable_to\' in \'' + obj_type +
-                                                         '\' has \'all\' as a value that is not exclusively used (\'all\' can not be combined ' +
-                                                         'with other applicable_to values in a visibility object).', health_is_called)
-
-                if len(obj_applicable_to) > len(set(obj_applicable_to)):
-                    has_error = _print_error_msg('[!] Technique ID: ' + tech + ' the key-value pair \'applicable_to\' in \'' + obj_type +
-                                                 '\' has DUPLICATE system values (a system can only be part of one ' +
-                                                 'applicable_to key-value pair within the same technique).', health_is_called)
-
-    has_error = has_error if not _check_for_similar_values(all_applicable_to, 'applicable_to', health_is_called) else True
+        errors, applicable_to = _get_health_result(results, new_results, _check_health_technique, tech, v)
+        for msg in errors:
+            has_error = _print_error_msg(msg, health_is_called)
+        all_applicable_to.update(applicable_to)
+
+    has_error = has_error if not _check_for_similar_values(all_applicable_to, 'applicable_to', health_is_called, results, new_results) else True
+    _update_health_results_cache(filename, results, new_results)
 
     if has_error and not health_is_called:
         print(HEALTH_ERROR_TXT + filename)
@@ -296,6 +388,105 @@ def _check_health_techniques(filename, technique_content, health_is_called):
     _update_health_state_cache(filename, has_error)
 
 
+def _check_health_data_source(ds_global_obj):
+    """
+    Check on errors in a data source object within the data source administration file.
+    :param ds_global_obj: data source object, with its data source details objects in a list
+    :return: tuple with a list of error messages and a set with the data source's applicable_to values
+    """
+    errors = []
+    applicable_to = set()
+
+    for key_global in ['data_source_name', 'data_source']:
+        if key_global not in ds_global_obj:
+            errors.append('[!] Data source: \'' + ds_global_obj['data_source_name'] +
+                          '\' is MISSING a key-value pair: ' + key_global)
+
+    if 'data_source' in ds_global_obj:
+        glb_obj_applicable_to = []
+        for ds_details_obj in ds_global_obj['data_source']:
+            obk_keys = ['applicable_to', 'date_registered', 'date_connected',
+                        'products', 'available_for_data_analytics', 'comment', 'data_quality']
+            obj_keys_list = ['applicable_to', 'products']
+            obj_keys_not_none = ['applicable_to', 'products']
+
+            for okey in obk_keys:
+                if okey not in ds_details_obj:
+                    errors.append('[!] Data source: \'' + ds_global_obj['data_source_name'] +
+                                  '\' is MISSING a key-value pair: ' + okey)
+
+            for okey in obj_keys_list:
+                if okey in ds_details_obj:
+                    if not isinstance(ds_details_obj[okey], list):
+                        errors.append('[!] Data source: \'' + ds_global_obj['data_source_name'] + '\' the key-value pair \'' + okey +
+                                      '\' is NOT a list')
+
+            for okey in obj_keys_not_none:
+                if okey in ds_details_obj and isinstance(ds_details_obj[okey], list):
+                    none_count = 0
+                    for item in ds_details_obj[okey]:
+                        if item is None:
+                            none_count += 1
+                    if none_count == 1:
+                        errors.append('[!] Data source: \'' + ds_global_obj['data_source_name'] + '\' the key-value pair \'' + okey +
+                                      '\' has an EMPTY value  (an empty string is allowed: \'\')')
+                    elif none_count > 1:
+                        errors.append('[!] Data source: \'' + ds_global_obj['data_source_name'] + '\' the key-value pair \'' + okey +
+                                      '\' has an EMPTY values  (an empty string is allowed: \'\')')
+
+            for key in ['date_registered', 'date_connected']:
+                if key in ds_details_obj and not ds_details_obj[key] is None:
+                    try:
+                        # pylint: disable=pointless-statement
+                        ds_details_obj[key].year
+                        # pylint: disable=pointless-statement
+                        ds_details_obj[key].month
+                        # pylint: disable=pointless-statement
+                        ds_details_obj[key].day
+                    except AttributeError:
+                        errors.append('[!] Data source: \'' + ds_global_obj['data_source_name'] + '\' has an INVALID data format for the key-value pair \'' + key
+                                      + '\': ' + ds_details_obj[key] + '  (should be YYYY-MM-DD without quotes)')
+
+            if 'available_for_data_analytics' in ds_details_obj:
+                if not isinstance(ds_details_obj['available_for_data_analytics'], bool):
+                    errors.append('[!] Data source: \'' + ds_global_obj['data_source_name'] +
+                                  '\' has an INVALID \'available_for_data_analytics\' value: should be set to \'true\' or \'false\'')
+
+            if 'data_quality' in ds_details_obj:
+                if isinstance(ds_details_obj['data_quality'], dict):
+                    for dimension in ['device_completeness', 'data_field_completeness', 'timeliness', 'consistency', 'retention']:
+                        if dimension not in ds_details_obj['data_quality']:
+                            errors.append('[!] Data source: \'' + ds_global_obj['data_source_name'] +
+                                          '\' is MISSING a key-value pair in \'data_quality\': ' + dimension)
+                        else:
+                            if isinstance(ds_details_obj['data_quality'][dimension], int):
+                                if not 0 <= ds_details_obj['data_quality'][dimension] <= 5:
+                                    errors.append('[!] Data source: \'' + ds_global_obj['data_source_name'] + '\' has an INVALID data quality score for the dimension \''
+                                                  + dimension + '\': ' + str(ds_details_obj['data_quality'][dimension]) + '  (should be between 0 and 5)')
+                            else:
+                                errors.append('[!] Data source: \'' + ds_global_obj['data_source_name'] + '\' has an INVALID data quality score for the dimension \'' +
+                                              dimension + '\': ' + str(ds_details_obj['data_quality'][dimension]) + '  (should be an an integer)')
+                else:
+                    errors.append('[!] Data source: \'' + ds_global_obj['data_source_name'] +
+                                  '\' the key-value pair \'data_quality\' is NOT a dictionary with data quality dimension scores')
+
+            if 'applicable_to' in ds_details_obj and isinstance(ds_details_obj['applicable_to'], list):
+                applicable_to.update(ds_details_obj['applicable_to'])
+                glb_obj_applicable_to.extend(ds_details_obj['applicable_to'])
+
+                if len(ds_details_obj['applicable_to']) > 1 and 'all' in [a.lower() for a in ds_details_obj['applicable_to'] if a is not None]:
+                    errors.append('[!] Data source: \'' + ds_global_obj['data_source_name'] + '\' has \'all\' as system value ' +
+                                  'within the key-value pair \'applicable_to\', plus additional systems (the build-in system \'all\' ' +
+                                  'cannot be combined with other systems).')
+
+        if len(glb_obj_applicable_to) > len(set(glb_obj_applicable_to)):
+            errors.append('[!] Data source: \'' + ds_global_obj['data_source_name'] + '\' has DUPLICATE system values ' +
+                          'within the key-value pair \'applicable_to\' (a system can only be part of one ' +
+                          'applicable_to key-value pair within the same data source).')
+
+    return errors, applicable_to
+
+
 def check_health_data_sources(filename, ds_content, health_is_called, no_print=False, src_eql=False):
     """
     Check on errors in the provided data sources administration YAML file.
@@ -355,96 +546,18 @@ def check_health_data_sources(filename, ds_content, health_is_called, no_print=F
 
     ds_objects_applicable_to = set()
 
+    results = _load_health_results_cache(filename)
+    new_results = {}
     for ds_global_obj in ds_content['data_sources']:
-        for key_global in ['data_source_name', 'data_source']:
-            if key_global not in ds_global_obj:
-                has_error = _print_error_msg('[!] Data source: \'' + ds_global_obj['data_source_name'] +
-                                             '\' is MISSING a key-value pair: ' + key_global, health_is_called)
-
-        if 'data_source' in ds_global_obj:
-            if not isinstance(ds_global_obj['data_source'], list):
-                ds_global_obj['data_source'] = [ds_global_obj['data_source']]
-
-            glb_obj_applicable_to = []
-            for ds_details_obj in ds_global_obj['data_source']:
-                obk_keys = ['applicable_to', 'date_registered', 'date_connected',
-                            'products', 'available_for_data_analytics', 'comment', 'data_quality']
-                obj_keys_list = ['applicable_to', 'products']
-                obj_keys_not_none = ['applicable_to', 'products']
-
-                for okey in obk_keys:
-                    if okey not in ds_details_obj:
-                        has_error = _print_error_msg('[!] Data source: \'' + ds_global_obj['data_source_name'] +
-                                                     '\' is MISSING a key-value pair: ' + okey, health_is_called)
+        if 'data_source' in ds_global_obj and not isinstance(ds_global_obj['data_source'], list):
+            ds_global_obj['data_source'] = [ds_global_obj['data_source']]
 
-                for okey in obj_keys_list:
-                    if okey in ds_details_obj:
-                        if not isinstance(ds_details_obj[okey], list):
-                            has_error = _print_error_msg('[!] Data source: \'' + ds_global_obj['data_source_name'] + '\' the key-value pair \'' + okey +
-                                                         '\' is NOT a list', health_is_called)
+        errors, applicable_to = _get_health_result(results, new_results, _check_health_data_source, ds_global_obj)
+        for msg in errors:
+            has_error = _print_error_msg(msg, health_is_called)
+        ds_objects_applicable_to.update(applicable_to)
+    _update_health_results_cache(filename, results, new_results)
 
-                for okey in obj_keys_not_none:
-                    if okey in ds_details_obj and isinstance(ds_details_obj[okey], list):
-                        none_count = 0
-                        for item in ds_details_obj[okey]:
-                            if item is None:
-                                none_count += 1
-                        if none_count == 1:
-                            has_error = _print_error_msg('[!] Data source: \'' + ds_global_obj['data_source_name'] + '\' the key-value pair \'' + okey +
-                                                         '\' has an EMPTY value  (an empty string is allowed: \'\')', health_is_called)
-                        elif none_count > 1:
-                            has_error = _print_error_msg('[!] Data source: \'' + ds_global_obj['data_source_name'] + '\' the key-value pair \'' + okey +
-                                                         '\' has an EMPTY values  (an empty string is allowed: \'\')', health_is_called)
-
-                for key in ['date_registered', 'date_connected']:
-                    if key in ds_details_obj and not ds_details_obj[key] is None:
-                        try:
-                            # pylint: disable=pointless-statement
-                            ds_details_obj[key].year
-                            # pylint: disable=pointless-statement
-                            ds_details_obj[key].month
-                            # pylint: disable=pointless-statement
-                            ds_details_obj[key].day
-                        except AttributeError:
-                            has_error = _print_error_msg('[!] Data source: \'' + ds_global_obj['data_source_name'] + '\' has an INVALID data format for the key-value pair \'' + key
-                                                         + '\': ' + ds_details_obj[key] + '  (should be YYYY-MM-DD without quotes)', health_is_called)
-
-                if 'available_for_data_analytics' in ds_details_obj:
-                    if not isinstance(ds_details_obj['available_for_data_analytics'], bool):
-                        has_error = _print_error_msg('[!] Data source: \'' + ds_global_obj['data_source_name'] +
-                                                     '\' has an INVALID \'available_for_data_analytics\' value: should be set to \'true\' or \'false\'', health_is_called)
-
-                if 'data_quality' in ds_details_obj:
-                    if isinstance(ds_details_obj['data_quality'], dict):
-                        for dimension in ['device_completeness', 'data_field_completeness', 'timeliness', 'consistency', 'retention']:
-                            if dimension not in ds_details_obj['data_quality']:
-                                has_error = _print_error_msg('[!] Data source: \'' + ds_global_obj['data_source_name'] +
-                                                             '\' is MISSING a key-value pair in \'data_quality\': ' + dimension, health_is_called)
-                            else:
-                                if isinstance(ds_details_obj['data_quality'][dimension], int):
-                                    if not 0 <= ds_details_obj['data_quality'][dimension] <= 5:
-                                        has_error = _print_error_msg('[!] Data source: \'' + ds_global_obj['data_source_name'] + '\' has an INVALID data quality score for the dimension \''
-                                                                     + dimension + '\': ' + str(ds_details_obj['data_quality'][dimension]) + '  (should be between 0 and 5)', health_is_called)
-                                else:
-                                    has_error = _print_error_msg('[!] Data source: \'' + ds_global_obj['data_source_name'] + '\' has an INVALID data quality score for the dimension \'' +
-                                                                 dimension + '\': ' + str(ds_details_obj['data_quality'][dimension]) + '  (should be an an integer)', health_is_called)
-                    else:
-                        has_error = _print_error_msg('[!] Data source: \'' + ds_global_obj['data_source_name'] +
-                                                     '\' the key-value pair \'data_quality\' is NOT a dictionary with data quality dimension scores', health_is_called)
-
-                if 'applicable_to' in ds_details_obj and isinstance(ds_details_obj['applicable_to'], list):
-                    ds_objects_applicable_to.update(ds_details_obj['applicable_to'])
-                    glb_obj_applicable_to.extend(ds_details_obj['applicable_to'])
-
-                    if len(ds_details_obj['applicable_to']) > 1 and 'all' in [a.lower() for a in ds_details_obj['applicable_to'] if a is not None]:
-                        has_error = _print_error_msg('[!] Data source: \'' + ds_global_obj['data_source_name'] + '\' has \'all\' as system value ' +
-                                                     'within the key-value pair \'applicable_to\', plus additional systems (the build-in system \'all\' ' +
-                                                     'cannot be combined with other systems).', health_is_called)
-
-            if len(glb_obj_applicable_to) > len(set(glb_obj_applicable_to)):
-                has_error = _print_error_msg('[!] Data source: \'' + ds_global_obj['data_source_name'] + '\' has DUPLICATE system values ' +
-                                             'within the key-value pair \'applicable_to\' (a system can only be part of one ' +
-                                             'applicable_to key-value pair within the same data source).', health_is_called)
     if not src_eql:
         for ds_a in ds_objects_applicable_to:
             if ds_a.lower() not in systems_applicable_to and ds_a.lower() != 'all':
@@ -501,14 +614,12 @@ def check_yaml_file_health(filename, file_type, health_is_called):
     :param health_is_called: boolean that specifies if detailed errors in the file will be printed to stdout
     :return:
     """
-    from generic import init_yaml
+    from generic import load_yaml_file
 
     # first we check if the file was modified. Otherwise, the health check is skipped for performance reasons
     if _is_file_modified(filename) or health_is_called:
 
-        _yaml = init_yaml()
-        with open(filename, 'r') as yaml_file:
-            yaml_content = _yaml.load(yaml_file)
+        yaml_content = load_yaml_file(filename)
 
         if file_type == FILE_TYPE_DATA_SOURCE_ADMINISTRATION:
             check_health_data_sources(filename, yaml_content, health_is_called)
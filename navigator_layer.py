@@ -58,37 +58,21 @@ def determine_and_set_show_sub_techniques(techniques_layer, techniques, layer_se
     """
     # determine if technique needs to be collapsed to show sub-techniques
     # show subtechniques when technique contains subtechniques:
+    techniques_with_subtech = set(t['techniqueID'][:5] for t in techniques_layer if len(t['techniqueID']) == 9)
+    techniques_present = set()
     for t in techniques_layer:
         if len(t['techniqueID']) == 5:
-            show_sub_techniques = False
-            for subtech in techniques_layer:
-                if len(subtech['techniqueID']) == 9:
-                    if t['techniqueID'] in subtech['techniqueID']:
-                        show_sub_techniques = True
-                        break
-            t['showSubtechniques'] = show_sub_techniques
+            t['showSubtechniques'] = t['techniqueID'] in techniques_with_subtech
+            techniques_present.add(t['techniqueID'])
     # add technique with showSubtechnique attribute, when sub-technique is present and technique isn't:
     techniques_to_add = []
     already_added = set()
     for subtech in techniques_layer:
         if len(subtech['techniqueID']) == 9:
-            technique_present = False
             # Is technique already in the techniques_layer:
-            for t in techniques_layer:
-                if len(t['techniqueID']) == 5:
-                    if t['techniqueID'] in subtech['techniqueID']:
-                        technique_present = True
-            if not technique_present:
+            if subtech['techniqueID'][:5] not in techniques_present:
                 technique_id = subtech['techniqueID'][:5]
-                technique = get_technique(techniques, technique_id)
-                
-                tactics = []
-                if 'includeTactic' in layer_settings.keys() and layer_settings['includeTactic'] == 'True':
-                    for kill_chain_phase in technique['kill_chain_phases']:
-                        if kill_chain_phase['kill_chain_name'] == 'mitre-attack':
-                            tactics.append(kill_chain_phase['phase_name'])
-                else:
-                    tactics.append(None)
+                tactics = get_layer_tactics(techniques, technique_id, layer_settings)
                 
                 new_tech = dict()
                 new_tech['techniqueID'] = technique_id
@@ -88,13 +88,7 @@ def _map_and_colorize_techniques_for_detections(my_techniques, domain, count_det
             technique = get_technique(techniques, technique_id)
             s = calculate_score(technique_data['detection'], zero_value=-1)
             
-            tactics = []
-            if 'includeTactic' in layer_settings.keys() and layer_settings['includeTactic'] == 'True':
-                for kill_chain_phase in technique['kill_chain_phases']:
-                    if kill_chain_phase['kill_chain_name'] == 'mitre-attack':
-                        tactics.append(kill_chain_phase['phase_name'])
-            else:
-                tactics.append(None)
+            tactics = get_layer_tactics(techniques, technique_id, layer_settings)
 
             include_technique = s != -1 or any(_include_detection_in_layer_metadata(d) for d in technique_data['detection'])
 
@@ -179,13 +173,7 @@ def _map_and_colorize_techniques_for_visibility(my_techniques, platforms, domain
         technique = get_technique(techniques, technique_id)
         color = COLOR_V_1 if s == 1 else COLOR_V_2 if s == 2 else COLOR_V_3 if s == 3 else COLOR_V_4 if s == 4 else ''
         
-        tactics = []
-        if 'includeTactic' in layer_settings.keys() and layer_settings['includeTactic'] == 'True':
-            for kill_chain_phase in technique['kill_chain_phases']:
-                if kill_chain_phase['kill_chain_name'] == 'mitre-attack':
-                    tactics.append(kill_chain_phase['phase_name'])
-        else:
-            tactics.append(None)
+        tactics = get_layer_tactics(techniques, technique_id, layer_settings)
 
         if technique is not None:
             x = dict()
@@ -246,13 +234,7 @@ def _map_and_colorize_techniques_for_visibility(my_techniques, platforms, domain
                 print('[!] Technique ' + technique_id + ' does not exist (anymore) in ATT&CK. Ignoring this technique.')
                 continue
 
-            tactics = []
-            if 'includeTactic' in layer_settings.keys() and layer_settings['includeTactic'] == 'True':
-                for kill_chain_phase in technique['kill_chain_phases']:
-                    if kill_chain_phase['kill_chain_name'] == 'mitre-attack':
-                        tactics.append(kill_chain_phase['phase_name'])
-            else:
-                tactics.append(None)
+            tactics = get_layer_tactics(techniques, technique_id, layer_settings)
             
             x['techniqueID'] = tech_id
             x['comment'] = ''
@@ -318,13 +300,7 @@ def _map_and_colorize_techniques_for_overlaid(my_techniques, platforms, domain,
             print('[!] Technique ' + technique_id + ' does not exist (anymore) in ATT&CK. Ignoring this technique.')
             continue
 
-        tactics = []
-        if 'includeTactic' in layer_settings.keys() and layer_settings['includeTactic'] == 'True':
-            for kill_chain_phase in technique['kill_chain_phases']:
-                if kill_chain_phase['kill_chain_name'] == 'mitre-attack':
-                    tactics.append(kill_chain_phase['phase_name'])
-        else:
-            tactics.append(None)
+        tactics = get_layer_tactics(techniques, technique_id, layer_settings)
         
         x = dict()
         x['techniqueID'] = technique_id
@@ -496,7 +472,8 @@ def export_techniques_list_to_excel(filename, output_filename, output_overwrite)
     else:
         excel_filename = use_existing_filename(output_filename, 'xlsx')
 
-    workbook = xlsxwriter.Workbook(excel_filename)
+    # rows are written in order, so every row can be flushed to disk directly
+    workbook = xlsxwriter.Workbook(excel_filename, {'constant_memory': True})
     worksheet_detections = workbook.add_worksheet('Detections')
     worksheet_visibility = workbook.add_worksheet('Visibility')
 
@@ -519,6 +496,16 @@ def export_techniques_list_to_excel(filename, output_filename, output_overwrite)
     visibility_score_2 = workbook.add_format({'valign': 'top', 'align': 'center', 'bg_color': COLOR_V_2})
     visibility_score_3 = workbook.add_format({'valign': 'top', 'align': 'center', 'bg_color': COLOR_V_3, 'font_color': '#ffffff'})
     visibility_score_4 = workbook.add_format({'valign': 'top', 'align': 'center', 'bg_color': COLOR_V_4, 'font_color': '#ffffff'})
+    detection_score_formats = {0: detection_score_0, 1: detection_score_1, 2: detection_score_2, 3: detection_score_3,
+                               4: detection_score_4, 5: detection_score_5}
+    visibility_score_formats = {1: visibility_score_1, 2: visibility_score_2, 3: visibility_score_3, 4: visibility_score_4}
+
+    # technique name and tactics, which are the same for all rows of a technique
+    technique_names_tactics = {}
+    for technique_id in my_techniques.keys():
+        technique = get_technique(mitre_techniques, technique_id)
+        if technique is not None:
+            technique_names_tactics[technique_id] = (technique['name'], ', '.join(t.capitalize() for t in get_tactics(technique)))
 
     # Title
     worksheet_detections.write(0, 0, 'Overview of detections for ' + name, format_title)
@@ -585,12 +572,9 @@ def export_techniques_list_to_excel(filename, output_filename, output_overwrite)
         for detection in technique_data['detection']:
             worksheet_detections.write(dy, 0, technique_id, valign_top)
 
-            technique = get_technique(mitre_techniques, technique_id)
-            if technique is not None:
-                worksheet_detections.write(dy, 1, technique['name'], valign_top)
-                worksheet_detections.write(dy, 2, ', '.join(t.capitalize() for t in
-                                                            get_tactics(technique)),
-                                           valign_top)
+            if technique_id in technique_names_tactics:
+                worksheet_detections.write(dy, 1, technique_names_tactics[technique_id][0], valign_top)
+                worksheet_detections.write(dy, 2, technique_names_tactics[technique_id][1], valign_top)
                 worksheet_detections.write(dy, 3, ', '.join(detection['applicable_to']), wrap_text)
                 # make sure the date format is '%Y-%m-%d'. When we've done a EQL query this will become '%Y-%m-%d %H %M $%S'
                 tmp_date = get_latest_date(detection)
@@ -598,7 +582,7 @@ def export_techniques_list_to_excel(filename, output_filename, output_overwrite)
                     tmp_date = tmp_date.strftime('%Y-%m-%d')
                 worksheet_detections.write(dy, 4, str(tmp_date).replace('None', ''), valign_top)
                 ds = get_latest_score(detection)
-                worksheet_detections.write(dy, 5, ds, detection_score_0 if ds == 0 else detection_score_1 if ds == 1 else detection_score_2 if ds == 2 else detection_score_3 if ds == 3 else detection_score_4 if ds == 4 else detection_score_5 if ds == 5 else no_score)  # noqa
+                worksheet_detections.write(dy, 5, ds, detection_score_formats.get(ds, no_score))
                 worksheet_detections.write(dy, 6, '\n'.join(detection['location']), wrap_text)
                 worksheet_detections.write(dy, 7, detection['comment'][:-1]
                                            if detection['comment'].endswith('\n') else detection['comment'], wrap_text)
@@ -623,11 +607,9 @@ def export_techniques_list_to_excel(filename, output_filename, output_overwrite)
         for visibility in technique_data['visibility']:
             worksheet_visibility.write(vy, 0, technique_id, valign_top)
 
-            technique = get_technique(mitre_techniques, technique_id)
-            if technique is not None:
-                worksheet_visibility.write(vy, 1, technique['name'], valign_top)
-                worksheet_visibility.write(vy, 2, ', '.join(t.capitalize() for t in
-                                                            get_tactics(technique)), valign_top)
+            if technique_id in technique_names_tactics:
+                worksheet_visibility.write(vy, 1, technique_names_tactics[technique_id][0], valign_top)
+                worksheet_visibility.write(vy, 2, technique_names_tactics[technique_id][1], valign_top)
                 worksheet_visibility.write(vy, 3, ', '.join(visibility['applicable_to']), wrap_text)
                 # make sure the date format is '%Y-%m-%d'. When we've done a EQL query this will become '%Y-%m-%d %H %M $%S'
                 tmp_date = get_latest_date(visibility)
@@ -635,7 +617,7 @@ def export_techniques_list_to_excel(filename, output_filename, output_overwrite)
                     tmp_date = tmp_date.strftime('%Y-%m-%d')
                 worksheet_visibility.write(vy, 4, str(tmp_date).replace('None', ''), valign_top)
                 vs = get_latest_score(visibility)
-                worksheet_visibility.write(vy, 5, vs, visibility_score_1 if vs == 1 else visibility_score_2 if vs == 2 else visibility_score_3 if vs == 3 else visibility_score_4 if vs == 4 else no_score)  # noqa
+                worksheet_visibility.write(vy, 5, vs, visibility_score_formats.get(vs, no_score))
                 v_comment = get_latest_comment(visibility)
                 worksheet_visibility.write(vy, 6, visibility['comment'][:-1]
                                            if visibility['comment'].endswith('\n') else visibility['comment'], wrap_text)
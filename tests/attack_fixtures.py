@@ -0,0 +1,63 @@
+import os
+import tempfile
+import unittest
+
+from constants import *
+
+SAMPLE_DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sample-data')
+
+
+def technique(technique_id, platforms, data_components, name=None, tactics=('execution',)):
+    return {'technique_id': technique_id, 'name': name or 'Technique ' + technique_id, 'x_mitre_platforms': platforms,
+            'external_references': [{'source_name': 'mitre-attack', 'external_id': technique_id}],
+            'kill_chain_phases': [{'kill_chain_name': 'mitre-attack', 'phase_name': t} for t in tactics],
+            'data_components': data_components, 'dettect_data_sources': []}
+
+
+def tech_by_group(group_id, technique_id, platforms, domains=('enterprise-attack',)):
+    return {'group_id': group_id, 'name': 'Group ' + group_id, 'aliases': None, 'technique_id': technique_id,
+            'x_mitre_platforms': platforms, 'x_mitre_domains': list(domains)}
+
+
+# ATT&CK groups, campaigns and software, to be returned by a patched load_attack_data
+GROUP_ATTACK_DATA = {
+    DATA_TYPE_CUSTOM_TECH_BY_GROUP: [
+        tech_by_group('G0002', 'T1059', ['Linux']),
+        tech_by_group('G0001', 'T1059', ['Windows', 'Linux']),
+        tech_by_group('G0001', 'T1003', ['Windows']),
+        tech_by_group('G0002', 'T1003', ['Windows']),
+        tech_by_group('G0003', 'T1566', None),
+        tech_by_group('G0004', 'T1059', ['Android'], ['mobile-attack'])],
+    DATA_TYPE_CUSTOM_TECH_IN_CAMPAIGN: [
+        {'campaign_id': 'C0001', 'name': 'Operation X', 'technique_id': 'T1105', 'x_mitre_platforms': ['Linux'],
+         'x_mitre_domains': ['enterprise-attack']}],
+    DATA_TYPE_CUSTOM_SOFTWARE_BY_GROUP: [
+        {'group_id': 'G0001', 'name': 'Group G0001', 'aliases': None, 'software_id': 'S0001', 'x_mitre_platforms': ['Linux'],
+         'x_mitre_domains': ['enterprise-attack']},
+        {'group_id': 'G0002', 'name': 'Group G0002', 'aliases': None, 'software_id': 'S0002', 'x_mitre_platforms': None,
+         'x_mitre_domains': ['enterprise-attack']}],
+    DATA_TYPE_CUSTOM_SOFTWARE_IN_CAMPAIGN: [],
+    DATA_TYPE_CUSTOM_TECH_BY_SOFTWARE: [
+        {'software_id': 'S0001', 'technique_id': 'T1105'}, {'software_id': 'S0001', 'technique_id': 'T1059'},
+        {'software_id': 'S0002', 'technique_id': 'T1027'}],
+    DATA_TYPE_STIX_ALL_GROUPS: [{'name': 'Group G000%d' % i, 'external_references': [
+        {'source_name': 'mitre-attack', 'external_id': 'G000%d' % i}]} for i in range(1, 5)],
+    DATA_TYPE_STIX_ALL_CAMPAIGNS: [{'name': 'Operation X', 'external_references': [
+        {'source_name': 'mitre-attack', 'external_id': 'C0001'}]}],
+    DATA_TYPE_STIX_ALL_SOFTWARE: [],
+    DATA_TYPE_STIX_ALL_TECH_ENTERPRISE: []}
+
+
+class TempWorkingDirTestCase(unittest.TestCase):
+    """
+    Runs every test within a temporary working directory with an 'output' directory.
+    """
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmpdir.name)
+        os.mkdir('output')
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmpdir.cleanup()
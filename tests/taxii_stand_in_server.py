@@ -0,0 +1,118 @@
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+MEDIA_TYPE_TAXII_V21 = 'application/taxii+json;version=2.1'
+
+
+def _parse_timestamp(value):
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+def _format_timestamp(value):
+    return value.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+class TaxiiStandInServer:
+    """
+    Minimal local TAXII 2.1 server, serving the 'Get Collection' and 'Get Objects' endpoints for a set of
+    collections. Supports pagination (limit/next), the added_after filter and the X-TAXII-Date-Added-First/Last
+    headers.
+    """
+
+    def __init__(self, delay=0.0):
+        self.collections = {}
+        self.requests = []
+        self.delay = delay
+        self.max_concurrent_requests = 0
+        self._concurrent_requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler_class())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def collections_url(self):
+        return 'http://127.0.0.1:%d/api/v21/collections/' % self._server.server_address[1]
+
+    def add_objects(self, collection_id, stix_objects, date_added=None):
+        date_added = date_added or datetime.now(timezone.utc)
+        for obj in stix_objects:
+            self.collections.setdefault(collection_id, []).append((date_added, obj))
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _get_objects(self, collection_id, params):
+        objects = self.collections[collection_id]
+        if 'added_after' in params:
+            added_after = _parse_timestamp(params['added_after'][0])
+            objects = [(date_added, obj) for date_added, obj in objects if date_added > added_after]
+
+        # only return the latest version of every object
+        latest = {}
+        for date_added, obj in objects:
+            latest[obj['id']] = (date_added, obj)
+        objects = list(latest.values())
+
+        start = int(params.get('next', ['0'])[0])
+        limit = int(params.get('limit', [str(len(objects))])[0]) or len(objects)
+        page = objects[start:start + limit]
+        envelope = {'more': start + limit < len(objects), 'objects': [obj for _, obj in page]}
+        if envelope['more']:
+            envelope['next'] = str(start + limit)
+        headers = {}
+        if page:
+            headers['X-TAXII-Date-Added-First'] = _format_timestamp(min(date_added for date_added, _ in page))
+            headers['X-TAXII-Date-Added-Last'] = _format_timestamp(max(date_added for date_added, _ in page))
+        return envelope, headers
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with server._lock:
+                    server._concurrent_requests += 1
+                    server.max_concurrent_requests = max(server.max_concurrent_requests, server._concurrent_requests)
+                try:
+                    time.sleep(server.delay)
+                    url = urlparse(self.path)
+                    params = parse_qs(url.query)
+                    parts = [p for p in url.path.split('/') if p]
+                    collection_id = parts[3] if len(parts) > 3 else None
+                    if collection_id not in server.collections:
+                        self.send_error(404)
+                        return
+
+                    server.requests.append((collection_id, parts[4:], params))
+                    headers = {}
+                    if parts[4:] == ['objects']:
+                        response, headers = server._get_objects(collection_id, params)
+                    else:
+                        response = {'id': collection_id, 'title': collection_id, 'can_read': True, 'can_write': False,
+                                    'media_types': ['application/stix+json;version=2.1']}
+
+                    body = json.dumps(response).encode('utf-8')
+                    self.send_response(200)
+                    self.send_header('Content-Type', MEDIA_TYPE_TAXII_V21)
+                    self.send_header('Content-Length', str(len(body)))
+                    for header, value in headers.items():
+                        self.send_header(header, value)
+                    self.end_headers()
+                    self.wfile.write(body)
+                finally:
+                    with server._lock:
+                        server._concurrent_requests -= 1
+
+        return Handler
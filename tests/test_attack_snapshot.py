@@ -0,0 +1,46 @@
+import os
+import tempfile
+import unittest
+
+from attack_snapshot import get_snapshot_info, load_snapshot_table, write_snapshot
+
+
+class AttackSnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'cache', 'attack-snapshot.sqlite')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_missing_snapshot(self):
+        self.assertIsNone(get_snapshot_info(self.path))
+        self.assertIsNone(load_snapshot_table(self.path, 'mitre_all_groups', 60, '2.2.0'))
+
+    def test_tables_are_loaded_per_data_type(self):
+        write_snapshot(self.path, {'mitre_all_groups': [{'id': 'intrusion-set--1'}], 'mitre_all_campaigns': []},
+                       '19.1', '2.2.0')
+
+        self.assertEqual(get_snapshot_info(self.path)['attack_version'], '19.1')
+        self.assertEqual(load_snapshot_table(self.path, 'mitre_all_groups', 60, '2.2.0'), [{'id': 'intrusion-set--1'}])
+        self.assertEqual(load_snapshot_table(self.path, 'mitre_all_campaigns', 60, '2.2.0'), [])
+        self.assertIsNone(load_snapshot_table(self.path, 'mitre_all_software', 60, '2.2.0'))
+
+    def test_expired_or_other_dettect_version(self):
+        write_snapshot(self.path, {'mitre_all_groups': []}, '19.1', '2.2.0')
+
+        self.assertIsNone(load_snapshot_table(self.path, 'mitre_all_groups', 0, '2.2.0'))
+        self.assertIsNone(load_snapshot_table(self.path, 'mitre_all_groups', 60, '2.3.0'))
+
+    def test_refresh_replaces_complete_snapshot(self):
+        write_snapshot(self.path, {'mitre_all_groups': [1], 'mitre_all_campaigns': [1]}, '18.0', '2.2.0')
+        write_snapshot(self.path, {'mitre_all_groups': [2]}, '19.1', '2.2.0')
+
+        self.assertEqual(get_snapshot_info(self.path)['attack_version'], '19.1')
+        self.assertEqual(load_snapshot_table(self.path, 'mitre_all_groups', 60, '2.2.0'), [2])
+        self.assertIsNone(load_snapshot_table(self.path, 'mitre_all_campaigns', 60, '2.2.0'))
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ['attack-snapshot.sqlite'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+
+from constants import (
+    DATA_TYPE_CUSTOM_SOFTWARE_BY_GROUP,
+    DATA_TYPE_CUSTOM_SOFTWARE_IN_CAMPAIGN,
+    DATA_TYPE_CUSTOM_TECH_BY_GROUP,
+    DATA_TYPE_CUSTOM_TECH_BY_SOFTWARE,
+    DATA_TYPE_CUSTOM_TECH_IN_CAMPAIGN,
+)
+from generic import _build_custom_attack_data
+
+
+def _ext_ref(attack_id, source_name='mitre-attack'):
+    return [{'source_name': source_name, 'external_id': attack_id}]
+
+
+GROUPS = [
+    {'id': 'intrusion-set--1', 'name': 'APT1', 'aliases': ['APT1', 'Comment Crew'],
+     'external_references': _ext_ref('G0006'), 'x_mitre_domains': ['enterprise-attack']},
+    {'id': 'intrusion-set--2', 'name': 'Lonely Group', 'external_references': _ext_ref('G0099'),
+     'x_mitre_domains': ['enterprise-attack']},
+]
+CAMPAIGNS = [
+    {'id': 'campaign--1', 'name': 'Operation X', 'external_references': _ext_ref('C0001'),
+     'x_mitre_domains': ['enterprise-attack']},
+]
+SOFTWARE = [
+    {'id': 'malware--1', 'name': 'Evil', 'external_references': _ext_ref('S0001'), 'x_mitre_platforms': ['Windows']},
+    {'id': 'tool--1', 'name': 'Tool', 'external_references': _ext_ref('S0002'), 'x_mitre_platforms': ['Linux']},
+]
+TECHNIQUES = [
+    {'id': 'attack-pattern--1', 'external_references': _ext_ref('T1059'), 'x_mitre_platforms': ['Windows', 'Linux']},
+    {'id': 'attack-pattern--2', 'external_references': _ext_ref('T1003'), 'x_mitre_platforms': ['Windows']},
+]
+RELATIONSHIPS = [
+    {'relationship_type': 'uses', 'source_ref': 'intrusion-set--1', 'target_ref': 'attack-pattern--1'},
+    {'relationship_type': 'uses', 'source_ref': 'intrusion-set--1', 'target_ref': 'malware--1'},
+    {'relationship_type': 'mitigates', 'source_ref': 'intrusion-set--1', 'target_ref': 'attack-pattern--2'},
+    {'relationship_type': 'uses', 'source_ref': 'intrusion-set--1', 'target_ref': 'attack-pattern--2'},
+    {'relationship_type': 'uses', 'source_ref': 'intrusion-set--1', 'target_ref': 'attack-pattern--unknown'},
+    {'relationship_type': 'uses', 'source_ref': 'campaign--1', 'target_ref': 'attack-pattern--2'},
+    {'relationship_type': 'uses', 'source_ref': 'campaign--1', 'target_ref': 'tool--1'},
+    {'relationship_type': 'uses', 'source_ref': 'malware--1', 'target_ref': 'attack-pattern--1'},
+    {'relationship_type': 'attributed-to', 'source_ref': 'campaign--1', 'target_ref': 'intrusion-set--1'},
+]
+
+
+class BuildCustomAttackDataTest(unittest.TestCase):
+    def setUp(self):
+        self.custom = _build_custom_attack_data(GROUPS, CAMPAIGNS, SOFTWARE, TECHNIQUES, RELATIONSHIPS)
+
+    def test_techniques_by_group_keep_relationship_order(self):
+        self.assertEqual(self.custom[DATA_TYPE_CUSTOM_TECH_BY_GROUP], [
+            {'group_id': 'G0006', 'name': 'APT1', 'aliases': ['APT1', 'Comment Crew'], 'technique_id': 'T1059',
+             'x_mitre_platforms': ['Windows', 'Linux'], 'x_mitre_domains': ['enterprise-attack'],
+             'matrix': 'mitre-attack'},
+            {'group_id': 'G0006', 'name': 'APT1', 'aliases': ['APT1', 'Comment Crew'], 'technique_id': 'T1003',
+             'x_mitre_platforms': ['Windows'], 'x_mitre_domains': ['enterprise-attack'], 'matrix': 'mitre-attack'},
+        ])
+
+    def test_software_relationships(self):
+        self.assertEqual(self.custom[DATA_TYPE_CUSTOM_SOFTWARE_BY_GROUP], [
+            {'group_id': 'G0006', 'name': 'APT1', 'aliases': ['APT1', 'Comment Crew'], 'software_id': 'S0001',
+             'x_mitre_platforms': ['Windows'], 'x_mitre_domains': ['enterprise-attack'], 'matrix': 'mitre-attack'},
+        ])
+        self.assertEqual(self.custom[DATA_TYPE_CUSTOM_SOFTWARE_IN_CAMPAIGN], [
+            {'campaign_id': 'C0001', 'name': 'Operation X', 'software_id': 'S0002', 'x_mitre_platforms': ['Linux'],
+             'x_mitre_domains': ['enterprise-attack'], 'matrix': 'mitre-attack'},
+        ])
+        self.assertEqual(self.custom[DATA_TYPE_CUSTOM_TECH_BY_SOFTWARE],
+                         [{'software_id': 'S0001', 'technique_id': 'T1059'}])
+
+    def test_techniques_in_campaign(self):
+        self.assertEqual(self.custom[DATA_TYPE_CUSTOM_TECH_IN_CAMPAIGN], [
+            {'campaign_id': 'C0001', 'name': 'Operation X', 'technique_id': 'T1003', 'x_mitre_platforms': ['Windows'],
+             'x_mitre_domains': ['enterprise-attack'], 'matrix': 'mitre-attack'},
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import os
+import subprocess
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+from unittest.mock import patch
+
+from attack_fixtures import SAMPLE_DATA, TempWorkingDirTestCase
+import data_source_mapping
+from data_quality import calculate_data_quality_scores, calculate_data_quality_per_data_source, calculate_data_quality_per_system
+from data_source_mapping import generate_data_quality_trend
+from generic import load_data_sources
+
+DATA_SOURCES_FILE = os.path.join(SAMPLE_DATA, 'data-sources-endpoints.yaml')
+
+
+def _reference_score(data_quality):
+    # the data quality score as it used to be calculated in the Excel export
+    score = 0
+    score_count = 0
+    for k, v in data_quality.items():
+        if k in ['device_completeness', 'data_field_completeness', 'retention']:
+            score += (v * 2)
+            score_count += 2
+        else:
+            score += v
+            score_count += 1
+    return score / score_count if score > 0 else 0
+
+
+def _improve_process_creation(content):
+    # raise the device completeness of Process Creation on Windows workstations from 1 to 5
+    idx = content.index('data_source_name: Process Creation')
+    idx = content.index('device_completeness: 1', idx)
+    return content[:idx] + 'device_completeness: 5' + content[idx + len('device_completeness: 1'):]
+
+
+class DataQualityScoresTest(unittest.TestCase):
+    def test_scores(self):
+        my_ds = load_data_sources(DATA_SOURCES_FILE, filter_empty_scores=False)[0]
+        my_ds['Process Creation']['data_source'][0]['data_quality'] = {'device_completeness': 5, 'data_field_completeness': 4,
+                                                                        'timeliness': 1, 'consistency': 0, 'retention': 3}
+        my_ds['Process Creation']['data_source'][1]['data_quality'] = {'device_completeness': 0, 'data_field_completeness': 0,
+                                                                        'timeliness': 0, 'consistency': 0, 'retention': 0}
+        data_quality = calculate_data_quality_scores(my_ds)
+
+        details = [ds for ds_global in my_ds.values() for ds in ds_global['data_source']]
+        self.assertEqual(data_quality['details'], details)
+        self.assertEqual(list(data_quality['scores']), [_reference_score(ds['data_quality']) for ds in details])
+        self.assertEqual(list(data_quality['enabled']), [all(v > 0 for v in ds['data_quality'].values()) for ds in details])
+
+        per_data_source = calculate_data_quality_per_data_source(data_quality)
+        self.assertEqual(per_data_source['Process Creation'], (25 / 8 + 0) / 2)
+
+        systems = load_data_sources(DATA_SOURCES_FILE, filter_empty_scores=False)[2] + \
+            [{'applicable_to': 'Network devices', 'platform': ['Network Devices']}]
+        per_system = calculate_data_quality_per_system(data_quality, systems)
+        windows = [s for s, ds in zip(data_quality['scores'], details) if 'Windows workstations' in ds['applicable_to']]
+        self.assertAlmostEqual(per_system['Windows workstations'], sum(windows) / len(windows))
+        self.assertTrue(per_system['Network devices'] != per_system['Network devices'])  # NaN: no data sources
+
+    def test_empty(self):
+        data_quality = calculate_data_quality_scores({})
+        self.assertEqual(data_quality['dimensions'].shape, (0, 5))
+        self.assertEqual(calculate_data_quality_per_data_source(data_quality), {})
+
+
+class DataQualityTrendTest(TempWorkingDirTestCase):
+    def setUp(self):
+        super().setUp()
+        os.mkdir('repo')
+        self.content = Path(DATA_SOURCES_FILE).read_text()
+
+    def _git(self, *args):
+        subprocess.run(['git', '-C', 'repo', '-c', 'user.name=test', '-c', 'user.email=test@example.com'] + list(args),
+                       check=True, capture_output=True)
+
+    def test_trend_from_git_history(self):
+        self._git('init')
+        Path('repo/data-sources.yaml').write_text(self.content)
+        self._git('add', 'data-sources.yaml')
+        self._git('commit', '-m', 'initial')
+        Path('repo/README').write_text('unrelated change')
+        self._git('add', 'README')
+        self._git('commit', '-m', 'unrelated')
+        Path('repo/data-sources.yaml').write_text(_improve_process_creation(self.content))  # uncommitted change
+
+        with redirect_stdout(StringIO()):
+            trend = generate_data_quality_trend('repo/data-sources.yaml')
+
+        self.assertEqual([s['label'] for s in trend['snapshots']][1:], ['repo/data-sources.yaml'])
+        self.assertEqual(trend['data_sources']['Process Creation'], [1.0, 1.5])
+        self.assertEqual(trend['data_sources']['Command Execution'][0], trend['data_sources']['Command Execution'][1])
+        self.assertEqual(list(trend['systems']), ['Windows workstations', 'Linux servers'])
+        self.assertGreater(trend['systems']['Windows workstations'][1], trend['systems']['Windows workstations'][0])
+        self.assertEqual(trend['systems']['Linux servers'][0], trend['systems']['Linux servers'][1])
+        self.assertEqual(os.listdir('output'), ['data_quality_trend_data-sources-sample.json'])
+
+    def test_trend_from_archive(self):
+        os.mkdir('archive')
+        Path('archive/data-sources-1.yaml').write_text(self.content)
+        Path('archive/data-sources-2.yaml').write_text(self.content)
+        Path('archive/data-sources-3.yaml').write_text(self.content.replace('version: 1.1', 'version: 1.0'))
+        for i in range(1, 4):
+            os.utime('archive/data-sources-%d.yaml' % i, (i * 86400, i * 86400))
+        Path('data-sources.yaml').write_text(_improve_process_creation(self.content))
+
+        output = StringIO()
+        with patch('data_source_mapping.load_data_sources', wraps=data_source_mapping.load_data_sources) as load, \
+                redirect_stdout(output):
+            trend = generate_data_quality_trend('data-sources.yaml', archive='archive')
+
+        # the identical archived copies are parsed once, and the copy with an old file version is skipped
+        self.assertEqual(load.call_count, 2)
+        self.assertIn('[!] Skipped snapshot \'data-sources-3.yaml\'', output.getvalue())
+        self.assertEqual([s['label'] for s in trend['snapshots']],
+                         ['data-sources-1.yaml', 'data-sources-2.yaml', 'data-sources.yaml'])
+        self.assertEqual(trend['data_sources']['Process Creation'], [1.0, 1.0, 1.5])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import os
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+
+from attack_fixtures import SAMPLE_DATA, TempWorkingDirTestCase, technique
+from data_source_mapping import generate_aggregated_data_source_outputs
+
+TECHNIQUES = [technique('T1059', ['Windows', 'Linux'], ['Command Execution', 'Process Creation']),
+              technique('T1112', ['Windows'], ['Windows Registry Key Modification']),
+              technique('T1557', ['Windows'], ['Network Traffic Content'])]
+
+
+class DataSourceAggregationTest(TempWorkingDirTestCase):
+    def setUp(self):
+        super().setUp()
+        os.mkdir('units')
+        os.mkdir('cache')
+        content = Path(SAMPLE_DATA, 'data-sources-endpoints.yaml').read_text()
+        Path('units/unit-a.yaml').write_text(content.replace('name: Data sources sample', 'name: unit-a'))
+        # unit B does not have process creation and has an exception for T1112
+        Path('units/unit-b.yaml').write_text(content.replace('name: Data sources sample', 'name: unit-b')
+                                             .replace('data_source_name: Process Creation', 'data_source_name: Process Termination')
+                                             .replace('technique_id: T1557', 'technique_id: T1112'))
+
+    def test_aggregate_directory(self):
+        with patch('data_source_mapping.load_attack_data', return_value=TECHNIQUES) as load_attack_data, \
+                redirect_stdout(StringIO()):
+            aggregate = generate_aggregated_data_source_outputs('units', None, False, None, {})
+
+        self.assertEqual(load_attack_data.call_count, 1)
+        self.assertEqual(sorted(os.listdir('output')), ['data_sources_aggregated.json', 'data_sources_comparison.xlsx'])
+        self.assertEqual([u['name'] for u in aggregate['units']], ['unit-a', 'unit-b'])
+        self.assertEqual([TECHNIQUES[i]['technique_id'] for i in aggregate['technique_idxs']], ['T1059', 'T1112', 'T1557'])
+
+        unit_a, unit_b = aggregate['units'][0]['coverage'], aggregate['units'][1]['coverage']
+        self.assertEqual(unit_a[0], 100.0)
+        self.assertEqual(unit_b[0], 50.0)
+        self.assertTrue(np.isnan(unit_a[2]) and np.isnan(unit_b[1]))
+        self.assertEqual((aggregate['min'][0], aggregate['max'][0], aggregate['mean'][0]), (50.0, 100.0, 75.0))
+        self.assertEqual((aggregate['min'][1], aggregate['max'][1]), (unit_a[1], unit_a[1]))
+
+    def test_aggregate_glob_with_different_domains(self):
+        Path('units/unit-b.yaml').write_text(Path('units/unit-b.yaml').read_text().replace('domain: enterprise-attack',
+                                                                                           'domain: ics-attack'))
+        output = StringIO()
+        with patch('data_source_mapping.load_attack_data') as load_attack_data, redirect_stdout(output):
+            self.assertIsNone(generate_aggregated_data_source_outputs('units/unit-*.yaml', None, False, None, {}))
+        load_attack_data.assert_not_called()
+        self.assertIn('different values for \'domain\'', output.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
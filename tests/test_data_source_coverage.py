@@ -0,0 +1,102 @@
+import unittest
+from unittest.mock import patch
+
+from data_source_coverage import (DATA_SOURCE_TYPE_ATTACK, DATA_SOURCE_TYPE_DETTECT, calculate_data_source_coverage,
+                                  calculate_visibility_scores, get_applicable_data_sources, get_available_data_sources,
+                                  get_data_source_id, rank_onboarding_candidates, simulate_onboarding)
+
+DATA_SOURCES_PLATFORMS = {'Windows': ['Process Creation', 'Command Execution', 'Windows Registry Key Creation'],
+                          'Linux': ['Process Creation', 'Command Execution'],
+                          'IaaS': ['Instance Creation']}
+DETTECT_DATA_SOURCES_PLATFORMS = {'Windows': ['Web [DeTT&CT data source]'], 'Linux': ['Web [DeTT&CT data source]'],
+                                  'IaaS': []}
+
+TECHNIQUES = [
+    {'technique_id': 'T1059', 'x_mitre_platforms': ['Windows', 'Linux'],
+     'data_components': ['Command Execution', 'Process Creation', 'Windows Registry Key Creation'],
+     'dettect_data_sources': ['Web [DeTT&CT data source]']},
+    {'technique_id': 'T1578', 'x_mitre_platforms': ['IaaS'], 'data_components': ['Instance Creation'],
+     'dettect_data_sources': []},
+    {'technique_id': 'T1001', 'x_mitre_platforms': ['Linux'], 'data_components': ['Instance Creation'],
+     'dettect_data_sources': []},
+]
+SYSTEMS = [{'applicable_to': 'Workstations', 'platform': ['Windows']},
+           {'applicable_to': 'Servers', 'platform': ['Linux']},
+           {'applicable_to': 'Cloud', 'platform': ['IaaS']}]
+MY_DS = {'Process Creation': {'data_source': [{'applicable_to': ['workstations', 'Servers']}]},
+         'Command Execution': {'data_source': [{'applicable_to': ['Workstations']}]},
+         'Web [DeTT&CT data source]': {'data_source': [{'applicable_to': ['SERVERS']}]},
+         'Instance Creation': {'data_source': [{'applicable_to': ['Servers']}]}}
+
+
+class DataSourceCoverageTest(unittest.TestCase):
+    def setUp(self):
+        with patch('data_source_coverage.get_data_sources_platforms', return_value=DATA_SOURCES_PLATFORMS), \
+                patch('data_source_coverage.get_dettect_data_sources_platforms', return_value=DETTECT_DATA_SOURCES_PLATFORMS):
+            self.coverage = calculate_data_source_coverage(TECHNIQUES, MY_DS, SYSTEMS, 'enterprise-attack')
+
+    def test_platform_match(self):
+        self.assertEqual(self.coverage['platform_match'].tolist(),
+                         [[True, True, False], [False, False, True], [False, True, False]])
+
+    def test_counts_and_percentages(self):
+        self.assertEqual(self.coverage['total'].tolist(), [[4, 3, 0], [0, 0, 1], [0, 0, 0]])
+        self.assertEqual(self.coverage['available'].tolist(), [[2, 2, 0], [0, 0, 0], [0, 0, 0]])
+        self.assertEqual(self.coverage['percentage'][0].tolist(), [50.0, (2.0 / 3.0) * 100, 0.0])
+        self.assertEqual(self.coverage['percentage'][1:].tolist(), [[0.0, 0.0, 0.0], [0.0, 0.0, 0.0]])
+
+    def test_data_source_names(self):
+        self.assertEqual(get_available_data_sources(self.coverage, 0, 0), ['Command Execution', 'Process Creation'])
+        self.assertEqual(get_available_data_sources(self.coverage, 0, 1), ['Process Creation', 'Web [DeTT&CT data source]'])
+        self.assertEqual(get_applicable_data_sources(self.coverage, 0, 1, DATA_SOURCE_TYPE_ATTACK),
+                         ['Command Execution', 'Process Creation'])
+        self.assertEqual(get_applicable_data_sources(self.coverage, 0, 1, DATA_SOURCE_TYPE_DETTECT),
+                         ['Web [DeTT&CT data source]'])
+        self.assertEqual(get_applicable_data_sources(self.coverage, 2, 1, DATA_SOURCE_TYPE_ATTACK), [])
+
+
+class OnboardingSimulationTest(unittest.TestCase):
+    def setUp(self):
+        self.patchers = [patch('data_source_coverage.get_data_sources_platforms', return_value=DATA_SOURCES_PLATFORMS),
+                         patch('data_source_coverage.get_dettect_data_sources_platforms', return_value=DETTECT_DATA_SOURCES_PLATFORMS)]
+        for patcher in self.patchers:
+            patcher.start()
+        self.coverage = calculate_data_source_coverage(TECHNIQUES, MY_DS, SYSTEMS, 'enterprise-attack')
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+
+    def _scores(self, coverage):
+        return calculate_visibility_scores(coverage['total'], coverage['available'], coverage['platform_match'])
+
+    def test_visibility_scores(self):
+        self.assertEqual(self._scores(self.coverage).tolist(), [[2, 2, -1], [-1, -1, 0], [-1, -1, -1]])
+
+    def test_rank_candidates(self):
+        ranked = rank_onboarding_candidates(self.coverage)
+        self.assertEqual([(r['data_source'], r['system_idx'], r['score_gain'], r['techniques_gained']) for r in ranked],
+                         [('Instance Creation', 2, 4, 1), ('Command Execution', 1, 2, 0),
+                          ('Web [DeTT&CT data source]', 0, 1, 0), ('Windows Registry Key Creation', 0, 1, 0)])
+        self.assertEqual(ranked[0]['techniques_improved'], [1])
+
+        ranked = rank_onboarding_candidates(self.coverage, [(get_data_source_id(self.coverage, 'instance creation'), 2)],
+                                            excluded=[1])
+        self.assertEqual((ranked[0]['techniques_affected'], ranked[0]['score_gain']), (0, 0))
+
+    def test_simulation_matches_full_recalculation(self):
+        changes = [(get_data_source_id(self.coverage, 'Windows Registry Key Creation'), 0),
+                   (get_data_source_id(self.coverage, 'Web [DeTT&CT data source]'), 0),
+                   (get_data_source_id(self.coverage, 'Command Execution'), 0)]  # already available
+        results, scores = simulate_onboarding(self.coverage, changes)
+        self.assertEqual([r['score_gain'] for r in results], [1, 1, 0])
+
+        my_ds = dict(MY_DS)
+        my_ds['Windows Registry Key Creation'] = {'data_source': [{'applicable_to': ['Workstations']}]}
+        my_ds['Web [DeTT&CT data source]'] = {'data_source': [{'applicable_to': ['Servers', 'Workstations']}]}
+        coverage = calculate_data_source_coverage(TECHNIQUES, my_ds, SYSTEMS, 'enterprise-attack')
+        self.assertEqual(scores.tolist(), self._scores(coverage).tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import os
+import shutil
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from unittest.mock import patch
+
+from attack_fixtures import SAMPLE_DATA, TempWorkingDirTestCase, technique
+import data_source_mapping
+from data_source_mapping import generate_data_source_outputs, generate_technique_administration_file
+from generic import init_yaml
+
+TECHNIQUES = [technique('T1059', ['Windows', 'Linux'], ['Command Execution', 'Process Creation', 'Script Execution']),
+              technique('T1112', ['Windows'], ['Windows Registry Key Modification']),
+              technique('T1578', ['IaaS'], ['Instance Creation'])]
+
+
+class DataSourceOutputsTest(TempWorkingDirTestCase):
+    def setUp(self):
+        super().setUp()
+        shutil.copy(os.path.join(SAMPLE_DATA, 'data-sources-endpoints.yaml'), 'data-sources.yaml')
+
+    def test_all_outputs_from_one_load(self):
+        with patch('data_source_mapping.load_attack_data', return_value=TECHNIQUES) as load_attack_data, \
+                patch('data_source_mapping.load_data_sources', wraps=data_source_mapping.load_data_sources) as load_data_sources, \
+                redirect_stdout(StringIO()):
+            generate_data_source_outputs('data-sources.yaml', None, False, layer=True, excel=True, graph=True, yaml=True,
+                                         layer_settings={})
+
+        self.assertEqual(load_attack_data.call_count, 1)
+        self.assertEqual(load_data_sources.call_count, 2)  # with and without the data quality filter
+        self.assertEqual(sorted(os.listdir('output')),
+                         ['data_sources.xlsx', 'data_sources_data-sources-sample.json', 'graph_data_sources.html',
+                          'techniques-administration-data-sources-sample.yaml'])
+
+        with open('output/techniques-administration-data-sources-sample.yaml') as f:
+            techniques = init_yaml(read_only=True).load(f)['techniques']
+        with patch('data_source_mapping.load_attack_data', return_value=TECHNIQUES):
+            expected = generate_technique_administration_file('data-sources.yaml', None, False, write_file=False)['techniques']
+        self.assertEqual([(t['technique_id'], [v['score_logbook'][0]['score'] for v in t['visibility']]) for t in techniques],
+                         [(t['technique_id'], [v['score_logbook'][0]['score'] for v in t['visibility']]) for t in expected])
+        self.assertEqual([t['technique_id'] for t in techniques], ['T1059', 'T1112'])
+
+    def test_no_attack_data_for_excel_and_graph(self):
+        with patch('data_source_mapping.load_attack_data') as load_attack_data, redirect_stdout(StringIO()):
+            generate_data_source_outputs('data-sources.yaml', None, False, excel=True, graph=True)
+
+        load_attack_data.assert_not_called()
+        self.assertEqual(sorted(os.listdir('output')), ['data_sources.xlsx', 'graph_data_sources.html'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,244 @@
+import os
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+from unittest.mock import patch
+
+import eql
+import simplejson
+
+from attack_fixtures import SAMPLE_DATA, TempWorkingDirTestCase
+import eql_yaml
+from eql_yaml import _prepare_yaml_file, _execute_eql_query, _events_to_yaml, techniques_search, data_source_search, eql_search_batch
+from constants import *
+from generic import load_yaml_file
+from group_mapping import generate_group_heat_map
+
+TECHNIQUES_FILE = os.path.join(SAMPLE_DATA, 'techniques-administration-endpoints.yaml')
+DATA_SOURCES_FILE = os.path.join(SAMPLE_DATA, 'data-sources-endpoints.yaml')
+GROUPS_FILE = os.path.join(SAMPLE_DATA, 'groups.yaml')
+
+ATTACK_DATA = {
+    DATA_TYPE_CUSTOM_TECH_BY_GROUP: [
+        {'group_id': 'G0006', 'name': 'APT1', 'aliases': ['APT1', 'Comment Crew'], 'technique_id': 'T1059',
+         'x_mitre_platforms': ['Windows', 'Linux'], 'x_mitre_domains': ['enterprise-attack']},
+        {'group_id': 'G0006', 'name': 'APT1', 'aliases': ['APT1', 'Comment Crew'], 'technique_id': 'T1003',
+         'x_mitre_platforms': ['Windows'], 'x_mitre_domains': ['enterprise-attack']},
+        {'group_id': 'G0007', 'name': 'APT28', 'aliases': None, 'technique_id': 'T1059',
+         'x_mitre_platforms': ['Windows'], 'x_mitre_domains': ['enterprise-attack']},
+        {'group_id': 'G0099', 'name': 'Mobile Group', 'aliases': None, 'technique_id': 'T1059',
+         'x_mitre_platforms': ['Android'], 'x_mitre_domains': ['mobile-attack']}],
+    DATA_TYPE_CUSTOM_TECH_IN_CAMPAIGN: [
+        {'campaign_id': 'C0001', 'name': 'Operation X', 'technique_id': 'T1059', 'x_mitre_platforms': ['Linux'],
+         'x_mitre_domains': ['enterprise-attack']}],
+    DATA_TYPE_CUSTOM_SOFTWARE_BY_GROUP: [
+        {'group_id': 'G0006', 'name': 'APT1', 'aliases': ['APT1', 'Comment Crew'], 'software_id': 'S0001',
+         'x_mitre_platforms': ['Windows'], 'x_mitre_domains': ['enterprise-attack']}],
+    DATA_TYPE_CUSTOM_SOFTWARE_IN_CAMPAIGN: [],
+    DATA_TYPE_STIX_ALL_GROUPS: [],
+    DATA_TYPE_STIX_ALL_CAMPAIGNS: [{'name': 'Operation X', 'external_references': [
+        {'source_name': 'mitre-attack', 'external_id': 'C0001'}]}],
+    DATA_TYPE_STIX_ALL_TECH_ENTERPRISE: []}
+
+
+def _score_history(count):
+    return [{'date': '2020-01-%02d' % (i + 1), 'score': i % 5, 'comment': ''} for i in range(count)]
+
+
+class EqlEventsTest(unittest.TestCase):
+    def test_events_reference_yaml_content(self):
+        content = {'techniques': [{'technique_id': 'T1059', 'technique_name': 'Command and Scripting Interpreter',
+                                   'detection': [], 'visibility': [{'applicable_to': ['all'], 'comment': '',
+                                                                    'score_logbook': _score_history(20)}]}]}
+        events = _prepare_yaml_file(content, ['visibility'], include_all_score_objs=True)[0]['visibility']
+
+        # the events are created lazily, and can be iterated multiple times (schema learning and the query)
+        self.assertNotIsInstance(events, list)
+        self.assertEqual(len(list(events)), 20)
+        first, second = list(events)[:2]
+        self.assertIsInstance(first, eql.Event)
+        self.assertEqual(first.data['visibility']['score_logbook']['date'], '2020-01-01')
+        self.assertEqual(second.data['visibility']['score_logbook']['date'], '2020-01-02')
+        self.assertNotIn('detection', first.data)
+        # values are shared with the parsed YAML content instead of copied per score_logbook entry
+        self.assertIs(first.data['visibility']['applicable_to'], second.data['visibility']['applicable_to'])
+
+        results = _execute_eql_query(events, 'techniques where visibility.score_logbook.score = 4')
+        self.assertEqual([r['visibility']['score_logbook']['date'] for r in results], ['2020-01-05', '2020-01-10',
+                                                                                      '2020-01-15', '2020-01-20'])
+
+    def test_techniques_search_all_scores(self):
+        with redirect_stdout(StringIO()):
+            yaml_content = techniques_search(TECHNIQUES_FILE, 'techniques where visibility.score_logbook.score >= 2',
+                                             include_all_score_objs=True)
+        techniques = {t['technique_id']: t for t in yaml_content['techniques']}
+        expected = {t['technique_id']: t for t in load_yaml_file(TECHNIQUES_FILE)['techniques']}
+
+        self.assertTrue(techniques)
+        for tech_id, tech in techniques.items():
+            self.assertEqual(tech['detection'], expected[tech_id]['detection'])
+            for v in tech['visibility']:
+                self.assertTrue(all(s['score'] >= 2 for s in v['score_logbook']))
+
+    def test_data_source_search(self):
+        with redirect_stdout(StringIO()):
+            yaml_content = data_source_search(DATA_SOURCES_FILE, 'data_sources where applicable_to = "Linux servers"')
+        self.assertEqual(len(yaml_content['data_sources']), 8)
+        for ds in yaml_content['data_sources']:
+            self.assertEqual([d['applicable_to'] for d in ds['data_source']], [['Linux servers']])
+
+
+class EqlEventsToYamlTest(unittest.TestCase):
+    def test_interleaved_events(self):
+        def event(tech_id, applicable_to, date):
+            return {'technique_id': tech_id, 'technique_name': 'name', 'visibility': {
+                'applicable_to': [applicable_to], 'comment': '', 'score_logbook': {'date': date, 'score': 1, 'comment': ''}}}
+        events = [event('T1059', 'servers', '2020-01-01'), event('T1112', 'servers', '2020-01-01'),
+                  event('T1059', 'workstations', '2020-01-01'), event('T1059', 'servers', '2020-02-01'),
+                  event('T1059', 'workstations', '2020-02-01')]
+
+        techniques = _events_to_yaml(events, 'visibility')
+        self.assertEqual([t['technique_id'] for t in techniques], ['T1059', 'T1112'])
+        self.assertEqual([(v['applicable_to'], [s['date'].month for s in v['score_logbook']]) for v in techniques[0]['visibility']],
+                         [(['servers'], [1, 2]), (['workstations'], [1, 2])])
+
+
+class EqlCacheTest(unittest.TestCase):
+    def setUp(self):
+        eql_yaml._eql_schema_cache.clear()
+        eql_yaml._eql_query_cache.clear()
+        eql_yaml._native_filter_cache.clear()
+
+    def test_schema_and_query_cache(self):
+        query = 'techniques where arrayContains(visibility.applicable_to, "Windows workstations")'
+        with patch('eql.Schema.learn', wraps=eql.Schema.learn) as learn, \
+                patch('eql.parse_query', wraps=eql.parse_query) as parse_query, redirect_stdout(StringIO()):
+            first = techniques_search(TECHNIQUES_FILE, query, 'techniques where arrayContains(detection.location, "EDR")')
+            second = techniques_search(TECHNIQUES_FILE, query, 'techniques where arrayContains(detection.location, "EDR")')
+            techniques_search(TECHNIQUES_FILE, query, include_all_score_objs=True)
+
+        self.assertEqual(first, second)
+        # visibility and detection, and visibility with all score objects
+        self.assertEqual(learn.call_count, 3)
+        # the same, plus one attempt per object type to compile the query into a native filter
+        self.assertEqual(parse_query.call_count, 3 + 2)
+
+    def test_batch(self):
+        queries = ['techniques where visibility.score_logbook.score >= 3', 'techniques where technique_id = "T1059"',
+                   'techniques where unknown_field = 1', 'techniques where visibility.score_logbook.score > 10']
+        with redirect_stdout(StringIO()):
+            results = eql_search_batch(TECHNIQUES_FILE, queries, 'visibility')
+            expected = [techniques_search(TECHNIQUES_FILE, q) for q in queries[:2]]
+
+        self.assertEqual(results[:2], expected)
+        self.assertEqual([t['technique_id'] for t in results[1]['techniques']], ['T1059'])
+        self.assertEqual(results[2:], [None, None])
+
+    def test_batch_overlapping_results(self):
+        queries = ['data_sources where applicable_to = "Linux servers"', 'data_sources where data_source_name = "Process Creation"']
+        with redirect_stdout(StringIO()):
+            linux, process_creation = eql_search_batch(DATA_SOURCES_FILE, queries, 'data_sources')
+
+        # the Process Creation event for Linux servers is a result of both queries
+        self.assertIn('Process Creation', [ds['data_source_name'] for ds in linux['data_sources']])
+        self.assertEqual([d['applicable_to'] for d in process_creation['data_sources'][0]['data_source']],
+                         [['Windows workstations'], ['Linux servers']])
+
+
+class EqlNativeFilterTest(unittest.TestCase):
+    VISIBILITY_QUERIES = ['techniques where visibility.score_logbook.score >= 2',
+                          'techniques where visibility.score_logbook.score in (1, 3) and technique_id != "t1059"',
+                          'techniques where not (visibility.score_logbook.score <= 2 or visibility.score_logbook.date >= "2021-09-01")',
+                          'techniques where technique_id in ("T1059", "t1112") or visibility.score_logbook.auto_generated == true',
+                          'visibility.score_logbook.comment == "" and technique_name > "m"']
+    DATA_SOURCE_QUERIES = ['data_sources where applicable_to in (\'Linux servers\')',
+                           'data_sources where applicable_to == "windows workstations" and data_quality.retention >= 1',
+                           'data_sources where available_for_data_analytics == true and not data_source_name == "Process Creation"']
+
+    def setUp(self):
+        eql_yaml._eql_schema_cache.clear()
+        eql_yaml._native_filter_cache.clear()
+
+    def _search(self, filename, queries, obj_type, native):
+        with redirect_stdout(StringIO()):
+            if native:
+                return eql_search_batch(filename, queries, obj_type, include_all_score_objs=True)
+            with patch('eql_yaml._compile_native_filter', return_value=None):
+                return eql_search_batch(filename, queries, obj_type, include_all_score_objs=True)
+
+    def test_native_filter_matches_eql(self):
+        for filename, queries, obj_type in [(TECHNIQUES_FILE, self.VISIBILITY_QUERIES, 'visibility'),
+                                            (DATA_SOURCES_FILE, self.DATA_SOURCE_QUERIES, 'data_sources')]:
+            with patch('eql.Schema.learn', wraps=eql.Schema.learn) as learn:
+                native = self._search(filename, queries, obj_type, native=True)
+            learn.assert_not_called()
+            self.assertTrue(all(native))
+            self.assertEqual(native, self._search(filename, queries, obj_type, native=False))
+
+    def test_unsupported_queries(self):
+        events = _prepare_yaml_file(TECHNIQUES_FILE, ['detection'], include_all_score_objs=False)[0]['detection']
+        for query in ['techniques where wildcard(technique_id, "T10*")', 'techniques where arrayContains(detection.location, "EDR")',
+                      'techniques where detection.score_logbook.score == "1"', 'techniques where visibility.score_logbook.score >= 1',
+                      'techniques where detection.score_logbook.auto_generated == true', 'data_sources where technique_id == "T1059"',
+                      'techniques where technique_id == "T1059" | head 1', 'techniques where 1 <= detection.score_logbook.score']:
+            self.assertIsNone(eql_yaml._compile_native_filter(events, query), query)
+
+
+class EqlGroupSearchTest(TempWorkingDirTestCase):
+    def setUp(self):
+        eql_yaml._group_event_store.clear()
+        super().setUp()
+        os.mkdir('cache')
+
+    def _search(self, filename, query, domain='enterprise-attack'):
+        with redirect_stdout(StringIO()):
+            results = eql_yaml.groups_search([filename], query, domain)
+        if results is not None:
+            return sorted((e.get('group_id', e.get('campaign_id')), e['technique_id'], e['platform']) for e in results)
+
+    def test_attack_groups_search(self):
+        with patch('eql_yaml.load_attack_data', side_effect=ATTACK_DATA.get), \
+                patch('eql_yaml._attack_groups_to_events', wraps=eql_yaml._attack_groups_to_events) as to_events:
+            linux = self._search(None, 'groups where platform == "Linux" and technique_id == "T1059" and weight >= 1')
+            software = self._search(None, 'groups where arrayContains(software_id, "S0001")')
+            aliases = self._search(None, 'groups where arrayContains(aliases, "comment crew") and platform == "Windows"')
+            mobile = self._search(None, 'groups where technique_id == "T1059"', 'mobile-attack')
+            self.assertIsNone(self._search(None, 'groups where weight >= 2'))
+
+        self.assertEqual(linux, [('C0001', 'T1059', 'Linux'), ('G0006', 'T1059', 'Linux')])
+        self.assertEqual(software, [('G0006', 'T1003', 'Windows'), ('G0006', 'T1059', 'Linux'), ('G0006', 'T1059', 'Windows')])
+        self.assertEqual(aliases, [('G0006', 'T1003', 'Windows'), ('G0006', 'T1059', 'Windows')])
+        self.assertEqual(mobile, [('G0099', 'T1059', 'Android')])
+        # the events are built once per ATT&CK snapshot and domain
+        self.assertEqual(to_events.call_count, 2)
+
+    def test_group_file_heat_map(self):
+        with patch('group_mapping.load_attack_data', side_effect=ATTACK_DATA.get), redirect_stdout(StringIO()):
+            generate_group_heat_map([GROUPS_FILE], None, None, 'group', None, False, False, None, None, False,
+                                    'output/search', False, None, None, {}, False, False,
+                                    'groups where campaign == "scenario 1" and technique_id in ("T1055", "T1033", "T1136.003")')
+            self.assertIsNone(generate_group_heat_map([GROUPS_FILE], None, None, 'group', None, False, False, None, None,
+                                                      False, 'output/none', False, None, None, {}, False, False,
+                                                      'groups where weight > 1'))
+
+        with open('output/search.json') as layer_file:
+            layer = simplejson.load(layer_file)
+        self.assertEqual(sorted(t['techniqueID'] for t in layer['techniques']), ['T1033', 'T1055'])
+        self.assertEqual(os.listdir('output'), ['search.json'])
+
+    def test_group_file_and_campaigns_heat_map(self):
+        with patch('group_mapping.load_attack_data', side_effect=ATTACK_DATA.get), \
+                patch('eql_yaml.load_attack_data', side_effect=ATTACK_DATA.get), redirect_stdout(StringIO()):
+            # the groups within the file and the ATT&CK campaign (Linux only) are both searched
+            generate_group_heat_map([GROUPS_FILE], ['C0001'], None, 'group', ['Windows', 'Linux'], False, False, None, None, False,
+                                    'output/search', False, None, None, {}, False, False,
+                                    'groups where campaign in ("scenario 1", "operation x") and technique_id in ("T1055", "T1059")')
+
+        with open('output/search.json') as layer_file:
+            layer = simplejson.load(layer_file)
+        self.assertEqual(sorted(t['techniqueID'] for t in layer['techniques']), ['T1055', 'T1059'])
+
+
+if __name__ == '__main__':
+    unittest.main()
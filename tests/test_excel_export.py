@@ -0,0 +1,40 @@
+import os
+import unittest
+import zipfile
+from contextlib import redirect_stdout
+from io import StringIO
+from unittest.mock import patch
+
+from attack_fixtures import SAMPLE_DATA, TempWorkingDirTestCase, technique
+import technique_mapping
+from generic import load_techniques
+from technique_mapping import export_techniques_list_to_excel
+
+TECHNIQUES_FILE = os.path.join(SAMPLE_DATA, 'techniques-administration-endpoints.yaml')
+
+TECHNIQUES = [technique('T1059', ['Windows', 'Linux'], [], name='Command and Scripting Interpreter'),
+              technique('T1112', ['Windows'], [], name='Modify Registry', tactics=['defense-evasion', 'persistence'])]
+
+
+class TechniqueExcelExportTest(TempWorkingDirTestCase):
+    def test_streaming_export(self):
+        output = StringIO()
+        with patch('technique_mapping.load_attack_data', return_value=TECHNIQUES), \
+                patch('technique_mapping.get_technique', wraps=technique_mapping.get_technique) as get_technique, \
+                redirect_stdout(output):
+            export_techniques_list_to_excel(TECHNIQUES_FILE, None, False)
+
+        # the technique name and tactics are looked up once per technique, not for every detection and visibility row
+        self.assertEqual(get_technique.call_count, len(load_techniques(TECHNIQUES_FILE)[0]))
+        self.assertIn('File written:   output/techniques.xlsx', output.getvalue())
+
+        with zipfile.ZipFile('output/techniques.xlsx') as z:
+            # constant memory mode writes the strings inline instead of in a shared strings table
+            self.assertNotIn('xl/sharedStrings.xml', z.namelist())
+            detections = z.read('xl/worksheets/sheet1.xml').decode()
+        self.assertIn('<t>Modify Registry</t>', detections)
+        self.assertIn('<t>Defense-evasion, Persistence</t>', detections)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import os
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+from unittest.mock import patch
+
+import simplejson
+
+from attack_fixtures import GROUP_ATTACK_DATA, TempWorkingDirTestCase
+import group_mapping
+from constants import *
+from group_mapping import generate_group_heat_maps_batch, load_batch_manifest
+
+
+MANIFEST = """
+defaults:
+  platform: Windows
+  layer_settings:
+    showMetadata: False
+layers:
+  - groups: [G0001, G0002]
+    platform: [Windows, Linux]
+    expand: [groups, platform]
+  - groups: G0001
+    overlay: G0002
+    platform: [Windows, Linux]
+    output_filename: overlay
+  - groups: G0004
+    output_filename: overlay
+"""
+
+
+class GroupBatchTest(TempWorkingDirTestCase):
+    def setUp(self):
+        group_mapping._incidence_matrices.clear()
+        group_mapping._name_indexes.clear()
+        super().setUp()
+        os.mkdir('cache')
+        Path('manifest.yaml').write_text(MANIFEST)
+        patcher = patch('group_mapping.load_attack_data', side_effect=GROUP_ATTACK_DATA.get)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_manifest(self):
+        layers = load_batch_manifest('manifest.yaml', {'showAggregateScores': 'False', 'showMetadata': 'True'})['layers']
+
+        self.assertEqual([(l['groups'], l['platform']) for l in layers],
+                         [(['G0001'], ['Windows']), (['G0001'], ['Linux']), (['G0002'], ['Windows']),
+                          (['G0002'], ['Linux']), (['G0001'], ['Windows', 'Linux']), (['G0004'], ['Windows'])])
+        self.assertEqual(layers[0]['layer_settings'], {'showAggregateScores': 'False', 'showMetadata': 'False'})
+        self.assertNotIn('expand', layers[0])
+
+        Path('invalid.yaml').write_text('layers:\n  - groups: G0001\n    expand: [campaigns]\n')
+        output = StringIO()
+        with redirect_stdout(output):
+            self.assertIsNone(load_batch_manifest('invalid.yaml', {}))
+        self.assertIn('[!] The key-value pair \'expand\'', output.getvalue())
+
+    def test_batch(self):
+        Path('output/overlay.json').write_text('{}')
+        with redirect_stdout(StringIO()):
+            index = generate_group_heat_maps_batch('manifest.yaml', {}, None, False, False)
+
+        # the filenames are unique within the batch and existing files are not overwritten
+        files = [l['file'] for l in index['layers']]
+        self.assertEqual(files, ['output/attack_g0001-windows.json', 'output/attack_g0001-linux.json',
+                                 'output/attack_g0002-windows.json', 'output/attack_g0002-linux.json', 'output/overlay_1.json', None])
+        # G0004 is not part of the enterprise domain
+        self.assertEqual([l['status'] for l in index['layers']], ['written'] * 5 + ['failed'])
+        self.assertEqual(index['layers'][5]['output_filename'], 'output/overlay_2.json')
+        self.assertEqual(Path('output/overlay.json').read_text(), '{}')
+
+        with open('output/attack_g0001-linux.json') as layer_file:
+            layer = simplejson.load(layer_file)
+        self.assertEqual([t['techniqueID'] for t in layer['techniques']], ['T1059'])
+        with open('output/group_batch_index_manifest.json') as index_file:
+            self.assertEqual(simplejson.load(index_file), index)
+
+    def test_shared_context(self):
+        attack_data = dict((data_type, GROUP_ATTACK_DATA.get(data_type)) for data_type in group_mapping._BATCH_ATTACK_DATA_TYPES)
+        name_index = group_mapping._get_name_index(DATA_TYPE_STIX_ALL_GROUPS)
+        matrix = group_mapping._get_incidence_matrix('group')
+        group_mapping._incidence_matrices.clear()
+        group_mapping._name_indexes.clear()
+
+        # the structures passed to the worker processes are used instead of building them again
+        with patch('group_mapping.set_attack_data') as set_attack_data, \
+                patch('group_mapping._build_name_index') as build_index, \
+                patch('group_mapping._build_incidence_matrix') as build_matrix:
+            group_mapping._init_batch_context(attack_data, {DATA_TYPE_STIX_ALL_GROUPS: name_index}, {'group': matrix}, False)
+            self.assertIs(group_mapping._get_name_index(DATA_TYPE_STIX_ALL_GROUPS), name_index)
+            self.assertIs(group_mapping._get_incidence_matrix('group'), matrix)
+        set_attack_data.assert_called_once_with(attack_data)
+        build_index.assert_not_called()
+        build_matrix.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from unittest.mock import patch
+
+from attack_fixtures import GROUP_ATTACK_DATA
+import group_mapping
+from constants import *
+
+
+class GroupIncidenceMatrixTest(unittest.TestCase):
+    def setUp(self):
+        group_mapping._incidence_matrices.clear()
+        group_mapping._name_indexes.clear()
+        patcher = patch('group_mapping.load_attack_data', side_effect=GROUP_ATTACK_DATA.get)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_group_techniques(self):
+        with patch('group_mapping._build_incidence_matrix', wraps=group_mapping._build_incidence_matrix) as build_matrix:
+            groups_all = group_mapping._get_group_techniques(['all'], ['Windows', 'Linux'], None, 'enterprise-attack')
+            groups_linux = group_mapping._get_group_techniques(['all'], ['Linux'], None, 'enterprise-attack')
+            with redirect_stdout(StringIO()):
+                groups_g0001 = group_mapping._get_group_techniques(['group g0001', 'g0004'], ['Windows'], None,
+                                                                   'enterprise-attack')
+        # the matrix is built once per ATT&CK snapshot
+        self.assertEqual(build_matrix.call_count, 1)
+
+        # the groups are in the order of their first technique, and techniques without a platform are on 'Windows'
+        self.assertEqual(list(groups_all), ['G0002', 'G0001', 'G0003'])
+        self.assertEqual(groups_all['G0001'], {'group_name': 'Group G0001', 'techniques': {'T1059', 'T1003'},
+                                               'weight': {'T1059': 1, 'T1003': 1}})
+        self.assertEqual(groups_all['G0003']['techniques'], {'T1566'})
+        self.assertEqual({k: v['techniques'] for k, v in groups_linux.items()}, {'G0002': {'T1059'}, 'G0001': {'T1059'}})
+        self.assertEqual(groups_g0001, -1)  # G0004 is not part of the enterprise domain
+
+        campaigns = group_mapping._get_campaign_techniques(['operation x'], ['Linux'], 'enterprise-attack')
+        self.assertEqual(campaigns, {'C0001': {'group_name': 'Operation X', 'techniques': {'T1105'}, 'weight': {'T1105': 1}}})
+
+    def test_software_techniques(self):
+        software = group_mapping._get_software_techniques(['all'], ['all'], ['Windows', 'Linux'], 'enterprise-attack')
+        # software without a platform is skipped
+        self.assertEqual(software, {'G0001': {'group_name': 'Group G0001', 'techniques': {'T1105', 'T1059'},
+                                              'weight': {'T1105': 1, 'T1059': 1}}})
+        self.assertEqual(group_mapping._get_software_techniques(['g0001'], None, ['Windows'], 'enterprise-attack'), {})
+
+    def test_technique_count(self):
+        groups = {'CG0001': {'group_name': 'Red team', 'techniques': {'T1059', 'T1003'}, 'weight': {'T1059': 3, 'T1003': 1}},
+                  'G0001': {'group_name': 'Group G0001', 'techniques': {'T1059'}, 'weight': {'T1059': 1}}}
+        software = {'G0001': {'group_name': 'Group G0001', 'techniques': {'T1059', 'T1105'}}}
+        techniques, max_count = group_mapping._get_technique_count(groups, {}, software, OVERLAY_TYPE_GROUP, None)
+
+        self.assertEqual(max_count, 4)
+        self.assertEqual(techniques, {'T1059': {'groups': {'CG0001', 'G0001'}, 'count': 4},
+                                      'T1003': {'groups': {'CG0001'}, 'count': 1},
+                                      'T1105': {'count': 0, 'groups': {'G0001'}}})
+        self.assertIsInstance(techniques['T1059']['count'], int)
+
+
+if __name__ == '__main__':
+    unittest.main()
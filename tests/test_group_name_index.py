@@ -0,0 +1,74 @@
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from unittest.mock import patch
+
+import group_mapping
+from constants import *
+from group_mapping import lookup_attack_ids, lookup_attack_ids_by_prefix, get_similar_attack_names
+
+
+def _ext_ref(attack_id):
+    return [{'source_name': 'mitre-attack', 'external_id': attack_id}]
+
+
+ATTACK_DATA = {
+    DATA_TYPE_STIX_ALL_GROUPS: [
+        {'name': 'APT28', 'aliases': ['APT28', 'Fancy Bear', 'Sofacy'], 'external_references': _ext_ref('G0007')},
+        {'name': 'APT29', 'aliases': ['APT29', 'Cozy Bear'], 'external_references': _ext_ref('G0016')},
+        {'name': 'Lazarus Group', 'aliases': ['Lazarus Group', 'HIDDEN COBRA'], 'external_references': _ext_ref('G0032')},
+        {'name': 'Shared', 'aliases': ['Cozy Bear'], 'external_references': _ext_ref('G0099')}],
+    DATA_TYPE_STIX_ALL_CAMPAIGNS: [
+        {'name': 'Operation Wocao', 'aliases': ['Operation Wocao'], 'external_references': _ext_ref('C0014')}],
+    DATA_TYPE_STIX_ALL_SOFTWARE: [
+        {'name': 'Mimikatz', 'x_mitre_aliases': ['Mimikatz'], 'external_references': _ext_ref('S0002')},
+        {'name': 'Cobalt Strike', 'external_references': _ext_ref('S0154')}],
+    DATA_TYPE_CUSTOM_TECH_BY_SOFTWARE: [
+        {'software_id': 'S0002', 'technique_id': 'T1003'}, {'software_id': 'S0154', 'technique_id': 'T1059'}]}
+
+
+class GroupNameIndexTest(unittest.TestCase):
+    def setUp(self):
+        group_mapping._name_indexes.clear()
+        patcher = patch('group_mapping.load_attack_data', side_effect=ATTACK_DATA.get)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_lookup(self):
+        with patch('group_mapping._build_name_index', wraps=group_mapping._build_name_index) as build_index:
+            self.assertEqual(lookup_attack_ids(DATA_TYPE_STIX_ALL_GROUPS, ['g0007']), {'G0007'})
+            self.assertEqual(lookup_attack_ids(DATA_TYPE_STIX_ALL_GROUPS, [' fancy   BEAR ', 'lazarus group']), {'G0007', 'G0032'})
+            self.assertEqual(lookup_attack_ids(DATA_TYPE_STIX_ALL_GROUPS, ['cozy bear']), {'G0016', 'G0099'})
+            self.assertEqual(lookup_attack_ids(DATA_TYPE_STIX_ALL_GROUPS, ['unknown']), set())
+            self.assertEqual(lookup_attack_ids(DATA_TYPE_STIX_ALL_CAMPAIGNS, ['operation wocao']), {'C0014'})
+            self.assertEqual(lookup_attack_ids(DATA_TYPE_STIX_ALL_SOFTWARE, ['s0154', 'mimikatz']), {'S0002', 'S0154'})
+        # the index is built once per data type and ATT&CK snapshot
+        self.assertEqual(build_index.call_count, 3)
+
+    def test_prefix_and_similar_names(self):
+        self.assertEqual(lookup_attack_ids_by_prefix(DATA_TYPE_STIX_ALL_GROUPS, 'apt'), {'APT28': {'G0007'}, 'APT29': {'G0016'}})
+        self.assertEqual(lookup_attack_ids_by_prefix(DATA_TYPE_STIX_ALL_GROUPS, 'g00'),
+                         {'G0007': {'G0007'}, 'G0016': {'G0016'}, 'G0032': {'G0032'}, 'G0099': {'G0099'}})
+        self.assertEqual(lookup_attack_ids_by_prefix(DATA_TYPE_STIX_ALL_GROUPS, 'zzz'), {})
+        self.assertEqual(get_similar_attack_names(DATA_TYPE_STIX_ALL_GROUPS, 'laza'), ['Lazarus Group'])
+        self.assertEqual(get_similar_attack_names(DATA_TYPE_STIX_ALL_GROUPS, 'fancy baer'), ['Fancy Bear', 'Cozy Bear'])
+
+        output = StringIO()
+        with redirect_stdout(output):
+            self.assertFalse(group_mapping._are_groups_found(set(), ['sofacyy']))
+        self.assertEqual(output.getvalue(), '[!] Unknown ATT&CK group: sofacyy (did you mean: Sofacy?)\n')
+
+    def test_software_from_group_file(self):
+        content = {'groups': [{'group_name': 'Red team', 'technique_id': ['T1566'], 'software_id': ['mimikatz', 'S0154', 'S9999'],
+                               'enabled': True}]}
+        output = StringIO()
+        with patch('group_mapping.load_yaml_file', return_value=content), patch('os.path.isfile', return_value=True), \
+                redirect_stdout(output):
+            groups_dict = group_mapping._get_software_techniques('groups.yaml', None, ['Windows'], 'enterprise-attack')
+
+        self.assertEqual([v['techniques'] for v in groups_dict.values()], [{'T1003', 'T1059'}])
+        self.assertEqual(output.getvalue(), '[!] Unknown ATT&CK software ID: S9999\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
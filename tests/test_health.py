@@ -1,9 +1,18 @@
+import functools
 import os
+import shutil
 import tempfile
 import unittest
+from contextlib import redirect_stdout
+from io import StringIO
 from pathlib import Path
+from unittest.mock import patch
 
-from health import _is_file_modified, _update_health_state_cache
+import health
+from constants import FILE_TYPE_DATA_SOURCE_ADMINISTRATION, FILE_TYPE_TECHNIQUE_ADMINISTRATION
+from health import _get_cache_file, _is_file_modified, _update_health_state_cache, check_yaml_file_health
+
+SAMPLE_DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sample-data')
 
 
 class HealthCacheFilenameTest(unittest.TestCase):
@@ -17,8 +26,9 @@ class HealthCacheFilenameTest(unittest.TestCase):
 
                 self.assertTrue(_is_file_modified('my.yaml'))
 
-                self.assertTrue(Path('cache/last-modified_my').exists())
-                self.assertFalse(Path('cache/last-modified_').exists())
+                cache_files = os.listdir('cache')
+                self.assertEqual(len(cache_files), 1)
+                self.assertTrue(cache_files[0].startswith('last-modified_my_'))
             finally:
                 os.chdir(cwd)
 
@@ -32,11 +42,95 @@ class HealthCacheFilenameTest(unittest.TestCase):
 
                 _update_health_state_cache('normal.yaml', True)
 
-                self.assertTrue(Path('cache/last-error-state_normal').exists())
-                self.assertFalse(Path('cache/last-error-state_nor').exists())
+                cache_files = os.listdir('cache')
+                self.assertEqual(len(cache_files), 1)
+                self.assertTrue(cache_files[0].startswith('last-error-state_normal_'))
+            finally:
+                os.chdir(cwd)
+
+    def test_same_file_name_in_other_directory(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cwd = os.getcwd()
+            os.chdir(tmpdir)
+            try:
+                Path('cache').mkdir()
+                Path('a').mkdir()
+                Path('b').mkdir()
+                Path('a/my.yaml').write_text('content')
+                Path('b/my.yaml').write_text('content')
+
+                self.assertNotEqual(_get_cache_file('last-modified_', 'a/my.yaml'),
+                                    _get_cache_file('last-modified_', 'b/my.yaml'))
+                self.assertEqual(_get_cache_file('last-modified_', 'a/my.yaml'),
+                                 _get_cache_file('last-modified_', os.path.abspath('a/my.yaml')))
+                self.assertTrue(_is_file_modified('a/my.yaml'))
+                self.assertTrue(_is_file_modified('b/my.yaml'))
             finally:
                 os.chdir(cwd)
 
 
+class IncrementalHealthCheckTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmpdir.name)
+        os.mkdir('cache')
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmpdir.cleanup()
+
+    def _check(self, filename, file_type, check_function_name):
+        checked = []
+        check_function = getattr(health, check_function_name)
+
+        @functools.wraps(check_function)
+        def _counting_check(*args):
+            checked.append(args[0])
+            return check_function(*args)
+
+        output = StringIO()
+        with patch.object(health, check_function_name, _counting_check), redirect_stdout(output):
+            check_yaml_file_health(filename, file_type, True)
+        return checked, output.getvalue()
+
+    def _edit(self, filename, old, new):
+        content = Path(filename).read_text()
+        self.assertIn(old, content)
+        Path(filename).write_text(content.replace(old, new, 1))
+
+    def test_only_changed_techniques_are_checked(self):
+        filename = 'techniques.yaml'
+        shutil.copy(os.path.join(SAMPLE_DATA, 'techniques-administration-endpoints.yaml'), filename)
+        self._edit(filename, 'score: 2', 'score: 9')
+
+        checked, output = self._check(filename, FILE_TYPE_TECHNIQUE_ADMINISTRATION, '_check_health_technique')
+        self.assertGreater(len(checked), 100)
+        self.assertIn('[!] Technique ID: T1001 has an INVALID visibility score', output)
+
+        # cached results are still reported
+        checked, cached_output = self._check(filename, FILE_TYPE_TECHNIQUE_ADMINISTRATION, '_check_health_technique')
+        self.assertEqual(checked, [])
+        self.assertEqual(cached_output, output)
+
+        self._edit(filename, 'score: 9', 'score: 3')
+        checked, output = self._check(filename, FILE_TYPE_TECHNIQUE_ADMINISTRATION, '_check_health_technique')
+        self.assertEqual(checked, ['T1001'])
+        self.assertEqual(output, '')
+
+    def test_only_changed_data_sources_are_checked(self):
+        filename = 'data-sources.yaml'
+        shutil.copy(os.path.join(SAMPLE_DATA, 'data-sources-endpoints.yaml'), filename)
+
+        checked, output = self._check(filename, FILE_TYPE_DATA_SOURCE_ADMINISTRATION, '_check_health_data_source')
+        self.assertGreater(len(checked), 10)
+        self.assertEqual(output, '')
+
+        self._edit(filename, 'retention: 1', 'retention: 9')
+        checked, output = self._check(filename, FILE_TYPE_DATA_SOURCE_ADMINISTRATION, '_check_health_data_source')
+        self.assertEqual(len(checked), 1)
+        self.assertIn('has an INVALID data quality score for the dimension \'retention\': 9', output)
+
+
 if __name__ == '__main__':
     unittest.main()
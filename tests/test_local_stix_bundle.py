@@ -0,0 +1,138 @@
+import json
+import os
+import tempfile
+import unittest
+import uuid
+from unittest.mock import patch
+
+from stix2 import CompositeDataSource, MemorySource
+
+import generic
+from attack_taxii_client import attack_client
+from constants import DATA_TYPE_STIX_ALL_GROUPS, DATA_TYPE_STIX_ALL_TECH
+from generic import _get_attack_data_from_source
+
+TIMESTAMP = '2023-04-01T10:00:00.000Z'
+
+
+def _stix_id(stix_type, name):
+    return stix_type + '--' + str(uuid.uuid5(uuid.NAMESPACE_URL, name))
+
+
+def _stix_object(stix_type, name, attack_id=None, source_name='mitre-attack', **kwargs):
+    obj = {'type': stix_type, 'spec_version': '2.1', 'id': _stix_id(stix_type, name), 'created': TIMESTAMP,
+           'modified': TIMESTAMP, 'name': name}
+    if attack_id:
+        obj['external_references'] = [{'source_name': source_name, 'external_id': attack_id}]
+    obj.update(kwargs)
+    return obj
+
+
+def _relationship(relationship_type, source, target, **kwargs):
+    obj = {'type': 'relationship', 'spec_version': '2.1', 'created': TIMESTAMP, 'modified': TIMESTAMP,
+           'id': _stix_id('relationship', source['id'] + relationship_type + target['id']),
+           'relationship_type': relationship_type, 'source_ref': source['id'], 'target_ref': target['id']}
+    obj.update(kwargs)
+    return obj
+
+
+def _enterprise_objects():
+    dc = _stix_object('x-mitre-data-component', 'Process Creation')
+    analytic = _stix_object('x-mitre-analytic', 'Analytic 1',
+                            x_mitre_log_source_references=[{'x_mitre_data_component_ref': dc['id']}])
+    strategy = _stix_object('x-mitre-detection-strategy', 'Strategy 1', x_mitre_analytic_refs=[analytic['id']],
+                            revoked=True)
+    tech = _stix_object('attack-pattern', 'Command and Scripting Interpreter', 'T1059', x_mitre_platforms=['Linux'],
+                        kill_chain_phases=[{'kill_chain_name': 'mitre-attack', 'phase_name': 'execution'}])
+    deprecated_tech = _stix_object('attack-pattern', 'Old technique', 'T1999', x_mitre_deprecated=True)
+    group = _stix_object('intrusion-set', 'APT1', 'G0006', x_mitre_domains=['enterprise-attack'])
+    malware = _stix_object('malware', 'Evil', 'S0001', is_family=True, x_mitre_platforms=['Windows'])
+    return [dc, analytic, strategy, tech, deprecated_tech, group, malware,
+            _relationship('detects', strategy, tech),
+            _relationship('uses', group, tech),
+            _relationship('uses', group, malware, revoked=True),
+            _relationship('uses', malware, tech)]
+
+
+def _ics_objects():
+    return [_stix_object('attack-pattern', 'Modify Parameter', 'T0836', source_name='mitre-ics-attack'),
+            _stix_object('intrusion-set', 'APT1', 'G0006', x_mitre_domains=['enterprise-attack'])]
+
+
+class LocalStixBundleTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        bundles = {'enterprise-attack': _enterprise_objects(), 'mobile-attack': [], 'ics-attack': _ics_objects()}
+        for domain, objects in bundles.items():
+            os.mkdir(os.path.join(self.tmpdir.name, domain))
+            with open(os.path.join(self.tmpdir.name, domain, domain + '.json'), 'w') as f:
+                json.dump({'type': 'bundle', 'id': 'bundle--' + str(uuid.uuid4()), 'objects': objects}, f)
+        with open(os.path.join(self.tmpdir.name, 'index.json'), 'w') as f:
+            json.dump({}, f)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _stix2_client(self):
+        # reference client based on stix2 MemorySources
+        client = attack_client.__new__(attack_client)
+        sources = []
+        for domain in ['enterprise-attack', 'mobile-attack', 'ics-attack']:
+            source = MemorySource(version='2.1')
+            source.load_from_file(os.path.join(self.tmpdir.name, domain, domain + '.json'))
+            sources.append(source)
+        client.enterprise_source, client.mobile_source, client.ics_source = sources
+        client.composite_source = CompositeDataSource()
+        client.composite_source.add_data_sources(sources)
+        return client
+
+    def test_same_results_as_stix2_sources(self):
+        raw_client = attack_client(local_path=self.tmpdir.name)
+        stix2_client = self._stix2_client()
+
+        for data_type in [DATA_TYPE_STIX_ALL_TECH, DATA_TYPE_STIX_ALL_GROUPS]:
+            self.assertEqual(_get_attack_data_from_source(raw_client, data_type),
+                             _get_attack_data_from_source(stix2_client, data_type))
+
+        for method, args in [('get_relationships', [None]), ('get_software', []), ('get_ics_techniques', []),
+                             ('get_techniques_detection_strategy_relations', []),
+                             ('get_detection_strategies', [False]), ('get_detection_strategies', [True])]:
+            raw = getattr(raw_client, method)(*args)
+            reference = getattr(stix2_client, method)(*args)
+            self.assertEqual(sorted(obj['id'] for obj in raw), sorted(obj['id'] for obj in reference), method)
+            for obj in raw:
+                self.assertIsInstance(obj, dict)
+
+    def test_technique_dict_schema(self):
+        techniques = _get_attack_data_from_source(attack_client(local_path=self.tmpdir.name), DATA_TYPE_STIX_ALL_TECH)
+        tech = [t for t in techniques if t['technique_id'] == 'T1059'][0]
+
+        self.assertEqual(tech['data_components'], ['Process Creation'])
+        self.assertEqual(tech['created'].year, 2023)
+        self.assertNotIn('T1999', [t['technique_id'] for t in techniques])
+
+    def test_dettect_data_sources_are_not_aliased(self):
+        dettect_data_sources = [{'technique_id': 'T1059', 'dettect_data_sources': ['Network Traffic Content', 'Web Logs']}]
+        client = attack_client(local_path=self.tmpdir.name)
+        with patch('generic.get_dettect_data_sources', return_value=dettect_data_sources), patch('generic._dettect_data_sources_index', None):
+            first = _get_attack_data_from_source(client, DATA_TYPE_STIX_ALL_TECH)
+            first[0]['dettect_data_sources'].append('Modified')
+            second = _get_attack_data_from_source(client, DATA_TYPE_STIX_ALL_TECH)
+
+        tech = [t for t in second if t['technique_id'] == 'T1059'][0]
+        self.assertEqual(tech['dettect_data_sources'], ['Web Logs'])
+        self.assertEqual(tech['data_components'], ['Process Creation'])
+        self.assertEqual(dettect_data_sources[0]['dettect_data_sources'], ['Network Traffic Content', 'Web Logs'])
+
+    def test_bundles_are_read_once_per_process(self):
+        generic_state = (generic.local_stix_path, generic._local_attack_client)
+        try:
+            generic.local_stix_path = self.tmpdir.name
+            generic._local_attack_client = None
+            self.assertIs(generic._get_attack_client(), generic._get_attack_client())
+        finally:
+            generic.local_stix_path, generic._local_attack_client = generic_state
+
+
+if __name__ == '__main__':
+    unittest.main()
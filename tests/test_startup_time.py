@@ -0,0 +1,49 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+DETTECT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'dettect.py')
+
+# Wall-clock budget in seconds for starting DeTT&CT for commands that don't need ATT&CK data or YAML files
+STARTUP_TIME_BUDGET = 1.0
+HEAVY_MODULES = ['eql', 'xlsxwriter', 'simplejson', 'stix2', 'taxii2client', 'ruamel', 'plotly', 'pandas', 'requests']
+
+RUN_CODE = '''
+import os, runpy, sys
+sys.path.insert(0, os.path.dirname(%r))
+sys.argv = [%r] + %r
+try:
+    runpy.run_path(%r, run_name='__main__')
+except SystemExit:
+    pass
+print('heavy_modules=' + ','.join(sorted(m for m in %r if m in sys.modules)))
+'''
+
+
+class StartupTimeTest(unittest.TestCase):
+    def _run(self, args):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            durations = []
+            for _ in range(3):
+                start = time.perf_counter()
+                output = subprocess.run([sys.executable, '-c', RUN_CODE % (DETTECT, DETTECT, args, DETTECT, HEAVY_MODULES)],
+                                        cwd=tmpdir, capture_output=True, text=True, check=True).stdout
+                durations.append(time.perf_counter() - start)
+        return min(durations), output.strip().splitlines()[-1]
+
+    def test_help(self):
+        duration, loaded = self._run(['-h'])
+        self.assertEqual(loaded, 'heavy_modules=')
+        self.assertLess(duration, STARTUP_TIME_BUDGET)
+
+    def test_generic_list_platforms(self):
+        duration, loaded = self._run(['ge', '--list-platforms', 'enterprise'])
+        self.assertEqual(loaded, 'heavy_modules=')
+        self.assertLess(duration, STARTUP_TIME_BUDGET)
+
+
+if __name__ == '__main__':
+    unittest.main()
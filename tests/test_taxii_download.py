@@ -0,0 +1,104 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import generic
+from attack_taxii_client import attack_client, refresh_collections
+from constants import DATA_TYPE_CUSTOM_TECH_BY_GROUP, DATA_TYPE_STIX_ALL_TECH_ENTERPRISE
+from taxii_stand_in_server import TaxiiStandInServer
+
+ENTERPRISE = attack_client.ENTERPRISE_COLLECTION_ID
+MOBILE = attack_client.MOBILE_COLLECTION_ID
+ICS = attack_client.ICS_COLLECTION_ID
+TIMESTAMP = '2023-04-01T10:00:00.000Z'
+
+
+def _stix_object(stix_type, number, modified=TIMESTAMP, **kwargs):
+    obj = {'type': stix_type, 'spec_version': '2.1', 'id': '%s--00000000-0000-4000-8000-%012d' % (stix_type, number),
+           'created': TIMESTAMP, 'modified': modified}
+    obj.update(kwargs)
+    return obj
+
+
+def _technique(number, name, modified=TIMESTAMP):
+    return _stix_object('attack-pattern', number, modified, name=name, x_mitre_platforms=['Windows'],
+                        external_references=[{'source_name': 'mitre-attack', 'external_id': 'T%04d' % number}])
+
+
+GROUP = _stix_object('intrusion-set', 1, name='APT1', x_mitre_domains=['enterprise-attack'],
+                     external_references=[{'source_name': 'mitre-attack', 'external_id': 'G0006'}])
+ENTERPRISE_OBJECTS = [
+    _stix_object('x-mitre-collection', 1, name='Enterprise ATT&CK', x_mitre_version='19.1'),
+    _technique(1003, 'OS Credential Dumping'),
+    _technique(1059, 'Command and Scripting Interpreter'),
+    GROUP,
+    _stix_object('relationship', 1, relationship_type='uses', source_ref=GROUP['id'],
+                 target_ref=_technique(1059, '')['id']),
+]
+
+
+class TaxiiDownloadTest(unittest.TestCase):
+    def _server(self, **kwargs):
+        server = TaxiiStandInServer(**kwargs)
+        past = datetime.now(timezone.utc) - timedelta(days=40)
+        server.add_objects(ENTERPRISE, ENTERPRISE_OBJECTS, past)
+        server.add_objects(MOBILE, [_technique(1400, 'Mobile technique')], past)
+        server.add_objects(ICS, [_technique(800, 'ICS technique')], past)
+        return server
+
+    def test_collections_are_downloaded_concurrently_and_paginated(self):
+        with self._server(delay=0.2) as server, patch('attack_taxii_client.TAXII_ITEMS_PER_REQUEST', 2):
+            collections = refresh_collections(None, collections_url=server.collections_url)
+
+        self.assertEqual([o['id'] for o in collections['objects'][ENTERPRISE]], [o['id'] for o in ENTERPRISE_OBJECTS])
+        self.assertEqual(len(collections['objects'][MOBILE]), 1)
+        self.assertIsInstance(collections['objects'][ICS][0]['modified'], datetime)
+        self.assertGreater(server.max_concurrent_requests, 1)
+        self.assertTrue(all('added_after' not in params for _, _, params in server.requests))
+
+    def test_incremental_refresh(self):
+        with self._server() as server:
+            collections = refresh_collections(None, collections_url=server.collections_url)
+            server.requests.clear()
+
+            # the server's clock is behind the local clock, so the objects are added "in the past"
+            updated = _technique(1003, 'OS Credential Dumping (updated)', modified='2023-10-01T10:00:00.000Z')
+            date_added = datetime.now(timezone.utc) - timedelta(days=1)
+            server.add_objects(ENTERPRISE, [updated, _technique(1110, 'Brute Force')], date_added)
+            refreshed = refresh_collections(collections, collections_url=server.collections_url)
+
+        object_requests = [params for _, path, params in server.requests if path == ['objects']]
+        self.assertEqual(len(object_requests), 3)
+        self.assertTrue(all('added_after' in params for params in object_requests))
+        names = [o.get('name') for o in refreshed['objects'][ENTERPRISE] if o['type'] == 'attack-pattern']
+        self.assertEqual(names, ['OS Credential Dumping (updated)', 'Command and Scripting Interpreter', 'Brute Force'])
+        # the dates to download from are taken from the server
+        self.assertEqual(refreshed['added_after'][MOBILE], collections['added_after'][MOBILE])
+        self.assertLess(collections['added_after'][ENTERPRISE], date_added)
+        self.assertEqual(refreshed['added_after'][ENTERPRISE], date_added)
+
+    def test_load_attack_data_refreshes_snapshot_incrementally(self):
+        with tempfile.TemporaryDirectory() as tmpdir, self._server() as server, \
+                patch.object(attack_client, 'TAXII_COLLECTIONS_URL', server.collections_url), \
+                patch('generic.ATTACK_SNAPSHOT_FILE', os.path.join(tmpdir, 'attack-snapshot.sqlite')), \
+                patch.dict(generic._attack_data_cache, clear=True):
+            techniques = generic.load_attack_data(DATA_TYPE_STIX_ALL_TECH_ENTERPRISE)
+            self.assertEqual([t['technique_id'] for t in techniques], ['T1003', 'T1059'])
+            self.assertEqual(generic.load_attack_data(DATA_TYPE_CUSTOM_TECH_BY_GROUP)[0]['technique_id'], 'T1059')
+
+            # expire the snapshot and refresh it
+            server.add_objects(ENTERPRISE, [_technique(1110, 'Brute Force')],
+                               datetime.now(timezone.utc) + timedelta(seconds=1))
+            server.requests.clear()
+            generic._attack_data_cache.clear()
+            with patch('generic.EXPIRE_TIME', 0):
+                techniques = generic.load_attack_data(DATA_TYPE_STIX_ALL_TECH_ENTERPRISE)
+
+        self.assertEqual([t['technique_id'] for t in techniques], ['T1003', 'T1059', 'T1110'])
+        self.assertTrue(all('added_after' in params for _, path, params in server.requests if path == ['objects']))
+
+
+if __name__ == '__main__':
+    unittest.main()
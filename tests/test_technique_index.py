@@ -0,0 +1,62 @@
+import unittest
+from unittest.mock import patch
+
+import generic
+from generic import get_layer_tactics, get_technique, get_technique_index, load_attack_data
+from navigator_layer import determine_and_set_show_sub_techniques
+
+
+def _technique(technique_id, tactic):
+    return {
+        'external_references': [{'source_name': 'mitre-attack', 'external_id': technique_id}],
+        'kill_chain_phases': [{'kill_chain_name': 'mitre-attack', 'phase_name': tactic}],
+    }
+
+
+TECHNIQUES = [
+    _technique('T1003', 'credential-access'),
+    _technique('T1003.001', 'credential-access'),
+    _technique('T1059', 'execution'),
+    _technique('T1059.001', 'execution'),
+]
+
+
+class TechniqueIndexTest(unittest.TestCase):
+    def test_index(self):
+        with patch.dict(generic._attack_data_cache, {'mitre_all_techniques': TECHNIQUES}, clear=True), \
+                patch.dict(generic._technique_indexes, clear=True):
+            index = get_technique_index(TECHNIQUES)
+
+            self.assertIs(index, get_technique_index(TECHNIQUES))
+            self.assertIs(get_technique(TECHNIQUES, 'T1059.001'), TECHNIQUES[3])
+            self.assertIsNone(get_technique(TECHNIQUES, 'T9999'))
+            self.assertEqual(index['sub_techniques'], {'T1003': ['T1003.001'], 'T1059': ['T1059.001']})
+            self.assertEqual(index['by_tactic']['execution'], [TECHNIQUES[2], TECHNIQUES[3]])
+            self.assertEqual(get_layer_tactics(TECHNIQUES, 'T1003', {'includeTactic': 'True'}), ['credential-access'])
+            self.assertEqual(get_layer_tactics(TECHNIQUES, 'T1003', {'includeTactic': 'False'}), [None])
+
+            # the index on a list which is not loaded with load_attack_data is not kept in memory
+            filtered = TECHNIQUES[2:]
+            self.assertIs(get_technique(filtered, 'T1059'), TECHNIQUES[2])
+            self.assertIsNot(get_technique_index(filtered), get_technique_index(filtered))
+            self.assertEqual(list(generic._technique_indexes), ['mitre_all_techniques'])
+
+    def test_attack_data_is_loaded_once_per_data_type(self):
+        with patch.dict(generic._attack_data_cache, clear=True), \
+                patch('generic._load_attack_data', return_value=TECHNIQUES) as loader:
+            self.assertIs(load_attack_data('mitre_all_techniques'), TECHNIQUES)
+            self.assertIs(load_attack_data('mitre_all_techniques'), TECHNIQUES)
+
+        loader.assert_called_once_with('mitre_all_techniques')
+
+    def test_show_sub_techniques(self):
+        layer = [{'techniqueID': 'T1003'}, {'techniqueID': 'T1003.001'}, {'techniqueID': 'T1059.001'},
+                 {'techniqueID': 'T1059.001', 'tactic': 'execution'}]
+        determine_and_set_show_sub_techniques(layer, TECHNIQUES, {'includeTactic': 'True'})
+
+        self.assertTrue(layer[0]['showSubtechniques'])
+        self.assertEqual(layer[4:], [{'techniqueID': 'T1059', 'showSubtechniques': True, 'tactic': 'execution'}])
+
+
+if __name__ == '__main__':
+    unittest.main()
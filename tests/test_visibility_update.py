@@ -0,0 +1,86 @@
+import os
+import shutil
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+from unittest.mock import patch
+
+from attack_fixtures import SAMPLE_DATA, TempWorkingDirTestCase, technique
+from constants import UPDATE_POLICY_CONFLICT_KEEP
+from data_source_mapping import load_update_policy, update_technique_administration_files
+from generic import load_techniques, get_latest_score_obj
+
+TECHNIQUES = [technique('T1059', ['Windows', 'Linux'], ['Command Execution', 'Process Creation']),  # score 2 -> 4
+              technique('T1112', ['Windows'], ['Windows Registry Key Modification', 'Driver Load']),  # manual score 4 -> 2
+              technique('T1113', ['Windows'], ['OS API Execution']),  # applicable_to 'all' -> 'Windows workstations'
+              technique('T1999', ['Windows'], ['WMI Creation'])]  # not yet in the technique administration file
+
+
+class VisibilityUpdateTest(TempWorkingDirTestCase):
+    def setUp(self):
+        super().setUp()
+        shutil.copy(os.path.join(SAMPLE_DATA, 'data-sources-endpoints.yaml'), 'data-sources.yaml')
+        for filename in ['techniques-1.yaml', 'techniques-2.yaml']:
+            content = Path(SAMPLE_DATA, 'techniques-administration-endpoints.yaml').read_text()
+            # make the visibility score of T1112 a manually assigned score
+            content = content.replace('      score: 4\n      comment: \'\'\n      auto_generated: true\n- technique_id: T1113',
+                                      '      score: 4\n      comment: \'\'\n      auto_generated: false\n- technique_id: T1113')
+            Path(filename).write_text(content)
+
+    def _write_policy(self, content):
+        Path('policy.yaml').write_text(content)
+        return load_update_policy('policy.yaml')
+
+    def _update(self, policy, files):
+        with patch('data_source_mapping.load_attack_data', return_value=TECHNIQUES), redirect_stdout(StringIO()):
+            return update_technique_administration_files('data-sources.yaml', files, policy, None, False)
+
+    def test_update_by_default_policy(self):
+        policy = self._write_policy('comment: nightly update\n')
+        report = self._update(policy, ['techniques-1.yaml', 'techniques-2.yaml'])
+
+        self.assertEqual([f['status'] for f in report['files']], ['updated', 'updated'])
+        self.assertEqual(report['files'][0]['changes'], report['files'][1]['changes'])
+        self.assertEqual({c['technique_id']: c['action'] for c in report['files'][0]['changes']},
+                         {'T1059': 'score_updated', 'T1112': 'score_not_updated', 'T1113': 'visibility_replaced',
+                          'T1999': 'technique_added'})
+        self.assertTrue(os.path.exists('techniques-1_backup_1.yaml'))
+        self.assertEqual(len(os.listdir('output')), 1)
+
+        techniques = load_techniques('techniques-1.yaml')[0]
+        t1059 = techniques['T1059']['visibility'][0]
+        self.assertEqual([s['score'] for s in t1059['score_logbook']], [4, 2])
+        self.assertEqual(get_latest_score_obj(t1059)['comment'], 'nightly update')
+        self.assertEqual(techniques['T1112']['visibility'][0]['score_logbook'][0]['score'], 4)
+        self.assertEqual([v['applicable_to'] for v in techniques['T1113']['visibility']], [['Windows workstations']])
+        self.assertIn('T1999', techniques)
+
+    def test_update_by_custom_policy(self):
+        policy = self._write_policy('auto_accept:\n  manual: true\nconflict: ' + UPDATE_POLICY_CONFLICT_KEEP + '\n')
+        report = self._update(policy, ['techniques-1.yaml'])
+
+        self.assertEqual({c['technique_id']: c['action'] for c in report['files'][0]['changes']},
+                         {'T1059': 'score_updated', 'T1112': 'score_updated', 'T1113': 'visibility_not_replaced',
+                          'T1999': 'technique_added'})
+        techniques = load_techniques('techniques-1.yaml')[0]
+        self.assertEqual(techniques['T1112']['visibility'][0]['score_logbook'][0]['score'], 2)
+        self.assertEqual([v['applicable_to'] for v in techniques['T1113']['visibility']], [['all']])
+
+    def test_canceled_update(self):
+        content = Path('techniques-1.yaml').read_text().replace('Windows workstations', 'Unknown systems')
+        Path('techniques-1.yaml').write_text(content)
+        report = self._update(self._write_policy(''), ['techniques-1.yaml'])
+
+        self.assertEqual(report['files'][0]['status'], 'canceled')
+        self.assertEqual(Path('techniques-1.yaml').read_text(), content)
+
+    def test_invalid_policy(self):
+        with redirect_stdout(StringIO()):
+            self.assertIsNone(self._write_policy('conflict: ask\n'))
+            self.assertIsNone(self._write_policy('auto_accept:\n  manual: maybe\n'))
+            self.assertIsNone(self._write_policy('unknown: true\n'))
+
+
+if __name__ == '__main__':
+    unittest.main()
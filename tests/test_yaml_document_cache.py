@@ -0,0 +1,79 @@
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from unittest.mock import patch
+
+import generic
+from constants import FILE_TYPE_DATA_SOURCE_ADMINISTRATION, FILE_TYPE_TECHNIQUE_ADMINISTRATION
+from eql_yaml import _get_applicable_to_yaml_values
+
+SAMPLE_DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sample-data')
+
+
+class YamlDocumentCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmpdir.name)
+        os.mkdir('cache')
+        self.parsed = []
+        init_yaml = generic.init_yaml
+
+        def _counting_init_yaml(read_only=False):
+            self.parsed.append(read_only)
+            return init_yaml(read_only)
+
+        self.patchers = [patch('generic.init_yaml', _counting_init_yaml),
+                         patch.dict(generic._yaml_document_cache, clear=True)]
+        for patcher in self.patchers:
+            patcher.start()
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+        os.chdir(self.cwd)
+        self.tmpdir.cleanup()
+
+    def _copy_sample(self, name):
+        shutil.copy(os.path.join(SAMPLE_DATA, name), name)
+        return name
+
+    def test_technique_file_is_parsed_once(self):
+        filename = self._copy_sample('techniques-administration-endpoints.yaml')
+        with redirect_stdout(StringIO()):
+            self.assertEqual(generic.check_file(filename, FILE_TYPE_TECHNIQUE_ADMINISTRATION, True),
+                             FILE_TYPE_TECHNIQUE_ADMINISTRATION)
+            self.assertTrue(generic.check_platform(['Windows'], filename=filename))
+            generic.load_techniques(filename)
+        self.assertEqual(self.parsed, [True])
+
+    def test_data_source_file_is_parsed_once(self):
+        filename = self._copy_sample('data-sources-endpoints.yaml')
+        with redirect_stdout(StringIO()):
+            self.assertEqual(generic.check_file(filename, FILE_TYPE_DATA_SOURCE_ADMINISTRATION, True),
+                             FILE_TYPE_DATA_SOURCE_ADMINISTRATION)
+            generic.load_data_sources(filename)
+            _get_applicable_to_yaml_values(filename, FILE_TYPE_DATA_SOURCE_ADMINISTRATION)
+        self.assertEqual(self.parsed, [True])
+
+    def test_changed_file_is_parsed_again(self):
+        filename = self._copy_sample('groups.yaml')
+        self.assertEqual(generic.load_yaml_file(filename)['file_type'], 'group-administration')
+
+        with open(filename, 'a') as f:
+            f.write('# a new comment\n')
+        generic.load_yaml_file(filename)
+        self.assertEqual(len(self.parsed), 2)
+
+    def test_returns_a_copy(self):
+        filename = self._copy_sample('groups.yaml')
+        generic.load_yaml_file(filename)['groups'].clear()
+        self.assertNotEqual(generic.load_yaml_file(filename)['groups'], [])
+        self.assertEqual(len(self.parsed), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+import glob
+import os
+import unittest
+
+from generic import init_yaml, load_data_sources, load_techniques
+
+SAMPLE_DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sample-data')
+
+
+def _load(filename, read_only):
+    with open(filename, 'r') as yaml_file:
+        return init_yaml(read_only=read_only).load(yaml_file)
+
+
+class ReadOnlyYamlLoadingTest(unittest.TestCase):
+    def test_same_data_as_round_trip_loader(self):
+        for filename in sorted(glob.glob(os.path.join(SAMPLE_DATA, '*.yaml'))):
+            self.assertEqual(_load(filename, True), _load(filename, False), filename)
+
+    def test_load_techniques(self):
+        for filename in sorted(glob.glob(os.path.join(SAMPLE_DATA, 'techniques-administration-*.yaml'))):
+            self.assertEqual(load_techniques(filename), load_techniques(_load(filename, False)), filename)
+
+    def test_load_data_sources(self):
+        for filename in sorted(glob.glob(os.path.join(SAMPLE_DATA, 'data-sources-*.yaml'))):
+            for filter_empty_scores in [True, False]:
+                self.assertEqual(load_data_sources(filename, filter_empty_scores),
+                                 load_data_sources(_load(filename, False), filter_empty_scores), filename)
+
+
+if __name__ == '__main__':
+    unittest.main()